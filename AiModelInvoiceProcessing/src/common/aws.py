@@ -0,0 +1,77 @@
+# src/common/aws.py
+# Lazily created AWS clients, cached per (service, region); resources are per thread.
+import threading
+from . import config
+
+_lock = threading.Lock()
+_clients = {}
+_resource_overrides = {}
+_local = threading.local()
+
+# per-service overrides on top of the defaults in _config()
+# bedrock-runtime and textract calls are retried by common/ratelimit.py instead
+_NO_RETRY = {"mode": "standard", "max_attempts": 1}
+_SERVICE_OVERRIDES = {
+    "bedrock-runtime": {"read_timeout": config.BEDROCK_READ_TIMEOUT, "retries": _NO_RETRY},
+    "textract": {"retries": _NO_RETRY},
+}
+
+def _config(service: str):
+    from botocore.config import Config
+    opts = {
+        "max_pool_connections": config.AWS_MAX_POOL,
+        "tcp_keepalive": True,
+        "connect_timeout": config.AWS_CONNECT_TIMEOUT,
+        "read_timeout": config.AWS_READ_TIMEOUT,
+        "retries": {"mode": "adaptive", "max_attempts": config.AWS_MAX_ATTEMPTS},
+    }
+    opts.update(_SERVICE_OVERRIDES.get(service, {}))
+    return Config(**opts)
+
+def client(service: str, region: str | None = None):
+    region = region or config.REGION
+    k = (service, region)
+    c = _clients.get(k)
+    if c is None:
+        with _lock:
+            c = _clients.get(k)
+            if c is None:
+                import boto3
+                c = boto3.client(service, region_name=region, config=_config(service))
+                _clients[k] = c
+    return c
+
+def resource(service: str, region: str | None = None):
+    region = region or config.REGION
+    k = (service, region)
+    if k in _resource_overrides:
+        return _resource_overrides[k]
+    cache = getattr(_local, "resources", None)
+    if cache is None:
+        cache = _local.resources = {}
+    r = cache.get(k)
+    if r is None:
+        # boto3.resource() on the shared default session isn't thread-safe: one session per thread
+        session = getattr(_local, "session", None)
+        if session is None:
+            import boto3.session
+            session = _local.session = boto3.session.Session()
+        r = session.resource(service, region_name=region, config=_config(service))
+        cache[k] = r
+    return r
+
+def set_client(service: str, obj, region: str | None = None) -> None:
+    """Install a pre-built (e.g. stubbed) client for (service, region)."""
+    with _lock:
+        _clients[(service, region or config.REGION)] = obj
+
+def set_resource(service: str, obj, region: str | None = None) -> None:
+    """Install a pre-built (e.g. stubbed) resource shared by all threads."""
+    with _lock:
+        _resource_overrides[(service, region or config.REGION)] = obj
+
+def reset() -> None:
+    with _lock:
+        _clients.clear()
+        _resource_overrides.clear()
+    _local.__dict__.clear()
@@ -0,0 +1,186 @@
+# src/common/batch_inference.py
+# Bedrock Batch Inference backend for the nightly run (BedrockJobRunner; LocalJobRunner offline).
+import json, os, time, datetime, uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DONE_STATES = {"Completed", "PartiallyCompleted"}
+FAILED_STATES = {"Failed", "Stopped", "Expired"}
+MANIFEST_PREFIX = "batch-jobs/"
+
+class JobRunner:
+    """Interface for model-invocation job backends."""
+    name = "abstract"
+
+    def submit(self, job_name: str, records: list) -> str:
+        """records: [{"recordId": str, "modelInput": dict}]; returns a job id."""
+        raise NotImplementedError
+
+    def status(self, job_id: str) -> str:
+        """One of the Bedrock job states (Submitted, InProgress, Completed, Failed, ...)."""
+        raise NotImplementedError
+
+    def results(self, job_id: str):
+        """Yield {"recordId", "modelOutput"} or {"recordId", "error"} per record."""
+        raise NotImplementedError
+
+def _jsonl(records) -> bytes:
+    return "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+
+def _parse_jsonl(text: str):
+    for line in text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+class BedrockJobRunner(JobRunner):
+    name = "bedrock"
+
+    def __init__(self, s3, bedrock, bucket: str, role_arn: str, model_id: str, prefix: str = MANIFEST_PREFIX):
+        self.s3, self.bedrock = s3, bedrock
+        self.bucket, self.prefix = bucket, prefix
+        self.role_arn, self.model_id = role_arn, model_id
+
+    def submit(self, job_name, records):
+        in_key = f"{self.prefix}{job_name}/input/records.jsonl"
+        self.s3.put_object(Bucket=self.bucket, Key=in_key, Body=_jsonl(records), ContentType="application/jsonl")
+        resp = self.bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=self.model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{self.bucket}/{in_key}", "s3InputFormat": "JSONL"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{self.bucket}/{self.prefix}{job_name}/output/"}},
+        )
+        return resp["jobArn"]
+
+    def status(self, job_id):
+        return self.bedrock.get_model_invocation_job(jobIdentifier=job_id)["status"]
+
+    def results(self, job_id):
+        job = self.bedrock.get_model_invocation_job(jobIdentifier=job_id)
+        uri = job["outputDataConfig"]["s3OutputDataConfig"]["s3Uri"]
+        bucket, _, prefix = uri[len("s3://"):].partition("/")
+        token = None
+        while True:
+            kw = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": 1000}
+            if token:
+                kw["ContinuationToken"] = token
+            resp = self.s3.list_objects_v2(**kw)
+            for o in resp.get("Contents", []) or []:
+                if o["Key"].endswith(".jsonl.out"):
+                    body = self.s3.get_object(Bucket=bucket, Key=o["Key"])["Body"].read().decode("utf-8")
+                    yield from _parse_jsonl(body)
+            if resp.get("IsTruncated"):
+                token = resp.get("NextContinuationToken")
+            else:
+                break
+
+class LocalJobRunner(JobRunner):
+    """Runs records in-process at submit time, writing Bedrock-shaped JSONL under `workdir`."""
+    name = "local"
+
+    def __init__(self, invoke, workdir: str | None = None, workers: int = 4):
+        self.invoke = invoke
+        self.workers = workers
+        self.workdir = Path(workdir or os.getenv("TMPDIR", "/tmp")) / "batch-jobs"
+
+    def _run(self, r):
+        try:
+            return {"recordId": r["recordId"], "modelInput": r["modelInput"],
+                    "modelOutput": self.invoke(r["modelInput"])}
+        except Exception as e:
+            return {"recordId": r["recordId"], "error": {"errorMessage": f"{type(e).__name__}: {e}"}}
+
+    def submit(self, job_name, records):
+        d = self.workdir / job_name
+        d.mkdir(parents=True, exist_ok=True)
+        (d / "records.jsonl").write_bytes(_jsonl(records))
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            out = list(pool.map(self._run, records))
+        (d / "records.jsonl.out").write_bytes(_jsonl(out))
+        return job_name
+
+    def status(self, job_id):
+        return "Completed" if (self.workdir / job_id / "records.jsonl.out").exists() else "Failed"
+
+    def results(self, job_id):
+        yield from _parse_jsonl((self.workdir / job_id / "records.jsonl.out").read_text(encoding="utf-8"))
+
+# --------------------------
+# Job manifests (processed bucket, batch-jobs/<job_name>/manifest.json)
+# --------------------------
+def job_name_for(now: datetime.datetime | None = None) -> str:
+    # the suffix keeps two runs started in the same second apart
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now.strftime("invoices-%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+
+def _manifest_key(job_name: str) -> str:
+    return f"{MANIFEST_PREFIX}{job_name}/manifest.json"
+
+def _put_manifest(s3, bucket, manifest) -> None:
+    s3.put_object(Bucket=bucket, Key=_manifest_key(manifest["job_name"]),
+                  Body=json.dumps(manifest, indent=2).encode("utf-8"), ContentType="application/json")
+
+def submit_job(runner: JobRunner, s3, bucket: str, records: list, index: dict, extra: dict | None = None) -> dict:
+    """
+    Submit `records` and persist a manifest mapping each recordId
+    (invoice_id) to its `index` entry ({"key", "processed_key", "etag"}).
+    """
+    job_name = job_name_for()
+    job_id = runner.submit(job_name, records)
+    manifest = {"job_name": job_name, "job_id": job_id, "runner": runner.name, "status": "submitted",
+                "submitted_at": time.time(), "count": len(records), "records": index, **(extra or {})}
+    _put_manifest(s3, bucket, manifest)
+    return manifest
+
+def pending_manifests(s3, bucket: str, runner_name: str):
+    token = None
+    while True:
+        kw = {"Bucket": bucket, "Prefix": MANIFEST_PREFIX, "MaxKeys": 1000}
+        if token:
+            kw["ContinuationToken"] = token
+        resp = s3.list_objects_v2(**kw)
+        for o in resp.get("Contents", []) or []:
+            if o["Key"].endswith("/manifest.json"):
+                m = json.loads(s3.get_object(Bucket=bucket, Key=o["Key"])["Body"].read())
+                if m.get("status") == "submitted" and m.get("runner") == runner_name:
+                    yield m
+        if resp.get("IsTruncated"):
+            token = resp.get("NextContinuationToken")
+        else:
+            break
+
+def collect_job(runner: JobRunner, s3, bucket: str, manifest: dict, merge, fallback=None) -> dict:
+    """
+    If the job has finished, call merge(record_index_entry, model_output, invoice_id)
+    for every successful record and mark the manifest collected. Records
+    without a usable output (per-record errors, or every record of a Failed /
+    Stopped / Expired job) go to fallback({invoice_id: entry}), which returns
+    how many it normalized some other way. Returns a summary; unfinished jobs
+    are left for the next run.
+    """
+    state = runner.status(manifest["job_id"])
+    summary = {"job_name": manifest["job_name"], "state": state, "merged": 0, "errors": 0, "fallback": 0}
+    if state not in DONE_STATES | FAILED_STATES:
+        return summary
+    merged = set()
+    if state in DONE_STATES:
+        for r in runner.results(manifest["job_id"]):
+            rid = str(r.get("recordId"))
+            entry = manifest["records"].get(rid)
+            if entry is None or "modelOutput" not in r:
+                continue
+            try:
+                merge(entry, r["modelOutput"], rid)
+                merged.add(rid)
+            except Exception as e:
+                print(f"[batch_inference] merge failed record={rid}: {e}")
+    unmerged = {rid: e for rid, e in manifest["records"].items() if rid not in merged}
+    summary["merged"], summary["errors"] = len(merged), len(unmerged)
+    if unmerged and fallback is not None:
+        summary["fallback"] = fallback(unmerged)
+    manifest["status"] = "collected" if state in DONE_STATES else "failed"
+    manifest["collected_at"] = time.time()
+    manifest["summary"] = summary
+    manifest["unmerged"] = sorted(unmerged)
+    _put_manifest(s3, bucket, manifest)
+    return summary
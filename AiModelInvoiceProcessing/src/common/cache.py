@@ -0,0 +1,76 @@
+# src/common/cache.py
+import json, hashlib
+
+_MISSING = {"NoSuchKey", "404", "NotFound"}
+
+def clean_etag(etag) -> str:
+    # listing/head return '"abc"', S3 event records return 'abc'
+    return (etag or "").strip().strip('"')
+
+class ResultCache:
+    """
+    Content-addressed cache stored as JSON objects under an S3 prefix.
+
+      <prefix>textract/<etag>.json             raw analyze_expense response
+      <prefix>normalized/<sha256>.json         normalize_invoice output, keyed on
+                                               etag + model id + prompt version
+
+    The ETag changes whenever the object bytes change, so a hit is always safe
+    to reuse. Every method is a no-op when disabled or when no ETag is known.
+    """
+
+    def __init__(self, s3, bucket: str, prefix: str = "cache/", enabled: bool = True):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.enabled = bool(enabled and bucket)
+
+    def textract_key(self, etag: str) -> str:
+        return f"{self.prefix}textract/{clean_etag(etag)}.json"
+
+    def normalized_key(self, etag: str, model_id: str, prompt_version: str) -> str:
+        h = hashlib.sha256(f"{clean_etag(etag)}|{model_id}|{prompt_version}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}normalized/{h}.json"
+
+    def _get(self, key: str):
+        from botocore.exceptions import ClientError
+        try:
+            body = self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in _MISSING:
+                return None
+            raise
+        return json.loads(body)
+
+    def _put(self, key: str, obj) -> None:
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=json.dumps(obj, separators=(",", ":")).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def get_textract(self, etag):
+        if not (self.enabled and etag):
+            return None
+        return self._get(self.textract_key(etag))
+
+    def put_textract(self, etag, resp: dict) -> None:
+        # async jobs can end PARTIAL_SUCCESS; only complete analyses are worth reusing
+        if self.enabled and etag and resp.get("JobStatus", "SUCCEEDED") == "SUCCEEDED":
+            self._put(self.textract_key(etag), resp)
+
+    def get_normalized(self, etag, model_id: str, prompt_version: str):
+        if not (self.enabled and etag):
+            return None
+        hit = self._get(self.normalized_key(etag, model_id, prompt_version))
+        return hit.get("normalized") if hit else None
+
+    def put_normalized(self, etag, model_id: str, prompt_version: str, normalized: dict) -> None:
+        if self.enabled and etag and normalized:
+            self._put(self.normalized_key(etag, model_id, prompt_version), {
+                "etag": clean_etag(etag),
+                "model_id": model_id,
+                "prompt_version": prompt_version,
+                "normalized": normalized,
+            })
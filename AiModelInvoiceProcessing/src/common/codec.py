@@ -0,0 +1,53 @@
+# src/common/codec.py
+# parsed.json bodies: compact JSON, optionally gzip/zstd with a matching Content-Encoding.
+import json, gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENCODINGS = ("identity", "gzip", "zstd")
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def effective(encoding: str | None) -> str:
+    enc = (encoding or "identity").lower()
+    if enc not in ENCODINGS:
+        raise ValueError(f"unknown payload encoding {encoding!r}; expected one of {ENCODINGS}")
+    return "gzip" if enc == "zstd" and zstandard is None else enc
+
+def encode(obj, encoding: str | None = "identity") -> tuple:
+    """(body, extra put_object kwargs) for `obj` in `encoding`."""
+    raw, enc = dumps(obj), effective(encoding)
+    if enc == "gzip":
+        return gzip.compress(raw, compresslevel=6, mtime=0), {"ContentEncoding": "gzip"}
+    if enc == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(raw), {"ContentEncoding": "zstd"}
+    return raw, {}
+
+def decode(body: bytes, content_encoding: str | None = None) -> bytes:
+    enc = (content_encoding or "").lower()
+    if enc == "gzip" or body[:2] == _GZIP_MAGIC:
+        return gzip.decompress(body)
+    if enc == "zstd" or body[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("zstd-encoded payload; `pip install zstandard` to read it")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+def loads(body: bytes, content_encoding: str | None = None):
+    return json.loads(decode(body, content_encoding))
+
+def put_json(s3, bucket: str, key: str, obj, encoding: str | None = "identity") -> int:
+    """Write `obj` as JSON in `encoding`; returns the stored size in bytes."""
+    body, extra = encode(obj, encoding)
+    s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType="application/json", **extra)
+    return len(body)
+
+def get_json(s3, bucket: str, key: str):
+    o = s3.get_object(Bucket=bucket, Key=key)
+    return loads(o["Body"].read(), o.get("ContentEncoding"))
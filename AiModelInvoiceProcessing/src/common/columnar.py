@@ -0,0 +1,253 @@
+# src/common/columnar.py
+# Day-partitioned Parquet datasets (invoices, line_items, metrics) built from parsed.json.
+import datetime, functools
+from decimal import Decimal, InvalidOperation
+
+from .metrics import compare_case, FIELDS
+from .local_normalize import parse_amount
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+DATASETS = ("invoices", "line_items", "metrics")
+BATCH_ROWS = 10000     # rows buffered per dataset before a row group is written
+_COL = {f: f.replace(".", "_") for f in FIELDS}
+
+def _money(v, scale: int = 2):
+    d = parse_amount(v) if v not in (None, "") else None
+    if d is None:
+        return None
+    try:
+        d = d.quantize(Decimal(1).scaleb(-scale))
+    except InvalidOperation:
+        return None
+    return d if abs(d) < Decimal(10) ** (18 - scale) else None   # fits decimal128(18, scale)
+
+def _date(v):
+    try:
+        return datetime.date.fromisoformat(v) if isinstance(v, str) and len(v) == 10 else None
+    except ValueError:
+        return None
+
+def _int(v):
+    return v if isinstance(v, int) and not isinstance(v, bool) else None
+
+def _scored(data: dict) -> bool:
+    # LLM output that isn't the local normalizer's (what tools/score_day.py counts)
+    return bool(data.get("llm_normalized")) and (data.get("meta") or {}).get("source") != "textract+local"
+
+def rows_for(key: str, data: dict) -> dict:
+    """{dataset: [row, ...]} for one parsed.json (`key` is its object key)."""
+    invoice_id = key.rstrip("/").split("/")[-2]
+    src = data.get("source_parse") or {}
+    llm = data.get("llm_normalized") or {}
+    meta = data.get("meta") or {}
+    norm = meta.get("normalize") or {}
+    usage = norm.get("usage") or {}
+    inv, totals = llm.get("invoice") or {}, llm.get("totals") or {}
+    items = llm.get("line_items") if llm else src.get("line_items")
+    items = [li for li in items or [] if isinstance(li, dict)]
+    route = (norm.get("route") or {}).get("route") or None
+
+    header = {
+        "invoice_id": invoice_id,
+        "processed_key": key,
+        "raw_key": data.get("raw_key"),
+        "etag": meta.get("etag"),
+        "source": meta.get("source"),
+        "model_id": meta.get("model_id"),
+        "prompt_version": meta.get("prompt_version"),
+        "route": route,
+        "vendor": (llm.get("vendor") or {}).get("name") or src.get("vendor"),
+        "invoice_number": inv.get("number") or src.get("invoice_number"),
+        "invoice_date": _date(inv.get("date_iso")),
+        "currency": inv.get("currency") or src.get("currency") or None,
+        "subtotal": _money(totals.get("subtotal") if llm else src.get("subtotal")),
+        "tax": _money(totals.get("tax") if llm else src.get("tax")),
+        "total": _money(totals.get("total") if llm else src.get("total")),
+        "sum_matches_total": bool((llm.get("validations") or {}).get("sum_matches_total", False)),
+        "line_item_count": len(items),
+        "llm_present": _scored(data),
+        "input_tokens": _int(usage.get("input_tokens")),
+        "output_tokens": _int(usage.get("output_tokens")),
+    }
+    lines = [{
+        "invoice_id": invoice_id,
+        "line_no": i,
+        "page": _int(li.get("page")),
+        "description": li.get("description") or None,
+        "qty": _money(li.get("qty"), 4),
+        "unit_price": _money(li.get("unit_price")),
+        "amount": _money(li.get("amount")),
+    } for i, li in enumerate(items)]
+
+    m = compare_case(src, llm)
+    metric = {
+        "invoice_id": invoice_id,
+        "processed_key": key,
+        "route": route,
+        "scored": _scored(data),
+        "coverage_baseline": m["coverage_baseline"],
+        "coverage_model": m["coverage_model"],
+        "coverage_delta": m["coverage_delta"],
+        "sum_matches_total": m["sum_matches_total"],
+        "near1pct_total": m["numeric"]["totals.total"]["near@1pct"],
+        "near1pct_tax": m["numeric"]["totals.tax"]["near@1pct"],
+        "ape_total": m["numeric"]["totals.total"]["ape_vs_baseline"],
+        "ape_tax": m["numeric"]["totals.tax"]["ape_vs_baseline"],
+        **{f"wins_fill_{_COL[f]}": m["wins_fill"][f] for f in FIELDS},
+        **{f"wins_fix_{_COL[f]}": m["wins_fix"][f] for f in FIELDS},
+    }
+    return {"invoices": [header], "line_items": lines, "metrics": [metric]}
+
+# --------------------------
+# Arrow schemas, writing and reading (pyarrow required)
+# --------------------------
+def _need_arrow():
+    if pa is None:
+        raise RuntimeError("Parquet datasets need pyarrow (`pip install pyarrow`)")
+
+@functools.lru_cache(maxsize=None)
+def schemas() -> dict:
+    _need_arrow()
+    s, d = pa.string(), pa.dictionary(pa.int32(), pa.string())
+    money, qty = pa.decimal128(18, 2), pa.decimal128(18, 4)
+    return {
+        "invoices": pa.schema([
+            ("invoice_id", s), ("processed_key", s), ("raw_key", s), ("etag", s),
+            ("source", d), ("model_id", d), ("prompt_version", d), ("route", d),
+            ("vendor", s), ("invoice_number", s), ("invoice_date", pa.date32()), ("currency", d),
+            ("subtotal", money), ("tax", money), ("total", money),
+            ("sum_matches_total", pa.bool_()), ("line_item_count", pa.int32()), ("llm_present", pa.bool_()),
+            ("input_tokens", pa.int64()), ("output_tokens", pa.int64()),
+        ]),
+        "line_items": pa.schema([
+            ("invoice_id", s), ("line_no", pa.int32()), ("page", pa.int32()), ("description", s),
+            ("qty", qty), ("unit_price", money), ("amount", money),
+        ]),
+        "metrics": pa.schema([
+            ("invoice_id", s), ("processed_key", s), ("route", d), ("scored", pa.bool_()),
+            ("coverage_baseline", pa.int8()), ("coverage_model", pa.int8()), ("coverage_delta", pa.int8()),
+            ("sum_matches_total", pa.bool_()), ("near1pct_total", pa.bool_()), ("near1pct_tax", pa.bool_()),
+            ("ape_total", pa.float64()), ("ape_tax", pa.float64()),
+            *[(f"wins_fill_{_COL[f]}", pa.bool_()) for f in FIELDS],
+            *[(f"wins_fix_{_COL[f]}", pa.bool_()) for f in FIELDS],
+        ]),
+    }
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive")
+
+def filesystem(root: str, region: str | None = None) -> tuple:
+    """(pyarrow filesystem, base path) for a local directory or s3://bucket/prefix."""
+    _need_arrow()
+    if root.startswith("s3://"):
+        return pafs.S3FileSystem(region=region), root[len("s3://"):].rstrip("/")
+    return pafs.LocalFileSystem(), root.rstrip("/")
+
+class DayWriter:
+    """
+    Streams one day partition of every dataset, a row group per `batch_rows`
+    rows; the files replace the old partition only once close() succeeds.
+    """
+    def __init__(self, root: str, day: str, region: str | None = None, batch_rows: int = BATCH_ROWS):
+        self.fs, base = filesystem(root, region)
+        self.batch_rows = batch_rows
+        self.paths = {name: f"{base}/{name}/date={day}/part-0.parquet" for name in DATASETS}
+        self.counts = {name: 0 for name in DATASETS}
+        self._buf = {name: [] for name in DATASETS}
+        self._writers = {}
+        for name, path in self.paths.items():
+            self.fs.create_dir(path.rpartition("/")[0], recursive=True)
+            self._writers[name] = pq.ParquetWriter(self._tmp(path), schemas()[name], filesystem=self.fs,
+                                                   compression="zstd")
+
+    @staticmethod
+    def _tmp(path: str) -> str:
+        d, _, f = path.rpartition("/")
+        return f"{d}/_{f}.tmp"
+
+    def add(self, rows: dict) -> None:
+        for name, part in rows.items():
+            buf = self._buf[name]
+            buf.extend(part)
+            self.counts[name] += len(part)
+            if len(buf) >= self.batch_rows:
+                self._flush(name)
+
+    def _flush(self, name: str) -> None:
+        if self._buf[name]:
+            self._writers[name].write_table(pa.Table.from_pylist(self._buf[name], schema=schemas()[name]))
+            self._buf[name] = []
+
+    def close(self) -> dict:
+        """Finish and publish the files; returns {dataset: row count}."""
+        for name in DATASETS:
+            self._flush(name)
+            self._writers[name].close()
+        for name, path in self.paths.items():
+            self.fs.move(self._tmp(path), path)
+        return self.counts
+
+    def abort(self) -> None:
+        for name, path in self.paths.items():
+            self._writers[name].close()
+            try:
+                self.fs.delete_file(self._tmp(path))
+            except (OSError, FileNotFoundError):
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_day(root: str, day: str, parts, region: str | None = None, batch_rows: int = BATCH_ROWS) -> dict:
+    """
+    Write (replace) the day partition of every dataset from an iterable of
+    rows_for() outputs, streaming; returns {dataset: row count}.
+    """
+    with DayWriter(root, day, region, batch_rows) as w:
+        for rows in parts:
+            w.add(rows)
+    return w.counts
+
+def read(root: str, name: str, days=None, columns=None, region: str | None = None):
+    """One dataset as a pyarrow Table, pruned to the `days` partitions (ISO dates) when given."""
+    fs, base = filesystem(root, region)
+    dataset = ds.dataset(f"{base}/{name}", filesystem=fs, format="parquet",
+                         schema=schemas()[name].append(pa.field("date", pa.date32())),
+                         partitioning=_partitioning())
+    flt = None
+    if days:
+        flt = ds.field("date").isin(pa.array([datetime.date.fromisoformat(d) for d in days], pa.date32()))
+    return dataset.to_table(columns=columns, filter=flt)
+
+def aggregate_metrics(table) -> dict:
+    """score_day counters (n, coverage_delta_sum, wins_*_counts, routed_*) from a metrics table."""
+    import pyarrow.compute as pc
+    scored = table.filter(pc.field("scored"))
+    def count(t, col):
+        return int(pc.sum(pc.cast(t[col], pa.int64())).as_py() or 0)
+    routes = pc.value_counts(pc.cast(table["route"], pa.string())).to_pylist() if table.num_rows else []
+    routed = {r["values"]: r["counts"] for r in routes if r["values"]}
+    return {
+        "n": scored.num_rows,
+        "coverage_delta_sum": count(scored, "coverage_delta"),
+        "sum_matches_total_true": count(scored, "sum_matches_total"),
+        "near1pct_total": count(scored, "near1pct_total"),
+        "near1pct_tax": count(scored, "near1pct_tax"),
+        "wins_fill_counts": {f: count(scored, f"wins_fill_{_COL[f]}") for f in FIELDS},
+        "wins_fix_counts": {f: count(scored, f"wins_fix_{_COL[f]}") for f in FIELDS},
+        "routed_local": routed.get("local", 0),
+        "routed_llm": routed.get("llm", 0),
+    }
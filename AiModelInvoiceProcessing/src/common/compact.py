@@ -0,0 +1,72 @@
+# src/common/compact.py
+# Textract AnalyzeExpense response trimmed for the LLM prompt: minimal | standard | full.
+import json, math
+
+from .parser import iter_line_items, document_index
+
+DETAIL_LEVELS = ("minimal", "standard", "full")
+
+def estimate_tokens(obj) -> int:
+    # ~4 characters per token for minified JSON; good enough for budgeting
+    s = obj if isinstance(obj, str) else json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return math.ceil(len(s) / 4)
+
+def _text(d) -> str:
+    return ((d or {}).get("Text") or "").strip()
+
+def _conf(f):
+    c = (f.get("ValueDetection") or {}).get("Confidence")
+    return None if c is None else round(float(c))
+
+def _summary_field(f, detail):
+    out = {"type": _text(f.get("Type")), "value": _text(f.get("ValueDetection"))}
+    if detail == "standard":
+        label = _text(f.get("LabelDetection"))
+        if label:
+            out["label"] = label
+        c = _conf(f)
+        if c is not None:
+            out["conf"] = c
+        if f.get("PageNumber"):
+            out["page"] = f["PageNumber"]
+    return out
+
+def _line_item(page, fields, detail):
+    row = {t: text for t, (text, _) in fields.items() if not (detail == "minimal" and t == "EXPENSE_ROW")}
+    if detail == "standard":
+        confs = [round(float(c)) for _, c in fields.values() if c is not None]
+        if confs:
+            row["conf"] = min(confs)
+        if page:
+            row["page"] = page
+    return row
+
+def compact_textract(resp: dict, detail: str = "standard") -> dict:
+    if detail == "full" or not resp:
+        return resp or {}
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"unknown detail level {detail!r}; expected one of {DETAIL_LEVELS}")
+    docs = []
+    expense_docs = resp.get("ExpenseDocuments", [])
+    for i, d in enumerate(expense_docs):
+        summary = [_summary_field(f, detail) for f in d.get("SummaryFields", [])]
+        # same logical rows as the parser (wrapped descriptions merged), so the two line up
+        items = [row for row in (_line_item(page, fields, detail) for page, fields in iter_line_items([d]))
+                 if row]
+        doc = {
+            "SummaryFields": [s for s in summary if s["value"]],
+            "LineItems": items,
+        }
+        if len(expense_docs) > 1:
+            doc["ExpenseIndex"] = document_index(d, i)     # matches PARSE meta.documents
+        docs.append(doc)
+    return {"ExpenseDocuments": docs}
+
+def compaction_stats(resp: dict, compacted: dict, detail: str) -> dict:
+    before, after = estimate_tokens(resp or {}), estimate_tokens(compacted or {})
+    return {
+        "detail": detail,
+        "tokens_raw_est": before,
+        "tokens_compact_est": after,
+        "reduction_pct": round(100.0 * (1 - after / before), 1) if before else 0.0,
+    }
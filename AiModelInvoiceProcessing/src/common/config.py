@@ -4,13 +4,110 @@ import os
 def _get_bool(name: str, default: str = "false") -> bool:
     return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "y"}
 
+def _get_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)).strip())
+    except ValueError:
+        return default
+
+def require(name: str) -> str:
+    # mandatory settings are checked when first used, not at import (cold start)
+    v = os.getenv(name)
+    if not v:
+        raise RuntimeError(f"Missing required environment variable {name}")
+    return v
+
 USE_LLM = _get_bool("USE_LLM", "false")
 
 
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
 BEDROCK_REGION   = os.getenv("BEDROCK_REGION", os.getenv("AWS_REGION", "us-east-1"))
+# Bedrock prompt caching for the static system/few-shot prefix; only newer
+# Anthropic models support it (not claude-3-haiku), so it is opt-in. Bedrock
+# ignores cache points on prefixes under the model minimum (1024 tokens, 2048
+# on Haiku); the shipped prefix is ~680 tokens (tools/bench_prompt.py), so the
+# cache point is only set once the few-shots grow past PROMPT_CACHE_MIN_TOKENS.
+BEDROCK_PROMPT_CACHE = _get_bool("BEDROCK_PROMPT_CACHE", "false")
+PROMPT_CACHE_MIN_TOKENS = _get_int("PROMPT_CACHE_MIN_TOKENS", 1024)
+# InvokeModelWithResponseStream, closed as soon as the JSON answer is complete
+BEDROCK_STREAM   = _get_bool("BEDROCK_STREAM", "true")
+PROMPT_DETAIL    = os.getenv("PROMPT_DETAIL", "standard")   # Textract compaction: minimal|standard|full
+REGION           = os.getenv("AWS_REGION", "us-east-1")
 
 RAW_BUCKET       = os.getenv("RAW_BUCKET")
 PROCESSED_BUCKET = os.getenv("PROCESSED_BUCKET")
 DDB_TABLE        = os.getenv("DDB_TABLE")
 TIMEZONE         = os.getenv("TIMEZONE", "America/Chicago")
+
+# Textract: synchronous AnalyzeExpense for small single-page objects, async
+# StartExpenseAnalysis for multi-page PDF/TIFF and large files (common/textract_async.py)
+TEXTRACT_MODE           = os.getenv("TEXTRACT_MODE", "auto")   # auto|sync|async
+TEXTRACT_SYNC_MAX_BYTES = _get_int("TEXTRACT_SYNC_MAX_BYTES", 10 * 1024 * 1024)  # sync API limit
+TEXTRACT_SNIFF_PAGES    = _get_bool("TEXTRACT_SNIFF_PAGES", "true")   # PDF page count from a 1 KB ranged GET
+TEXTRACT_SNIFF_MIN_BYTES = _get_int("TEXTRACT_SNIFF_MIN_BYTES", 256 * 1024)  # smaller objects go sync unsniffed
+TEXTRACT_SNS_TOPIC_ARN  = os.getenv("TEXTRACT_SNS_TOPIC_ARN", "")     # set: finish on completion notice, else poll
+TEXTRACT_SNS_ROLE_ARN   = os.getenv("TEXTRACT_SNS_ROLE_ARN", "")
+TEXTRACT_POLL_TIMEOUT   = _get_int("TEXTRACT_POLL_TIMEOUT", 90)       # seconds
+TEXTRACT_POLL_DELAY     = float(os.getenv("TEXTRACT_POLL_DELAY", "1"))  # first poll delay, doubles up to 10s
+
+# deterministic normalizer (common/local_normalize.py)
+LOCAL_NORMALIZE      = _get_bool("LOCAL_NORMALIZE", "true")   # USE_LLM=false: fill llm_normalized locally
+LLM_PREPASS          = _get_bool("LLM_PREPASS", "false")      # send the local draft as PARSE to the LLM
+SUM_TOLERANCE        = os.getenv("SUM_TOLERANCE", "0.05")     # line-item reconciliation, currency units
+
+# output validation against prompt.SCHEMA (common/validate.py)
+VALIDATE_OUTPUT      = _get_bool("VALIDATE_OUTPUT", "true")    # local repair of formats + sum flag
+VALIDATE_REASK       = _get_bool("VALIDATE_REASK", "true")     # ask the model for the fields still invalid
+VALIDATE_REASK_MAX   = _get_int("VALIDATE_REASK_MAX", 20)      # more bad fields than this: no re-ask
+
+# deterministic-first routing: complete, confident, reconciling parses skip the LLM (opt-in:
+# it changes which invoices get model output)
+LLM_ROUTER           = _get_bool("LLM_ROUTER", "false")
+ROUTE_MIN_CONFIDENCE = _get_int("ROUTE_MIN_CONFIDENCE", 90)   # Textract 0-100
+
+# daily batch fan-out (1 = serial)
+BATCH_WORKERS    = _get_int("BATCH_WORKERS", 8)
+SKIP_PROCESSED   = _get_bool("SKIP_PROCESSED", "true")   # pre-flight DynamoDB check
+
+# SQS consumer (src/sqs_consumer): invoices processed concurrently per message batch
+SQS_WORKERS      = _get_int("SQS_WORKERS", 4)
+
+# multi-invoice LLM requests in the daily batch (1 = one invoice per request)
+LLM_BATCH_SIZE         = _get_int("LLM_BATCH_SIZE", 5)
+LLM_BATCH_TOKEN_BUDGET = _get_int("LLM_BATCH_TOKEN_BUDGET", 12000)  # est. input tokens per request
+LLM_BATCH_MAX_OUTPUT   = _get_int("LLM_BATCH_MAX_OUTPUT", 4096)     # model output limit
+LLM_LINE_CHUNK         = _get_int("LLM_LINE_CHUNK", 40)    # line items per request for long invoices (0 = off)
+
+# daily batch normalization backend: "ondemand" (InvokeModel) or "batch-inference"
+# (Bedrock model-invocation job, collected by a later run)
+NORMALIZE_BACKEND           = os.getenv("NORMALIZE_BACKEND", "ondemand")
+BEDROCK_BATCH_ROLE_ARN      = os.getenv("BEDROCK_BATCH_ROLE_ARN", "")
+BATCH_INFERENCE_MIN_RECORDS = _get_int("BATCH_INFERENCE_MIN_RECORDS", 100)  # Bedrock job minimum
+
+# content-addressed result cache (under PROCESSED_BUCKET)
+CACHE_ENABLED    = _get_bool("CACHE_ENABLED", "true")
+CACHE_PREFIX     = os.getenv("CACHE_PREFIX", "cache/")
+
+# processed payloads: parsed.json encoding (common/codec.py) and DynamoDB item shape
+PAYLOAD_ENCODING = os.getenv("PAYLOAD_ENCODING", "identity")  # identity|gzip|zstd (zstd: zstandard package)
+DDB_ITEM_MODE    = os.getenv("DDB_ITEM_MODE", "slim")    # slim: index fields + S3 pointer; full: + both maps
+
+# per-day manifest of processed outputs (common/manifest.py), read instead of LIST
+MANIFEST_ENABLED = _get_bool("MANIFEST_ENABLED", "true")
+MANIFEST_COMPACT_MIN = _get_int("MANIFEST_COMPACT_MIN", 100)  # sqs_consumer compacts a day at this many entries
+
+# client-side rate limiting per Lambda instance (common/ratelimit.py): account
+# quotas are shared, so use quota / instances running at once
+BEDROCK_RPS       = float(os.getenv("BEDROCK_RPS", "5"))
+BEDROCK_TPM       = _get_int("BEDROCK_TPM", 200000)       # input + max output tokens/min (0 = off)
+TEXTRACT_RPS      = float(os.getenv("TEXTRACT_RPS", "2"))   # AnalyzeExpense + StartExpenseAnalysis
+TEXTRACT_GET_RPS  = float(os.getenv("TEXTRACT_GET_RPS", "5"))
+RATE_MIN_RPS      = float(os.getenv("RATE_MIN_RPS", "0.1"))  # AIMD floor
+RATE_MAX_ATTEMPTS = _get_int("RATE_MAX_ATTEMPTS", 6)      # throttled/transient retries, full jitter
+
+# botocore client tuning (see common/aws.py)
+AWS_MAX_POOL         = _get_int("AWS_MAX_POOL", 50)          # default botocore pool is 10
+AWS_MAX_ATTEMPTS     = _get_int("AWS_MAX_ATTEMPTS", 5)       # adaptive retry mode
+AWS_CONNECT_TIMEOUT  = _get_int("AWS_CONNECT_TIMEOUT", 5)
+AWS_READ_TIMEOUT     = _get_int("AWS_READ_TIMEOUT", 60)
+BEDROCK_READ_TIMEOUT = _get_int("BEDROCK_READ_TIMEOUT", 120)
@@ -0,0 +1,63 @@
+# src/common/fanout.py
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+def _timings(wall_start, durations):
+    durations = sorted(durations)
+    n = len(durations)
+    return {
+        "wall_ms": round((time.perf_counter() - wall_start) * 1000, 1),
+        "busy_ms": round(sum(durations), 1),
+        "max_ms": round(durations[-1], 1) if n else 0.0,
+        "p50_ms": round(durations[n // 2], 1) if n else 0.0,
+    }
+
+def _call(fn, item):
+    t0 = time.perf_counter()
+    try:
+        return fn(item), None, (time.perf_counter() - t0) * 1000
+    except Exception as e:  # isolate failures per item
+        return None, f"{type(e).__name__}: {e}", (time.perf_counter() - t0) * 1000
+
+def run_bounded(items, fn, workers: int = 8, label=str) -> dict:
+    """
+    Run fn(item) for every item with at most `workers` calls in flight.
+    `items` is consumed lazily, so a paginated S3 listing keeps producing
+    while earlier keys are still being processed. One failing item never
+    aborts the run; its error is recorded instead.
+
+    Returns {"succeeded": [...], "failed": [...], "timings": {...}} where each
+    entry carries the item label and its duration in ms.
+    """
+    wall_start = time.perf_counter()
+    succeeded, failed, durations = [], [], []
+
+    def _record(item, result, error, ms):
+        durations.append(ms)
+        entry = {"key": label(item), "ms": round(ms, 1)}
+        if error is None:
+            entry["result"] = result
+            succeeded.append(entry)
+        else:
+            entry["error"] = error
+            failed.append(entry)
+
+    if workers <= 1:
+        for item in items:
+            _record(item, *_call(fn, item))
+        return {"succeeded": succeeded, "failed": failed, "timings": _timings(wall_start, durations)}
+
+    # keep a small backlog beyond the pool size so workers never idle on listing
+    max_pending = workers * 2
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout") as pool:
+        for item in items:
+            pending[pool.submit(_call, fn, item)] = item
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    _record(pending.pop(fut), *fut.result())
+        for fut in list(pending):
+            _record(pending.pop(fut), *fut.result())
+
+    return {"succeeded": succeeded, "failed": failed, "timings": _timings(wall_start, durations)}
@@ -0,0 +1,63 @@
+# src/common/idempotency.py
+import time
+from .cache import clean_etag
+
+BATCH_GET_MAX = 100  # DynamoDB BatchGetItem limit per request
+
+class ProcessedFilter:
+    """
+    Pre-flight check for the daily batch: drops listed objects whose DynamoDB
+    item already exists with the same raw ETag, before any Textract call.
+
+    Lookups are batched (100 keys per BatchGetItem) and only project
+    invoice_id + raw_etag + status. Items marked pending/error (process.mark)
+    are retried; items written before raw_etag or status were recorded count
+    as processed. `skipped` / `checked` are filled in as the listing is consumed.
+    """
+
+    def __init__(self, ddb, table_name: str, id_for_key, max_retries: int = 5):
+        self.ddb = ddb
+        self.table_name = table_name
+        self.id_for_key = id_for_key
+        self.max_retries = max_retries
+        self.checked = 0
+        self.skipped = 0
+
+    def _existing(self, ids) -> dict:
+        """invoice_id -> (stored raw_etag or '', status or None) for ids that exist."""
+        found = {}
+        request = {self.table_name: {
+            "Keys": [{"invoice_id": i} for i in ids],
+            "ProjectionExpression": "invoice_id, raw_etag, #s",
+            "ExpressionAttributeNames": {"#s": "status"},   # a reserved word
+        }}
+        for attempt in range(self.max_retries + 1):
+            resp = self.ddb.batch_get_item(RequestItems=request)
+            for item in resp.get("Responses", {}).get(self.table_name, []):
+                found[item["invoice_id"]] = (item.get("raw_etag") or "", item.get("status"))
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                return found
+            time.sleep(min(2.0, 0.05 * (2 ** attempt)))
+        raise RuntimeError(f"BatchGetItem left unprocessed keys on {self.table_name} after {self.max_retries} retries")
+
+    def _flush(self, buf):
+        existing = self._existing(list({self.id_for_key(o["key"]) for o in buf}))
+        for o in buf:
+            stored, status = existing.get(self.id_for_key(o["key"]), (None, None))
+            if stored is not None and status in (None, "done") and (not stored or stored == clean_etag(o.get("etag"))):
+                self.skipped += 1
+                continue
+            yield o
+
+    def filter(self, objects):
+        """Yield only new or changed objects from an iterable of {"key", "etag", ...}."""
+        buf = []
+        for o in objects:
+            self.checked += 1
+            buf.append(o)
+            if len(buf) >= BATCH_GET_MAX:
+                yield from self._flush(buf)
+                buf = []
+        if buf:
+            yield from self._flush(buf)
@@ -0,0 +1,67 @@
+# src/common/jsonstream.py
+# Finds the first top-level JSON value in streamed model output as soon as it closes.
+import re
+
+_SPECIAL = re.compile(r'[{}\[\]"\\]')
+
+class JsonScanner:
+    def __init__(self, opener: str = "{"):
+        self.opener = opener
+        self.pieces = []
+        self.pos = 0            # characters fed so far
+        self.start = None       # absolute index of the opener
+        self.end = None         # absolute index just past the closer
+        self.depth = 0
+        self.in_str = False
+        self.skip = -1          # absolute index of a backslash-escaped character
+
+    @property
+    def done(self) -> bool:
+        return self.end is not None
+
+    def feed(self, piece: str) -> bool:
+        """Add streamed text; True once the top-level value is complete (later text is ignored)."""
+        if self.end is not None:
+            return True
+        base = self.pos
+        self.pieces.append(piece)
+        self.pos += len(piece)
+        i = 0
+        if self.start is None:
+            i = piece.find(self.opener)
+            if i < 0:
+                return False
+            self.start, self.depth = base + i, 1
+            i += 1
+        for m in _SPECIAL.finditer(piece, i):
+            at = base + m.start()
+            if at == self.skip:
+                continue
+            ch = m.group()
+            if self.in_str:
+                if ch == "\\":
+                    self.skip = at + 1
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = at + 1
+                    return True
+        return False
+
+    def text(self) -> str:
+        """The value seen so far (complete once `done`); "" before the opener."""
+        if self.start is None:
+            return ""
+        s = "".join(self.pieces)
+        return s[self.start:self.end]
+
+def first_json(text: str, opener: str = "{") -> str | None:
+    """The first complete top-level JSON object/array in `text`, or None."""
+    sc = JsonScanner(opener)
+    return sc.text() if sc.feed(text or "") else None
@@ -1,10 +1,13 @@
 # src/common/llm_client.py
-import os, json, boto3
-from botocore.exceptions import ClientError
-from .config import BEDROCK_MODEL_ID, BEDROCK_REGION  # uses safe defaults
+import os, json, time
+from .config import BEDROCK_MODEL_ID, BEDROCK_REGION, BEDROCK_PROMPT_CACHE, BEDROCK_STREAM  # uses safe defaults
+from . import aws, ratelimit
+from .compact import estimate_tokens
+from .jsonstream import JsonScanner
 
 def _client():
-    return boto3.client("bedrock-runtime", region_name=BEDROCK_REGION)
+    # cached per region; reuses pooled connections across calls and invocations
+    return aws.client("bedrock-runtime", BEDROCK_REGION)
 
 def _is_anthropic(model_id: str) -> bool:
     return model_id.startswith("anthropic.")
@@ -12,10 +15,12 @@ def _is_anthropic(model_id: str) -> bool:
 def _is_llama(model_id: str) -> bool:
     return model_id.startswith("meta.llama")
 
-def invoke_bedrock_claude(messages):
+def build_claude_body(messages, max_tokens: int = 2048) -> dict:
     """
     messages: list of {"role": "user"|"assistant"|"system", "content": "text"}
     Convert 'system' entries to top-level system; content must be array blocks.
+    A message flagged {"cache": True} ends the static prompt prefix; with
+    BEDROCK_PROMPT_CACHE on it becomes a cache point (cache_control block).
     """
     system_chunks, anthro_msgs = [], []
     for m in messages:
@@ -27,50 +32,185 @@ def invoke_bedrock_claude(messages):
             continue
         if role not in ("user", "assistant"):
             role = "user"
-        anthro_msgs.append({"role": role, "content": [{"type": "text", "text": text}]})
+        block = {"type": "text", "text": text}
+        if m.get("cache") and BEDROCK_PROMPT_CACHE:
+            block["cache_control"] = {"type": "ephemeral"}
+        anthro_msgs.append({"role": role, "content": [block]})
 
     body = {
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 2048,
+        "max_tokens": max_tokens,
         "messages": anthro_msgs,
         "temperature": 0
     }
     if system_chunks:
         body["system"] = "\n".join(system_chunks)
+    return body
 
+def build_llama_body(prompt: str, max_tokens=1500, temperature=0) -> dict:
+    return {
+        "prompt": prompt,
+        "max_gen_len": max_tokens,
+        "temperature": temperature,
+        "top_p": 0.9
+    }
+
+def _used_tokens(payload: dict) -> int | None:
+    # what counts against the tokens-per-minute quota: input (incl. cache) + output
+    if "generation" in payload:
+        return (payload.get("prompt_token_count") or 0) + (payload.get("generation_token_count") or 0)
+    u = payload.get("usage")
+    return sum(v for k, v in u.items() if k.endswith("_tokens") and isinstance(v, int)) if u else None
+
+def _reserved_tokens(raw: str, body: dict) -> int:
+    return estimate_tokens(raw) + (body.get("max_tokens") or body.get("max_gen_len") or 0)
+
+def _failed(e):
+    return RuntimeError(f"Bedrock invoke failed (model='{BEDROCK_MODEL_ID}', region='{BEDROCK_REGION}'): {e}")
+
+def invoke_model_body(body: dict) -> dict:
+    """
+    Send a pre-built request body to BEDROCK_MODEL_ID; returns the decoded response.
+    Goes through the "bedrock" rate limiter, reserving the estimated input plus
+    max output tokens and settling with the reported usage.
+    """
+    from botocore.exceptions import ClientError
+    raw = json.dumps(body)
+    lim = ratelimit.get("bedrock")
+    reserved = _reserved_tokens(raw, body)
     try:
-        resp = _client().invoke_model(
+        resp = lim.call(lambda: _client().invoke_model(
             modelId=BEDROCK_MODEL_ID,
             contentType="application/json",
             accept="application/json",
-            body=json.dumps(body),
-        )
+            body=raw,
+        ), tokens=reserved)
     except ClientError as e:
-        raise RuntimeError(f"Bedrock invoke failed (model='{BEDROCK_MODEL_ID}', region='{BEDROCK_REGION}'): {e}") from e
-
+        raise _failed(e) from e
     payload = json.loads(resp["body"].read())
-    parts = payload.get("content", [])
-    return "".join(p.get("text", "") for p in parts if p.get("type") == "text")
+    used = _used_tokens(payload)
+    lim.settle(reserved, reserved if used is None else used)
+    return payload
 
-def invoke_bedrock_llama(prompt: str, max_tokens=1500, temperature=0):
+def _stream_text(data: dict, usage: dict) -> str:
+    # one decoded stream chunk -> its text delta; token counts are collected into `usage`
+    kind = data.get("type")
+    if kind == "content_block_delta":
+        return (data.get("delta") or {}).get("text") or ""
+    if kind == "message_start":
+        usage.update((data.get("message") or {}).get("usage") or {})
+    elif kind == "message_delta":
+        usage.update(data.get("usage") or {})
+    elif "generation" in data:   # Llama
+        for k in ("prompt_token_count", "generation_token_count"):
+            if data.get(k) is not None:
+                usage[k] = data[k]
+        return data.get("generation") or ""
+    return ""
+
+def invoke_model_stream(body: dict, until: str | None = "{", timing: dict | None = None) -> dict:
     """
-    For meta.llama3* models on Bedrock. Simple prompt format.
+    InvokeModelWithResponseStream with early termination: text deltas feed a
+    JsonScanner and the stream is closed as soon as the first top-level JSON
+    value opened by `until` ("{" or "[") is complete, so trailing prose is
+    never waited for. Returns a payload shaped like invoke_model's, so
+    text_from_output works unchanged. `timing`, when given, gets ttft_ms
+    (request to first text), gen_ms (first to last text used), total_ms and
+    stopped_early; output tokens are estimated when the stream was cut.
     """
-    body = {
-        "prompt": prompt,
-        "max_gen_len": max_tokens,
-        "temperature": temperature,
-        "top_p": 0.9
-    }
+    from botocore.exceptions import ClientError
+    raw = json.dumps(body)
+    lim = ratelimit.get("bedrock")
+    reserved = _reserved_tokens(raw, body)
+    t0 = time.perf_counter()
     try:
-        resp = _client().invoke_model(
+        resp = lim.call(lambda: _client().invoke_model_with_response_stream(
             modelId=BEDROCK_MODEL_ID,
             contentType="application/json",
             accept="application/json",
-            body=json.dumps(body),
-        )
+            body=raw,
+        ), tokens=reserved)
     except ClientError as e:
-        raise RuntimeError(f"Bedrock invoke failed (model='{BEDROCK_MODEL_ID}', region='{BEDROCK_REGION}'): {e}") from e
+        raise _failed(e) from e
 
-    out = json.loads(resp["body"].read())
-    return out.get("generation", "")
+    scanner = JsonScanner(until) if until else None
+    pieces, usage, first, stopped = [], {}, None, False
+    stream = resp["body"]
+    try:
+        for event in stream:
+            chunk = event.get("chunk")
+            if chunk is None:   # modelStreamErrorException, throttlingException, ... mid-stream
+                raise _failed(next(iter(event), "stream error"))
+            text = _stream_text(json.loads(chunk["bytes"]), usage)
+            if not text:
+                continue
+            if first is None:
+                first = time.perf_counter()
+            pieces.append(text)
+            if scanner is not None and scanner.feed(text):
+                stopped = True
+                break
+    except Exception:
+        # the request was billed for its input and what streamed so far, not the whole reservation
+        lim.settle(reserved, estimate_tokens(raw) + estimate_tokens("".join(pieces)))
+        raise
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    end = time.perf_counter()
+
+    text = "".join(pieces)
+    llama = "generation_token_count" in usage or "prompt_token_count" in usage
+    out_key = "generation_token_count" if llama else "output_tokens"
+    if stopped or not usage.get(out_key):
+        usage[out_key] = estimate_tokens(text)
+    used = _used_tokens({"generation": "", **usage} if llama else {"usage": usage})
+    lim.settle(reserved, reserved if used is None else used)
+    if timing is not None:
+        timing.update({"ttft_ms": round(((first or end) - t0) * 1000, 1),
+                       "gen_ms": round((end - (first or end)) * 1000, 1),
+                       "total_ms": round((end - t0) * 1000, 1), "stopped_early": stopped})
+    if llama:
+        return {"generation": text, **usage}
+    return {"content": [{"type": "text", "text": text}], "usage": usage}
+
+def _invoke_body(body: dict, until: str | None, timing: dict | None) -> dict:
+    if BEDROCK_STREAM:
+        return invoke_model_stream(body, until=until, timing=timing)
+    t0 = time.perf_counter()
+    payload = invoke_model_body(body)
+    if timing is not None:
+        timing["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return payload
+
+def text_from_output(payload: dict, usage: dict | None = None) -> str:
+    """Generated text from a Claude or Llama response body (also used for batch job output)."""
+    if "generation" in payload:
+        if usage is not None:
+            usage.update({"input_tokens": payload.get("prompt_token_count"),
+                          "output_tokens": payload.get("generation_token_count")})
+        return payload.get("generation", "")
+    if usage is not None:
+        usage.update(payload.get("usage") or {})
+    parts = payload.get("content", [])
+    return "".join(p.get("text", "") for p in parts if p.get("type") == "text")
+
+def invoke_bedrock_claude(messages, usage: dict | None = None, max_tokens: int = 2048,
+                          timing: dict | None = None, until: str | None = "{"):
+    """
+    See build_claude_body for the message format. `usage`, when given, is
+    filled with the response token counts (incl. cache read/write tokens),
+    `timing` with latencies. With BEDROCK_STREAM the response is streamed and
+    cut once the JSON value opened by `until` closes (None reads it all).
+    """
+    payload = _invoke_body(build_claude_body(messages, max_tokens=max_tokens), until, timing)
+    return text_from_output(payload, usage)
+
+def invoke_bedrock_llama(prompt: str, max_tokens=1500, temperature=0, usage: dict | None = None,
+                         timing: dict | None = None, until: str | None = "{"):
+    """
+    For meta.llama3* models on Bedrock. Simple prompt format.
+    """
+    payload = _invoke_body(build_llama_body(prompt, max_tokens, temperature), until, timing)
+    return text_from_output(payload, usage)
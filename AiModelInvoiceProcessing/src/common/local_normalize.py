@@ -0,0 +1,276 @@
+# src/common/local_normalize.py
+# Deterministic normalizer: parse_textract_expense output -> prompt.SCHEMA, without Bedrock.
+import re, datetime
+from decimal import Decimal, InvalidOperation
+
+from .config import SUM_TOLERANCE
+
+# --------------------------
+# Dates
+# --------------------------
+_MONTHS = {}
+for _names in (
+    ("january", "february", "march", "april", "may", "june", "july", "august",
+     "september", "october", "november", "december"),
+    ("janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+     "septembre", "octobre", "novembre", "décembre"),
+    ("januar", "februar", "märz", "april", "mai", "juni", "juli", "august",
+     "september", "oktober", "november", "dezember"),
+    ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+     "septiembre", "octubre", "noviembre", "diciembre"),
+    ("gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno", "luglio", "agosto",
+     "settembre", "ottobre", "novembre", "dicembre"),
+    ("januari", "februari", "maart", "april", "mei", "juni", "juli", "augustus",
+     "september", "oktober", "november", "december"),
+):
+    for _i, _n in enumerate(_names, 1):
+        _MONTHS[_n] = _i
+        _MONTHS.setdefault(_n[:3], _i)
+        _MONTHS.setdefault(_n[:4], _i)   # "sept", "janv", "févr"
+_MONTHS.update({"mrz": 3, "maerz": 3, "fevrier": 2, "aout": 8, "decembre": 12, "sep": 9})
+
+_ISO = re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})")
+_NUMERIC = re.compile(r"^(\d{1,2})([-/.])(\d{1,2})\2(\d{2}|\d{4})$")
+_ORDINAL = re.compile(r"(\d)(st|nd|rd|th|er|e|º|°)\b")
+
+def _year(y: int) -> int:
+    return y if y >= 100 else (2000 + y if y < 70 else 1900 + y)
+
+def _iso(y, m, d) -> str:
+    try:
+        return datetime.date(_year(int(y)), int(m), int(d)).isoformat()
+    except ValueError:
+        return ""
+
+def parse_date(text, day_first: bool | None = None, notes: list | None = None) -> str:
+    """
+    ISO date from "2025-10-04", "04/10/2025", "10/4/25", "4.10.2025",
+    "4 Oct 2025", "October 4th, 2025", "4 octobre 2025", ... or "".
+    `day_first` settles dd/mm vs mm/dd when both parts are <= 12; when it is
+    None such dates are read month-first and reported as date_ambiguous.
+    """
+    s = (text or "").strip().lower()
+    if not s:
+        return ""
+    m = _ISO.match(s)
+    if m:
+        return _iso(*m.groups())
+    m = _NUMERIC.match(s)
+    if m:
+        a, sep, b, y = int(m.group(1)), m.group(2), int(m.group(3)), m.group(4)
+        if a > 12:
+            return _iso(y, b, a)
+        if b > 12 or a == b:
+            return _iso(y, a, b)
+        if sep == ".":                   # dd.mm.yyyy is day-first everywhere it is used
+            return _iso(y, b, a)
+        if day_first is None and notes is not None:
+            notes.append("date_ambiguous")
+        return _iso(y, b, a) if day_first else _iso(y, a, b)
+
+    s = _ORDINAL.sub(r"\1", s)
+    words = re.findall(r"[^\W\d_]+", s)
+    nums = re.findall(r"\d+", s)
+    month = next((_MONTHS[w.rstrip(".")] for w in words if w.rstrip(".") in _MONTHS), None)
+    if month is None or len(nums) != 2:
+        return ""
+    a, b = nums
+    if len(a) == 4 or (len(b) <= 2 and int(a) > 31):
+        a, b = b, a                      # year first: "2025 Oct 4"
+    return _iso(b, month, a)
+
+# --------------------------
+# Currency
+# --------------------------
+CURRENCY_CODES = {
+    "USD", "EUR", "GBP", "JPY", "CHF", "CAD", "AUD", "NZD", "CNY", "HKD", "SGD", "INR",
+    "SEK", "NOK", "DKK", "PLN", "CZK", "HUF", "RON", "TRY", "ZAR", "BRL", "MXN", "KRW",
+    "ILS", "AED", "SAR", "RUB", "THB", "MYR", "IDR", "PHP",
+}
+# longest first so "US$" wins over "$"
+_SYMBOLS = [("US$", "USD"), ("CA$", "CAD"), ("AU$", "AUD"), ("NZ$", "NZD"), ("HK$", "HKD"),
+            ("C$", "CAD"), ("A$", "AUD"), ("S$", "SGD"), ("R$", "BRL"), ("€", "EUR"), ("£", "GBP"),
+            ("¥", "JPY"), ("₹", "INR"), ("₩", "KRW"), ("₽", "RUB"), ("₺", "TRY"), ("₪", "ILS"),
+            ("zł", "PLN"), ("Kč", "CZK"), ("Fr.", "CHF")]
+_CODE = re.compile(r"\b([A-Z]{3})\b")
+
+def day_first_for(currency: str | None) -> bool | None:
+    # numeric dates follow the currency's convention (US month-first); unknown currency is ambiguous
+    return None if not currency else currency != "USD"
+
+def detect_currency(*texts, notes: list | None = None) -> str:
+    """ISO code from the first text carrying a code or symbol; a bare "$" is read as USD (currency_guessed)."""
+    dollar = False
+    for t in texts:
+        t = (t or "").strip()
+        for code in _CODE.findall(t.upper()):
+            if code in CURRENCY_CODES:
+                return code
+        for sym, code in _SYMBOLS:
+            if sym in t:
+                return code
+        dollar = dollar or "$" in t
+    if notes is not None:
+        notes.append("currency_guessed" if dollar else "currency_missing")
+    return "USD" if dollar else ""
+
+# --------------------------
+# Numbers
+# --------------------------
+_DEC_COMMA = re.compile(r"\d,\d{1,2}$")
+_DEC_POINT = re.compile(r"\d\.\d{1,2}$")
+
+def decimal_hint(*texts) -> str | None:
+    """',' or '.' when some amount on the invoice shows its decimal separator unambiguously."""
+    for t in texts:
+        s = re.sub(r"[^\d.,]", "", str(t or ""))
+        if _DEC_COMMA.search(s):
+            return ","
+        if _DEC_POINT.search(s):
+            return "."
+    return None
+
+def parse_amount(text, decimal: str | None = None):
+    """
+    Decimal from US ("1,234.50"), European ("1.234,50", "1 234,50", "12,5")
+    and Swiss ("1'234.50") amounts, with currency signs, "(12.00)" and
+    trailing minus as negatives. Returns None if nothing numeric is found.
+    `decimal` breaks ties such as "1,234" / "1.234".
+    """
+    s = str(text or "").strip()
+    neg = s.startswith("(") and s.endswith(")") or s.startswith("-") or s.endswith("-")
+    s = re.sub(r"[^\d.,]", "", s)
+    if not s or not any(ch.isdigit() for ch in s):
+        return None
+    if "," in s and "." in s:
+        dec = "," if s.rfind(",") > s.rfind(".") else "."
+    elif "," in s or "." in s:
+        sep = "," if "," in s else "."
+        head, _, tail = s.rpartition(sep)
+        if s.count(sep) > 1:
+            dec = None                   # "1.234.567" / "1,234,567"
+        elif len(tail) == 3:
+            dec = sep if decimal == sep else None
+        else:
+            dec = sep
+    else:
+        dec = None
+    if dec:
+        thousands = "." if dec == "," else ","
+        s = s.replace(thousands, "").replace(dec, ".")
+    else:
+        s = s.replace(",", "").replace(".", "")
+    try:
+        v = Decimal(s)
+    except InvalidOperation:
+        return None
+    return -v if neg else v
+
+def _money(d) -> str:
+    return "" if d is None else f"{d:.2f}"
+
+def _qty(d) -> str:
+    if d is None:
+        return ""
+    s = f"{d:f}"
+    return s.rstrip("0").rstrip(".") if "." in s else s
+
+def _score(c) -> str:
+    return f"{max(0, min(100, c or 0)) / 100:.2f}"
+
+def reconciles(line_sum, subtotal, tax, total) -> bool:
+    """Line items add up to the subtotal, the total, or total minus tax."""
+    if line_sum is None:
+        return False
+    tol = Decimal(SUM_TOLERANCE)
+    targets = [t for t in (subtotal, total, (total - tax) if total is not None and tax is not None else None)
+               if t is not None]
+    return any(abs(line_sum - t) <= tol for t in targets)
+
+# --------------------------
+# Invoice
+# --------------------------
+def normalize_local(parsed: dict, notes: list | None = None) -> dict:
+    """
+    prompt.SCHEMA-shaped result from the deterministic parse. Missing subtotal,
+    tax, total, line amounts and unit prices are derived where the other
+    values allow it. Problems are appended to `notes`:
+
+      date_unparsed          invoice_date present but not understood
+      date_ambiguous         nn/nn/yyyy with no currency to settle the order; read month-first
+      currency_missing       no currency code or symbol anywhere
+      currency_guessed       only a bare "$" seen; USD assumed
+      amount_unparsed:<f>    field <f> (subtotal, tax, total, line_items.<i>.qty, ...) is not an amount
+      sum_mismatch           line items do not reconcile with subtotal/total
+      totals_inconsistent    subtotal + tax differs from total by more than SUM_TOLERANCE
+    """
+    notes = [] if notes is None else notes
+    p = parsed or {}
+    confs = (p.get("meta") or {}).get("confidence") or {}
+    items = p.get("line_items") or []
+
+    currency = detect_currency(p.get("currency"), p.get("total"), p.get("subtotal"),
+                               *(li.get("amount") for li in items), notes=notes)
+    dec = decimal_hint(p.get("total"), p.get("subtotal"), p.get("tax"),
+                       *(li.get("amount") for li in items), *(li.get("unit_price") for li in items))
+
+    date_text = p.get("invoice_date") or ""
+    date_iso = parse_date(date_text, day_first=day_first_for(currency), notes=notes)
+    if date_text and not date_iso:
+        notes.append("date_unparsed")
+
+    def num(field, text):
+        v = parse_amount(text, dec)
+        if v is None and (text or "").strip():
+            notes.append(f"amount_unparsed:{field}")
+        return v
+
+    subtotal, tax, total = num("subtotal", p.get("subtotal")), num("tax", p.get("tax")), num("total", p.get("total"))
+
+    lines, line_sum, complete = [], Decimal(0), bool(items)
+    for i, li in enumerate(items):
+        qty, unit = num(f"line_items.{i}.qty", li.get("qty")), num(f"line_items.{i}.unit_price", li.get("unit_price"))
+        amt = num(f"line_items.{i}.amount", li.get("amount"))
+        if amt is None and qty is not None and unit is not None:
+            amt = (qty * unit).quantize(Decimal("0.01"))
+        if unit is None and amt is not None and qty:
+            unit = (amt / qty).quantize(Decimal("0.01"))
+        if amt is None:
+            complete = False
+        else:
+            line_sum += amt
+        lines.append({"description": (li.get("description") or "").strip(), "qty": _qty(qty),
+                      "unit_price": _money(unit), "amount": _money(amt)})
+    line_sum = line_sum if complete else None
+
+    if subtotal is None and line_sum is not None and (tax is not None or total is None):
+        subtotal = line_sum
+    if tax is None and subtotal is not None and total is not None:
+        tax = total - subtotal
+    if total is None and subtotal is not None:
+        total = subtotal + (tax or 0)
+
+    sum_ok = reconciles(line_sum, subtotal, tax, total)
+    if items and not sum_ok:
+        notes.append("sum_mismatch")
+    if subtotal is not None and tax is not None and total is not None \
+            and abs(subtotal + tax - total) > Decimal(SUM_TOLERANCE):
+        notes.append("totals_inconsistent")
+
+    vendor = (p.get("vendor") or "").strip()
+    number = (p.get("invoice_number") or "").strip()
+    present = sum(bool(x) for x in (vendor, number, date_iso, currency, total is not None))
+    min_conf = min(confs.values()) if confs else 0
+    return {
+        "vendor": {"name": vendor, "country_hint": ""},
+        "invoice": {"number": number, "date_iso": date_iso, "currency": currency},
+        "totals": {"subtotal": _money(subtotal), "tax": _money(tax), "total": _money(total)},
+        "line_items": lines,
+        "confidence": {
+            "structure": _score(min_conf * present / 5),
+            "vendor": _score(confs.get("vendor") if vendor else 0),
+            "totals": _score((confs.get("total") or 0) * (1 if sum_ok else 0.5) if total is not None else 0),
+            "lines": _score((confs.get("line_items") or 0) * (1 if complete else 0.5)),
+        },
+        "validations": {"sum_matches_total": sum_ok},
+    }
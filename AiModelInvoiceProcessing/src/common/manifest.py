@@ -0,0 +1,146 @@
+# src/common/manifest.py
+# Best-effort per-day index of processed invoices under invoices/processed/YYYY/MM/DD/_manifest/.
+import json, hashlib
+
+from .cache import _MISSING
+
+SHARD_DIR = "_manifest/"
+COMPACT = "compact.jsonl"
+_CONFLICT = {"PreconditionFailed", "ConditionalRequestConflict", "412", "409"}
+
+def _code(e) -> str | None:
+    return (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+
+def day_prefix(processed_key: str) -> str:
+    """invoices/processed/YYYY/MM/DD/<id>/parsed.json -> invoices/processed/YYYY/MM/DD/"""
+    return processed_key.rstrip("/").rsplit("/", 2)[0] + "/"
+
+def manifest_prefix(processed_key: str) -> str:
+    """invoices/processed/YYYY/MM/DD/<id>/parsed.json -> invoices/processed/YYYY/MM/DD/_manifest/"""
+    return day_prefix(processed_key) + SHARD_DIR
+
+def entry_key(prefix: str, invoice_id: str) -> str:
+    return f"{prefix}{invoice_id}.json"
+
+def append(s3, bucket: str, entry: dict) -> None:
+    """Record one attempt for entry["key"] (a processed parsed.json key); the latest attempt wins."""
+    key = entry_key(manifest_prefix(entry["key"]), entry["invoice_id"])
+    s3.put_object(Bucket=bucket, Key=key, Body=_encode([entry]), ContentType="application/json")
+
+def _encode(entries) -> bytes:
+    return b"".join((json.dumps(e, separators=(",", ":"), default=str) + "\n").encode("utf-8") for e in entries)
+
+def _lines(body: bytes):
+    for raw in body.splitlines():
+        try:
+            yield json.loads(raw)
+        except ValueError:
+            continue
+
+def _latest(entries, out: dict | None = None) -> dict:
+    # key -> newest entry by "ts" (backfilled entries have none and lose to real attempts)
+    out = {} if out is None else out
+    for e in entries:
+        if isinstance(e, dict) and e.get("key"):
+            cur = out.get(e["key"])
+            if cur is None or (e.get("ts") or 0) >= (cur.get("ts") or 0):
+                out[e["key"]] = e
+    return out
+
+def _read(s3, bucket: str, key: str) -> tuple:
+    # (body, ETag) or (b"", None) when the object doesn't exist
+    try:
+        o = s3.get_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        if _code(e) in _MISSING:
+            return b"", None
+        raise
+    return o["Body"].read(), o.get("ETag")
+
+def listing(s3, bucket: str, prefix: str) -> list:
+    """[(key, ETag)] of every object under a day's _manifest/ (`prefix` is the day prefix)."""
+    out, token = [], None
+    while True:
+        kw = {"Bucket": bucket, "Prefix": prefix + SHARD_DIR, "MaxKeys": 1000}
+        if token:
+            kw["ContinuationToken"] = token
+        resp = s3.list_objects_v2(**kw)
+        out += [(o["Key"], o.get("ETag", "")) for o in resp.get("Contents", []) or []]
+        if not resp.get("IsTruncated"):
+            return out
+        token = resp.get("NextContinuationToken")
+
+def _collect(s3, bucket: str, objs: list) -> dict:
+    latest = {}
+    for key, _ in sorted(objs, key=lambda o: not o[0].endswith(COMPACT)):   # compact.jsonl first
+        _latest(_lines(_read(s3, bucket, key)[0]), latest)
+    return latest
+
+def read(s3, bucket: str, prefix: str) -> tuple:
+    """
+    (entries sorted by key, fingerprint) for the day at `prefix`
+    ("invoices/processed/YYYY/MM/DD/"), or (None, None) without a manifest.
+    """
+    objs = listing(s3, bucket, prefix)
+    if not objs:
+        return None, None
+    h = hashlib.sha256()
+    for key, etag in objs:
+        h.update(f"{key}\t{etag}\n".encode("utf-8"))
+    latest = _collect(s3, bucket, objs)
+    return [latest[k] for k in sorted(latest)], "manifest:" + h.hexdigest()[:32]
+
+def _put_compact(s3, bucket: str, key: str, body: bytes, etag: str | None) -> None:
+    # conditional so two compactions can't drop each other's merge; boto3 < 1.35.70 lacks IfMatch
+    cond = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    try:
+        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType="application/x-ndjson", **cond)
+    except Exception as e:
+        if type(e).__name__ != "ParamValidationError":
+            raise
+        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType="application/x-ndjson")
+
+def _merge(s3, bucket: str, prefix: str, fn, attempts: int = 5) -> None:
+    key = prefix + SHARD_DIR + COMPACT
+    for attempt in range(attempts):
+        body, etag = _read(s3, bucket, key)
+        try:
+            _put_compact(s3, bucket, key, fn(body), etag)
+            return
+        except Exception as e:
+            if _code(e) not in _CONFLICT or attempt == attempts - 1:
+                raise
+
+def compact(s3, bucket: str, prefix: str, min_shards: int = 1) -> int:
+    """
+    Merge a day's per-invoice entries into compact.jsonl and delete them;
+    returns entries merged (0 while there are fewer than `min_shards`).
+    """
+    shards = [k for k, _ in listing(s3, bucket, prefix) if not k.endswith(COMPACT)]
+    if not shards or len(shards) < min_shards:
+        return 0
+    merged, read = {}, {}
+    for key in shards:
+        body, etag = _read(s3, bucket, key)
+        if etag is None:
+            continue        # deleted by a concurrent compaction
+        read[key] = etag
+        _latest(_lines(body), merged)
+    if not read:
+        return 0
+    _merge(s3, bucket, prefix, lambda body: _encode(_latest(merged.values(), _latest(_lines(body))).values()))
+    # re-list: a shard rewritten by a newer attempt since it was read stays for the next compaction
+    current = dict(listing(s3, bucket, prefix))
+    done = [k for k, etag in read.items() if current.get(k) == etag]
+    for i in range(0, len(done), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in done[i:i + 1000]],
+                                                 "Quiet": True})
+    return len(read)
+
+def backfill(s3, bucket: str, prefix: str, entries) -> int:
+    """Add entries for keys the day's manifest doesn't list yet (outputs written before it existed)."""
+    known = set(_collect(s3, bucket, listing(s3, bucket, prefix)))
+    new = [e for e in entries if e["key"] not in known]
+    if new:
+        _merge(s3, bucket, prefix, lambda body: _encode(_latest(new, _latest(_lines(body))).values()))
+    return len(new)
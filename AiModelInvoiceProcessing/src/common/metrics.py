@@ -1,6 +1,15 @@
 # src/common/metrics.py
-import math
-from typing import Dict, Any, List, Tuple
+import re, math
+from typing import Dict, Any, List, Tuple, Iterable
+
+try:  # bulk scoring only (compare_bulk); compare_case needs nothing
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 FIELDS = [
     "vendor.name",
@@ -87,3 +96,164 @@ def compare_case(source_parse: Dict[str, Any], llm_norm: Dict[str, Any]) -> Dict
         "sum_matches_total": sum_ok,
         "confidence": conf,
     }
+
+
+# --------------------------
+# Bulk (columnar) scoring: same results as compare_case, one column per metric
+# --------------------------
+NUMERIC_FIELDS = ["totals.total", "totals.tax"]
+_PATHS = {f: tuple(f.split(".")) for f in FIELDS}
+
+def _dig(d, keys):
+    for k in keys:
+        if not isinstance(d, dict) or k not in d:
+            return None
+        d = d[k]
+    return d
+
+def flatten(pairs: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    One pass over (source_parse, llm_normalized) pairs into columns:
+    raw values per field and side ("baseline.<f>", "model.<f>"), the
+    sum_matches_total flag and confidence.
+    """
+    cols = {f"{side}.{f}": [] for side in ("baseline", "model") for f in FIELDS}
+    base_cols = [(cols[f"baseline.{f}"], _PATHS[f]) for f in FIELDS]
+    model_cols = [(cols[f"model.{f}"], _PATHS[f]) for f in FIELDS]
+    sums, confs = [], []
+    for source_parse, llm_norm in pairs:
+        baseline, output = source_parse or {}, llm_norm or {}
+        for col, keys in base_cols:
+            col.append(_dig(baseline, keys))
+        for col, keys in model_cols:
+            col.append(_dig(output, keys))
+        sums.append(bool((output.get("validations") or {}).get("sum_matches_total", False)))
+        confs.append(output.get("confidence") or {})
+    out = {k: _obj(v) for k, v in cols.items()}
+    out["sum_matches_total"] = np.array(sums, dtype=bool)
+    out["confidence"] = confs
+    out["n"] = len(sums)
+    return out
+
+def _obj(values: list):
+    a = np.empty(len(values), dtype=object)
+    a[:] = values
+    return a
+
+def _present_col(col):
+    # _present elementwise: not None, not "", not NaN (x == x is False only for NaN)
+    return (col != None) & (col != "") & (col == col)  # noqa: E711
+
+_NOT_NUM = re.compile(r"[^0-9.\-]+")
+
+def _norm_text(t: str):
+    # _norm_num(t) for a str; str.isdigit only equals [0-9] for ASCII text
+    if not t.isascii():
+        return _norm_num(t)
+    s = _NOT_NUM.sub("", t)
+    try:
+        return float(s) if s else None
+    except ValueError:
+        return None
+
+def _num_col(col):
+    # _norm_num once per distinct text (_norm_num works on str(v)); NaN = None
+    texts = [str(v) for v in col]
+    parsed = {}
+    for t in dict.fromkeys(texts):
+        x = _norm_text(t)
+        parsed[t] = math.nan if x is None else x
+    return np.fromiter(map(parsed.__getitem__, texts), dtype=float, count=len(texts))
+
+def _str_col(col):
+    return _obj([str(v).strip() for v in col])
+
+def compare_bulk(pairs, p: float = NEAR_PCT) -> Dict[str, Any]:
+    """
+    compare_case for many pairs at once (numpy required). Same keys, with a
+    column (numpy array, one entry per pair) in place of every scalar;
+    ape_vs_baseline is NaN where compare_case gives None. case_at(result, i)
+    rebuilds the compare_case dict of pair i.
+    """
+    if np is None:
+        raise RuntimeError("compare_bulk needs numpy (`pip install numpy`)")
+    c = pairs if isinstance(pairs, dict) else flatten(pairs)
+    cov_b = {f: _present_col(c[f"baseline.{f}"]) for f in FIELDS}
+    cov_o = {f: _present_col(c[f"model.{f}"]) for f in FIELDS}
+    wins_fill = {f: ~cov_b[f] & cov_o[f] for f in FIELDS}
+    wins_fix = {}
+    for f in FIELDS:
+        both = cov_b[f] & cov_o[f]
+        diff = np.zeros(c["n"], dtype=bool)
+        if both.any():
+            diff[both] = _str_col(c[f"baseline.{f}"][both]) != _str_col(c[f"model.{f}"][both])
+        wins_fix[f] = diff
+
+    numeric = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for f in NUMERIC_FIELDS:
+            nb, no = _num_col(c[f"baseline.{f}"]), _num_col(c[f"model.{f}"])
+            known = ~np.isnan(nb) & ~np.isnan(no)
+            err = np.abs(no - nb)
+            numeric[f] = {
+                "baseline": c[f"baseline.{f}"],
+                "model": c[f"model.{f}"],
+                "near@1pct": known & (err <= p * np.maximum(1.0, np.abs(nb))),
+                "ape_vs_baseline": np.where(known & (nb != 0), err / np.abs(nb), np.nan),
+            }
+
+    cb = np.sum([cov_b[f] for f in FIELDS], axis=0, dtype=int)
+    co = np.sum([cov_o[f] for f in FIELDS], axis=0, dtype=int)
+    return {
+        "n": c["n"],
+        "coverage_baseline": cb,
+        "coverage_model": co,
+        "coverage_delta": co - cb,
+        "wins_fill": wins_fill,
+        "wins_fix": wins_fix,
+        "numeric": numeric,
+        "sum_matches_total": c["sum_matches_total"],
+        "confidence": c["confidence"],
+    }
+
+def case_at(bulk: Dict[str, Any], i: int) -> Dict[str, Any]:
+    """The compare_case result of pair i of a compare_bulk result."""
+    def ape(x):
+        return None if math.isnan(x) else float(x)
+    return {
+        "coverage_baseline": int(bulk["coverage_baseline"][i]),
+        "coverage_model": int(bulk["coverage_model"][i]),
+        "coverage_delta": int(bulk["coverage_delta"][i]),
+        "wins_fill": {f: bool(v[i]) for f, v in bulk["wins_fill"].items()},
+        "wins_fix": {f: bool(v[i]) for f, v in bulk["wins_fix"].items()},
+        "numeric": {f: {"baseline": m["baseline"][i], "model": m["model"][i],
+                        "near@1pct": bool(m["near@1pct"][i]), "ape_vs_baseline": ape(m["ape_vs_baseline"][i])}
+                    for f, m in bulk["numeric"].items()},
+        "sum_matches_total": bool(bulk["sum_matches_total"][i]),
+        "confidence": bulk["confidence"][i],
+    }
+
+def bulk_totals(bulk: Dict[str, Any]) -> Dict[str, Any]:
+    """Counters over all pairs, as score_day aggregates them."""
+    return {
+        "n": bulk["n"],
+        "coverage_delta_sum": int(bulk["coverage_delta"].sum()),
+        "sum_matches_total_true": int(bulk["sum_matches_total"].sum()),
+        "near1pct_total": int(bulk["numeric"]["totals.total"]["near@1pct"].sum()),
+        "near1pct_tax": int(bulk["numeric"]["totals.tax"]["near@1pct"].sum()),
+        "wins_fill_counts": {f: int(v.sum()) for f, v in bulk["wins_fill"].items()},
+        "wins_fix_counts": {f: int(v.sum()) for f, v in bulk["wins_fix"].items()},
+    }
+
+def to_arrow(bulk: Dict[str, Any]):
+    """The per-pair metric columns as a pyarrow Table (pyarrow required)."""
+    if pa is None:
+        raise RuntimeError("to_arrow needs pyarrow (`pip install pyarrow`)")
+    cols = {k: bulk[k] for k in ("coverage_baseline", "coverage_model", "coverage_delta", "sum_matches_total")}
+    for f in FIELDS:
+        cols[f"wins_fill.{f}"] = bulk["wins_fill"][f]
+        cols[f"wins_fix.{f}"] = bulk["wins_fix"][f]
+    for f, m in bulk["numeric"].items():
+        cols[f"near@1pct.{f}"] = m["near@1pct"]
+        cols[f"ape_vs_baseline.{f}"] = pa.array(m["ape_vs_baseline"], from_pandas=True)   # NaN -> null
+    return pa.table(cols)
@@ -1,76 +1,427 @@
 # src/common/normalize.py
-import json, re, os
-from .llm_client import invoke_bedrock_claude, invoke_bedrock_llama
-from .prompt import SYSTEM, FEW_SHOTS, SCHEMA_TEXT, SCHEMA_PROMPT
-from .config import USE_LLM, BEDROCK_MODEL_ID
+import json, os, functools, hashlib
+from .llm_client import (invoke_bedrock_claude, invoke_bedrock_llama,
+                         build_claude_body, build_llama_body, text_from_output)
+from .prompt import (SYSTEM, FEW_SHOTS, SCHEMA_TEXT, SCHEMA_PROMPT, PROMPT_VERSION, BATCH_PROMPT, CHUNK_PROMPT,
+                     REASK_PROMPT)
+from .config import (USE_LLM, LLM_PREPASS, BEDROCK_MODEL_ID, PROMPT_DETAIL,
+                     LLM_BATCH_SIZE, LLM_BATCH_TOKEN_BUDGET, LLM_BATCH_MAX_OUTPUT, LLM_LINE_CHUNK,
+                     VALIDATE_OUTPUT, VALIDATE_REASK, VALIDATE_REASK_MAX, SUM_TOLERANCE,
+                     LLM_ROUTER, ROUTE_MIN_CONFIDENCE, PROMPT_CACHE_MIN_TOKENS)
+from .compact import compact_textract, compaction_stats, estimate_tokens
+from .fanout import run_bounded
+from .local_normalize import normalize_local, parse_amount, reconciles
+from .jsonstream import first_json
+from . import validate
+
+@functools.lru_cache(maxsize=None)
+def cache_version() -> str:
+    """
+    Cache key part for normalized results: PROMPT_VERSION plus a digest of
+    the prompt texts and every setting that changes what is stored - Textract
+    compaction, line chunking, the PARSE pre-pass (and the tolerance of its
+    local draft), validation and re-ask, and routing. LLM_BATCH_* only pack
+    invoices into requests per run and are left out.
+    """
+    knobs = (SYSTEM, FEW_SHOTS, SCHEMA_TEXT, SCHEMA_PROMPT, CHUNK_PROMPT, REASK_PROMPT, BATCH_PROMPT,
+             PROMPT_DETAIL, LLM_LINE_CHUNK, LLM_PREPASS, SUM_TOLERANCE,
+             VALIDATE_OUTPUT, VALIDATE_REASK, VALIDATE_REASK_MAX, LLM_ROUTER, ROUTE_MIN_CONFIDENCE)
+    digest = hashlib.sha256(json.dumps(knobs, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+    return f"{PROMPT_VERSION}:{PROMPT_DETAIL}:{digest}"
+
+def _parse_hint(deterministic_parse: dict) -> dict:
+    # LLM_PREPASS: the model corrects a local draft instead of starting from the raw parse
+    if LLM_PREPASS and deterministic_parse and not deterministic_parse.get("error"):
+        return normalize_local(deterministic_parse)
+    return deterministic_parse or {}
 
 def _json_only(s: str) -> str:
-    m = re.search(r"\{.*\}", s, flags=re.DOTALL)
-    return m.group(0) if m else "{}"
+    # first balanced object, not first "{" to last "}": trailing prose may contain braces
+    return first_json(s, "{") or "{}"
+
+def _json_array_only(s: str) -> str:
+    return first_json(s, "[") or "[]"
+
+def _empty_result() -> dict:
+    return {
+      "vendor":{"name":"","country_hint":""},
+      "invoice":{"number":"","date_iso":"","currency":""},
+      "totals":{"subtotal":"","tax":"","total":""},
+      "line_items":[],
+      "confidence":{"structure":"0.00","vendor":"0.00","totals":"0.00","lines":"0.00"},
+      "validations":{"sum_matches_total": False}
+    }
+
+def _shape(data: dict) -> dict:
+    for k in ["vendor","invoice","totals","confidence","validations"]:
+        data.setdefault(k, {})
+    data.setdefault("line_items", [])
+    return data
 
-def build_messages(textract_raw: dict, deterministic_parse: dict):
-    msgs = [{"role": "system", "content": SYSTEM}]
+@functools.lru_cache(maxsize=None)
+def _prefix_messages(detail: str) -> tuple:
+    """
+    System + few-shot turns. Identical for every invoice, so it is serialised
+    once per detail level; the schema lives in the system turn only. The last
+    turn is flagged `cache` (a Bedrock cache point in llm_client) only when the
+    prefix reaches PROMPT_CACHE_MIN_TOKENS; shorter prefixes can't be cached.
+    """
+    msgs = [{"role": "system", "content": f"{SYSTEM}\nSCHEMA={SCHEMA_TEXT}\n{SCHEMA_PROMPT}"}]
     for ex in FEW_SHOTS:
         note = ex.get("input_schema_note", "Few-shot example")
-        tex_hint = json.dumps(ex.get("textract_hint", {}), separators=(",", ":"))
+        hint = compact_textract({"ExpenseDocuments": [ex.get("textract_hint", {})]}, detail)
+        tex_hint = json.dumps(hint, separators=(",", ":"))
         det = json.dumps(ex.get("deterministic_parse", {}), separators=(",", ":"))
         out = json.dumps(ex.get("output", {}), separators=(",", ":"))
-        msgs.append({
-            "role": "user",
-            "content": f"{note}\nTEXTRACT={tex_hint}\nPARSE={det}\nSCHEMA={SCHEMA_TEXT}\n{SCHEMA_PROMPT}"
-        })
+        msgs.append({"role": "user", "content": f"{note}\nTEXTRACT={tex_hint}\nPARSE={det}"})
         msgs.append({"role": "assistant", "content": out})
+    if estimate_tokens(msgs) >= PROMPT_CACHE_MIN_TOKENS:
+        msgs[-1]["cache"] = True
+    return tuple(msgs)
+
+@functools.lru_cache(maxsize=None)
+def _llama_prefix() -> str:
+    return (SYSTEM + "\n\n" + SCHEMA_TEXT +
+            "\n\n" + json.dumps({"few_shots": FEW_SHOTS}, ensure_ascii=False))
+
+# built at import: normalize is only loaded when USE_LLM is on
+_prefix_messages(PROMPT_DETAIL)
 
-    tex = json.dumps(textract_raw or {}, separators=(",", ":"))
-    det = json.dumps(deterministic_parse or {}, separators=(",", ":"))
+def build_messages(textract_raw: dict, deterministic_parse: dict, detail: str = PROMPT_DETAIL,
+                   compacted: dict | None = None, note: str = ""):
+    msgs = list(_prefix_messages(detail))  # shared prefix dicts; do not mutate
+    if compacted is None:
+        compacted = compact_textract(textract_raw, detail)
+    tex = json.dumps(compacted or {}, separators=(",", ":"))
+    det = json.dumps(_parse_hint(deterministic_parse), separators=(",", ":"))
     msgs.append({
         "role": "user",
-        "content": f"TEXTRACT={tex}\nPARSE={det}\nSCHEMA={SCHEMA_TEXT}\n{SCHEMA_PROMPT}"
+        "content": (f"{note}\n" if note else "") + f"TEXTRACT={tex}\nPARSE={det}"
     })
     return msgs
 
-def normalize_invoice(textract_raw: dict, deterministic_parse: dict) -> dict:
-    # If LLM is disabled, just return a minimal normalized shell using det parse.
+def normalize_invoice(textract_raw: dict, deterministic_parse: dict, meta: dict | None = None) -> dict:
+    """
+    `meta`, when given, is filled with request diagnostics (prompt size
+    estimates before/after Textract compaction, Bedrock token usage) for
+    the processed payload.
+    """
+    # If LLM is disabled, normalize deterministically (dates, currency, amounts, reconciliation).
     if not USE_LLM:
-        data = {
-          "vendor":{"name": deterministic_parse.get("vendor","") or "", "country_hint":""},
-          "invoice":{"number": deterministic_parse.get("invoice_number","") or "",
-                     "date_iso": deterministic_parse.get("date_iso","") or "",
-                     "currency": deterministic_parse.get("currency","") or ""},
-          "totals":{"subtotal":"", "tax":"", "total": deterministic_parse.get("total","") or ""},
-          "line_items": deterministic_parse.get("line_items", []) or [],
-          "confidence":{"structure":"0.00","vendor":"0.00","totals":"0.00","lines":"0.00"},
-          "validations":{"sum_matches_total": False}
-        }
+        notes = []
+        data = normalize_local(deterministic_parse, notes)
+        if meta is not None:
+            meta["notes"] = notes
         return data
 
-    msgs = build_messages(textract_raw, deterministic_parse)
+    compacted = compact_textract(textract_raw, PROMPT_DETAIL)
+    if meta is not None:
+        meta["prompt"] = compaction_stats(textract_raw, compacted, PROMPT_DETAIL)
+    parts = _line_chunks(compacted, deterministic_parse, LLM_LINE_CHUNK)
+    if len(parts) > 1:
+        return validated(_normalize_parts(parts, meta), deterministic_parse, meta)
 
+    usage, timing = {}, {}
+    text = _invoke(compacted, deterministic_parse, usage, timing=timing)
+    if meta is not None:
+        meta["usage"] = usage
+        meta["timing"] = timing
+    return validated(parse_result_text(text), deterministic_parse, meta)
+
+def _invoke(compacted: dict, deterministic_parse: dict, usage: dict, note: str = "",
+            timing: dict | None = None) -> str:
     if BEDROCK_MODEL_ID.startswith("anthropic."):
-        text = invoke_bedrock_claude(msgs)
-    else:
-        joined = (
-            SYSTEM + "\n\n" + SCHEMA_TEXT +
-            "\n\n" + json.dumps({"few_shots": FEW_SHOTS}, ensure_ascii=False) +
-            "\n\nUser:\n" + json.dumps({"inputs":{
-                "textract_expense": textract_raw,
-                "deterministic_parse": deterministic_parse}}, ensure_ascii=False)
-        )
-        text = invoke_bedrock_llama(joined)
+        return invoke_bedrock_claude(build_messages(None, deterministic_parse, compacted=compacted, note=note),
+                                     usage=usage, timing=timing)
+    return invoke_bedrock_llama(_llama_prompt(compacted, deterministic_parse, note), usage=usage, timing=timing)
+
+# --------------------------
+# Long invoices: line items split across requests
+# --------------------------
+def _line_chunks(compacted: dict, deterministic_parse: dict, size: int) -> list:
+    """
+    [(part, parts, compacted, parse)] with at most `size` line items each.
+    Compacted rows and parse rows come from the same parser.iter_line_items
+    stream over every document, in document order, so slicing both by index
+    keeps them aligned; each part regroups its compacted rows by document.
+    The Textract summaries go with the first part only; the small parse
+    header with every part.
+    """
+    rows = (deterministic_parse or {}).get("line_items") or []
+    if size <= 0 or len(rows) <= size or PROMPT_DETAIL == "full":   # full: raw response, not row-aligned
+        return [(1, 1, compacted, deterministic_parse)]
+    docs = (compacted or {}).get("ExpenseDocuments") or [{}]
+    stream = [(n, line) for n, d in enumerate(docs) for line in d.get("LineItems", [])]
+    header = {k: v for k, v in deterministic_parse.items() if k != "line_items"}
+    parts = -(-len(rows) // size)
+    out = []
+    for i in range(parts):
+        chunk = stream[i * size:(i + 1) * size]
+        part_docs = []
+        for n, d in enumerate(docs):
+            lines = [line for m, line in chunk if m == n]
+            if not lines and not (i == 0 and d.get("SummaryFields")):
+                continue
+            doc = {"SummaryFields": d.get("SummaryFields", []) if i == 0 else [], "LineItems": lines}
+            if "ExpenseIndex" in d:
+                doc["ExpenseIndex"] = d["ExpenseIndex"]
+            part_docs.append(doc)
+        out.append((i + 1, parts, {"ExpenseDocuments": part_docs},
+                    {**header, "line_items": rows[i * size:(i + 1) * size]}))
+    return out
+
+def _normalize_parts(parts: list, meta: dict | None) -> dict:
+    def one(p):
+        part, n, compacted, parsed = p
+        usage, timing = {}, {}
+        text = _invoke(compacted, parsed, usage, note=CHUNK_PROMPT.format(part=part, parts=n), timing=timing)
+        return parse_result_text(text), usage, timing
+
+    run = run_bounded(parts, one, workers=min(4, len(parts)), label=lambda p: p[0])
+    if run["failed"]:
+        f = run["failed"][0]
+        raise RuntimeError(f"{len(run['failed'])} of {len(parts)} line-item parts failed (part {f['key']}: {f['error']})")
+    done = sorted(run["succeeded"], key=lambda s: s["key"])
+    results = [s["result"][0] for s in done]
+
+    # header/totals from the first part, line items from all of them, in order
+    out = results[0]
+    out["line_items"] = [li for r in results for li in r.get("line_items") or []]
+    lines_conf = [r["confidence"].get("lines") for r in results if r["confidence"].get("lines")]
+    if lines_conf:
+        out["confidence"]["lines"] = min(lines_conf, key=lambda c: parse_amount(c) or 0)
+    amounts = [parse_amount(li.get("amount")) for li in out["line_items"]]
+    t = out["totals"]
+    out["validations"]["sum_matches_total"] = None not in amounts and reconciles(
+        sum(amounts), parse_amount(t.get("subtotal")), parse_amount(t.get("tax")), parse_amount(t.get("total")))
+    if meta is not None:
+        usage = {}
+        for s in done:
+            for k, v in s["result"][1].items():
+                if isinstance(v, (int, float)):
+                    usage[k] = usage.get(k, 0) + v
+        meta["usage"] = usage
+        meta["parts"] = len(parts)
+        # parts run side by side: the slowest one is the latency
+        meta["timing"] = {k: max(s["result"][2].get(k) or 0 for s in done) for k in ("ttft_ms", "gen_ms", "total_ms")}
+    return out
 
+def _llama_prompt(compacted: dict, deterministic_parse: dict, note: str = "") -> str:
+    return (
+        _llama_prefix() +
+        "\n\nUser:\n" + (f"{note}\n" if note else "") + json.dumps({"inputs":{
+            "textract_expense": compacted,
+            "deterministic_parse": _parse_hint(deterministic_parse)}}, ensure_ascii=False)
+    )
+
+def parse_result_text(text: str) -> dict:
     js = _json_only(text)
     try:
         data = json.loads(js)
     except Exception:
-        data = {
-          "vendor":{"name":"","country_hint":""},
-          "invoice":{"number":"","date_iso":"","currency":""},
-          "totals":{"subtotal":"","tax":"","total":""},
-          "line_items":[],
-          "confidence":{"structure":"0.00","vendor":"0.00","totals":"0.00","lines":"0.00"},
-          "validations":{"sum_matches_total": False}
-        }
-    for k in ["vendor","invoice","totals","confidence","validations"]:
-        data.setdefault(k, {})
-    data.setdefault("line_items", [])
+        data = _empty_result()
+    return _shape(data)
+
+def model_input_for(textract_raw: dict, deterministic_parse: dict) -> dict:
+    """The single-invoice request body normalize_invoice would send (for Bedrock batch jobs)."""
+    compacted = compact_textract(textract_raw, PROMPT_DETAIL)
+    if BEDROCK_MODEL_ID.startswith("anthropic."):
+        return build_claude_body(build_messages(textract_raw, deterministic_parse, compacted=compacted))
+    return build_llama_body(_llama_prompt(compacted, deterministic_parse))
+
+def result_from_model_output(model_output: dict, usage: dict | None = None, meta: dict | None = None) -> dict:
+    # batch job output: local repair only, a re-ask would be an on-demand call per invoice
+    return validated(parse_result_text(text_from_output(model_output or {}, usage)), None, meta, reask=False)
+
+# --------------------------
+# Output validation: local repair, then a field-level re-ask
+# --------------------------
+def _evidence(errors, parsed) -> dict:
+    # the parts of the deterministic parse that bear on the failing fields (never the Textract payload)
+    p, ev = parsed or {}, {}
+    keys = {"vendor": ("vendor", "vendor_address"), "invoice": ("invoice_number", "invoice_date", "currency"),
+            "totals": ("subtotal", "tax", "total", "currency")}
+    for e in errors:
+        head = e["path"].split(".")
+        if head[0] == "line_items" and len(head) > 1:
+            rows = p.get("line_items") or []
+            if int(head[1]) < len(rows):
+                ev[f"line_items.{head[1]}"] = {k: v for k, v in rows[int(head[1])].items() if k != "page"}
+        else:
+            ev.update({k: p[k] for k in keys.get(head[0], ()) if p.get(k)})
+    return ev
+
+def _current(data, errors) -> dict:
+    # current values of the sections (or line items) the failing fields live in
+    cur = {}
+    for e in errors:
+        head = e["path"].split(".")
+        if head[0] == "line_items" and len(head) > 1:
+            cur[f"line_items.{head[1]}"] = data["line_items"][int(head[1])]
+        else:
+            cur[head[0]] = data.get(head[0])
+    return cur
+
+def _reask(data: dict, errors: list, parsed: dict | None, usage: dict) -> dict:
+    """One small request for just the failing fields; returns {path: value}."""
+    fields = [{"path": e["path"], "value": e["value"], "problem": validate.PROBLEMS[e["code"]]} for e in errors]
+    content = (f"{REASK_PROMPT}\nFIELDS={json.dumps(fields, separators=(',', ':'), default=str)}"
+               f"\nCURRENT={json.dumps(_current(data, errors), separators=(',', ':'))}"
+               f"\nEVIDENCE={json.dumps(_evidence(errors, parsed), separators=(',', ':'))}")
+    max_tokens = 64 + 32 * len(errors)
+    if BEDROCK_MODEL_ID.startswith("anthropic."):
+        text = invoke_bedrock_claude([{"role": "system", "content": SYSTEM}, {"role": "user", "content": content}],
+                                     usage=usage, max_tokens=max_tokens)
+    else:
+        text = invoke_bedrock_llama(f"{SYSTEM}\n\nUser:\n{content}", max_tokens=max_tokens, usage=usage)
+    try:
+        patch = json.loads(_json_only(text))
+    except ValueError:
+        patch = {}
+    return patch if isinstance(patch, dict) else {}
+
+def validated(data: dict, parsed: dict | None, meta: dict | None = None, reask: bool = VALIDATE_REASK) -> dict:
+    """
+    Check a normalized result against prompt.SCHEMA: deterministic repair
+    first (validate.repair), then - when `reask` and at most
+    VALIDATE_REASK_MAX fields are still invalid - one small request that
+    fixes only those. Arithmetic mismatches are never re-asked; they go to
+    validations.warnings. meta["validation"] gets fixed_locally, reasked,
+    patched, the re-ask token usage, warnings and any fields left invalid.
+    """
+    if not VALIDATE_OUTPUT:
+        return data
+    data, fixed, errors = validate.repair(data, parsed)
+    report = {"fixed_locally": len(fixed)}
+    ask = [e for e in errors if e["code"] not in validate.LOCAL_ONLY]
+    if ask and reask and USE_LLM and len(ask) <= VALIDATE_REASK_MAX:
+        usage = {}
+        try:
+            patch = _reask(data, ask, parsed, usage)
+        except Exception as e:  # keep the first answer; the report says what is still wrong
+            patch = {}
+            report["reask_error"] = f"{type(e).__name__}: {e}"
+        patched = [p for p, v in patch.items() if isinstance(v, (str, int, float)) and not isinstance(v, bool)
+                   and validate.set_path(data, p, str(v))]
+        data, _, errors = validate.repair(data, parsed)
+        report.update({"reasked": len(ask), "patched": len(patched), "usage": usage})
+    warnings = [f"{e['path']}:{e['code']}" for e in errors if e["code"] in validate.ARITHMETIC]
+    if warnings:
+        data["validations"]["warnings"] = warnings
+        report["warnings"] = len(warnings)
+    remaining = [f"{e['path']}:{e['code']}" for e in errors if e["code"] not in validate.ARITHMETIC]
+    if remaining:
+        report["remaining"] = remaining
+    if meta is not None:
+        meta["validation"] = report
     return data
+
+# --------------------------
+# Multi-invoice requests
+# --------------------------
+def _valid_batch_result(r) -> bool:
+    return isinstance(r, dict) and all(isinstance(r.get(k), dict) for k in ("vendor", "invoice", "totals"))
+
+def _output_estimate(parsed: dict) -> int:
+    # normalized JSON is ~150 tokens plus ~40 per line item
+    return 150 + 40 * len((parsed or {}).get("line_items") or [])
+
+def _pack(entries, token_budget: int, max_items: int, max_output: int):
+    packs, cur, cur_in, cur_out = [], [], 0, 0
+    for e in entries:
+        if cur and (len(cur) >= max_items or cur_in + e["tokens"] > token_budget
+                    or cur_out + e["out_tokens"] > max_output):
+            packs.append(cur)
+            cur, cur_in, cur_out = [], 0, 0
+        cur.append(e)
+        cur_in += e["tokens"]
+        cur_out += e["out_tokens"]
+    if cur:
+        packs.append(cur)
+    return packs
+
+def build_batch_messages(entries, detail: str = PROMPT_DETAIL):
+    msgs = list(_prefix_messages(detail))
+    blocks = [BATCH_PROMPT]
+    for e in entries:
+        tex = json.dumps(e["compacted"] or {}, separators=(",", ":"))
+        det = json.dumps(_parse_hint(e["parsed"]), separators=(",", ":"))
+        blocks.append(f"INVOICE_ID={e['invoice_id']}\nTEXTRACT={tex}\nPARSE={det}")
+    msgs.append({"role": "user", "content": "\n\n".join(blocks)})
+    return msgs
+
+def _run_pack(pack, metas):
+    results, usage, timing = {}, {}, {}
+    if len(pack) > 1:
+        max_out = min(LLM_BATCH_MAX_OUTPUT, sum(e["out_tokens"] for e in pack) + 256)
+        try:
+            text = invoke_bedrock_claude(build_batch_messages(pack), usage=usage, max_tokens=max_out,
+                                         timing=timing, until="[")
+            arr = json.loads(_json_array_only(text))
+        except Exception as e:
+            print(f"[normalize] batch of {len(pack)} failed, falling back to single calls: {e}")
+            arr = []
+        for r in arr if isinstance(arr, list) else []:
+            if isinstance(r, dict) and _valid_batch_result(r.get("result")):
+                results[str(r.get("invoice_id"))] = _shape(r["result"])
+        parsed = {e["invoice_id"]: e["parsed"] for e in pack}
+        for inv_id in [i for i in results if i in parsed]:
+            m = metas.setdefault(inv_id, {}) if metas is not None else None
+            results[inv_id] = validated(results[inv_id], parsed[inv_id], m)
+
+    for e in pack:
+        m = metas.setdefault(e["invoice_id"], {}) if metas is not None else {}
+        if e["stats"]:
+            m["prompt"] = e["stats"]
+        if e["invoice_id"] in results:
+            m["batch"] = {"size": len(pack), "usage": usage, "timing": timing}
+        else:
+            # missing or malformed in the batch answer (or a pack of one): single-invoice call
+            try:
+                results[e["invoice_id"]] = normalize_invoice(e["raw"], e["parsed"], meta=m)
+            except Exception as err:  # isolate per invoice; caller sees it missing
+                m["error"] = f"{type(err).__name__}: {err}"
+    return {e["invoice_id"]: results[e["invoice_id"]] for e in pack if e["invoice_id"] in results}
+
+def normalize_invoices_batch(items, metas: dict | None = None, token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+                             max_items: int = LLM_BATCH_SIZE, workers: int = 1) -> dict:
+    """
+    Normalize several invoices with as few Bedrock requests as possible.
+
+    items: iterable of (invoice_id, textract_raw, deterministic_parse).
+    Compacted invoices are packed into requests under `token_budget` estimated
+    input tokens (and the model output limit); the model answers with a JSON
+    array keyed by invoice_id. Any invoice whose entry is missing or malformed
+    falls back to normalize_invoice. Returns {invoice_id: normalized}; per
+    invoice diagnostics go to metas[invoice_id] when `metas` is given.
+    Invoices that still fail are left out of the result (metas[id]["error"]).
+    """
+    items = list(items)
+    if not USE_LLM or not BEDROCK_MODEL_ID.startswith("anthropic.") or max_items <= 1:
+        packs = [[{"invoice_id": str(inv_id), "raw": raw, "parsed": parsed, "stats": None}]
+                 for inv_id, raw, parsed in items]
+        run = run_bounded(packs, lambda p: _run_pack(p, metas), workers=workers,
+                          label=lambda p: p[0]["invoice_id"])
+        return {k: v for s in run["succeeded"] for k, v in s["result"].items()}
+
+    entries, singles = [], []
+    for inv_id, raw, parsed in items:
+        if LLM_LINE_CHUNK and len((parsed or {}).get("line_items") or []) > LLM_LINE_CHUNK:
+            # long invoices go alone through normalize_invoice, which splits their line items
+            singles.append([{"invoice_id": str(inv_id), "raw": raw, "parsed": parsed, "stats": None}])
+            continue
+        compacted = compact_textract(raw, PROMPT_DETAIL)
+        entries.append({
+            "invoice_id": str(inv_id), "raw": raw, "parsed": parsed, "compacted": compacted,
+            "stats": compaction_stats(raw, compacted, PROMPT_DETAIL),
+            "tokens": estimate_tokens(compacted) + estimate_tokens(parsed or {}),
+            "out_tokens": _output_estimate(parsed),
+        })
+    packs = _pack(entries, token_budget, max_items, LLM_BATCH_MAX_OUTPUT) + singles
+
+    run = run_bounded(packs, lambda p: _run_pack(p, metas), workers=workers,
+                      label=lambda p: ",".join(e["invoice_id"] for e in p))
+    out = {}
+    for s in run["succeeded"]:
+        out.update(s["result"])
+    return out
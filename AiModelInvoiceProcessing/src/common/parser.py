@@ -1,49 +1,188 @@
 # src/common/parser.py
-def _find(summary_fields, *types):
+# Textract AnalyzeExpense -> flat invoice fields; the header comes from one primary ExpenseDocument.
+
+# output field -> Textract types, in order of preference
+FIELDS = {
+    "vendor": ("VENDOR_NAME", "SUPPLIER", "SELLER_NAME"),
+    "vendor_address": ("VENDOR_ADDRESS", "SUPPLIER_ADDRESS"),
+    "invoice_number": ("INVOICE_RECEIPT_ID", "INVOICE_NUMBER"),
+    "invoice_date": ("INVOICE_RECEIPT_DATE", "INVOICE_DATE"),
+    "due_date": ("DUE_DATE", "PAYMENT_DUE_DATE"),
+    "po_number": ("PO_NUMBER",),
+    "subtotal": ("SUBTOTAL",),
+    "tax": ("TAX",),
+    "total": ("TOTAL", "AMOUNT_DUE"),
+    "currency": ("CURRENCY",),
+}
+_NONE = (None, None)
+_LINE_NUMERIC = {"QUANTITY", "UNIT_PRICE", "PRICE", "AMOUNT"}
+_LINE_TEXT = ("ITEM", "EXPENSE_ROW")
+_GROUPED = ("NAME", "ADDRESS")   # generic types qualified by GroupProperties, e.g. VENDOR + ADDRESS
+
+_WANTED = {t for types in FIELDS.values() for t in types} | set(_GROUPED)
+
+def index_summary_fields(doc: dict) -> dict:
+    """{TYPE: {"value", "conf", "page", "currency"}} keeping the most confident non-empty detection per type."""
+    best = {}
+    for f in doc.get("SummaryFields", []):
+        t = f.get("Type", {}).get("Text") or ""
+        if t not in _WANTED:
+            t = t.upper()
+            if t not in _WANTED:
+                continue        # OTHER and types no output field uses
+        vd = f.get("ValueDetection") or {}
+        conf = vd.get("Confidence") or 0.0
+        if t in _GROUPED:
+            groups = [g for gp in f.get("GroupProperties", []) for g in gp.get("Types", [])]
+            if not groups:
+                continue
+            t = f"{groups[0].upper()}_{t}"
+        if t in best and best[t][0] >= conf:
+            continue
+        value = (vd.get("Text") or "").strip()
+        if value:
+            best[t] = (conf, value, f)
+    return {t: {"value": value, "conf": (f.get("ValueDetection") or {}).get("Confidence"),
+                "page": f.get("PageNumber"), "currency": (f.get("Currency") or {}).get("Code")}
+            for t, (conf, value, f) in best.items()}
+
+def _resolve(index, types):
     for t in types:
-        t_upper = t.upper()
-        for f in summary_fields:
-            if f.get("Type", {}).get("Text", "").upper() == t_upper:
-                return f.get("ValueDetection", {}).get("Text")
+        if t in index:
+            return index[t]
     return None
 
+def _row_fields(li):
+    page, fields = None, {}
+    for f in li.get("LineItemExpenseFields", ()):
+        vd = f.get("ValueDetection")
+        text = vd and vd.get("Text")
+        if not text:
+            continue
+        t = f.get("Type")
+        t = t and t.get("Text")
+        text = text.strip()
+        if t and text:
+            fields[t] = (text, vd.get("Confidence"))
+            if page is None:
+                page = f.get("PageNumber")
+    return page, fields
+
+def _is_continuation(pending, last_page, page, fields) -> bool:
+    # a wrapped description line: text only, right after a priced row on the same or the next page
+    if fields.keys() & _LINE_NUMERIC or not any(t in fields for t in _LINE_TEXT):
+        return False
+    if not ("PRICE" in pending[1] or "AMOUNT" in pending[1]):
+        return False        # section headers and notes after a header stay separate
+    return page is None or last_page is None or last_page <= page <= last_page + 1
+
+def _join(prev, cont):
+    if not prev:
+        return cont
+    confs = [c for c in (prev[1], cont[1]) if c is not None]
+    return (f"{prev[0]} {cont[0]}", min(confs) if confs else None)
+
+def iter_line_items(docs, stats: dict | None = None):
+    """
+    Stream logical line items over the groups and pages of each document in
+    `docs` as (page, {TYPE: (text, confidence)}); documents stay separate.
+    A description-only row right after a priced row (a wrapped line, or one
+    split by a page break) is merged into it. Rows with no values are dropped.
+    `stats`, when given, gets "rows" and "min_conf" (lowest amount confidence).
+    """
+    for d in docs:
+        pending, last_page = None, None
+        for group in d.get("LineItemGroups", []):
+            for li in group.get("LineItems", []):
+                page, fields = _row_fields(li)
+                if not fields:
+                    continue
+                if pending and _is_continuation(pending, last_page, page, fields):
+                    prev = pending[1]
+                    for t in _LINE_TEXT:
+                        if t in fields:
+                            prev[t] = _join(prev.get(t), fields[t])
+                    last_page = page or last_page
+                    continue
+                if pending:
+                    _count(pending, stats)
+                    yield pending
+                pending, last_page = (page, fields), page
+        if pending:
+            _count(pending, stats)
+            yield pending
+
+def _count(row, stats):
+    if stats is not None:
+        stats["rows"] = stats.get("rows", 0) + 1
+        amount = row[1].get("PRICE") or row[1].get("AMOUNT")
+        if amount and amount[1] is not None:
+            stats["min_conf"] = min(stats.get("min_conf", amount[1]), amount[1])
+
+def _header(doc: dict) -> dict:
+    index = index_summary_fields(doc)
+    hits = {k: _resolve(index, types) for k, types in FIELDS.items()}
+    if hits["currency"] is None:
+        # AnalyzeExpense reports the currency as an attribute of amount fields
+        amount = next((h for h in (hits["total"], hits["subtotal"], hits["tax"]) if h and h["currency"]), None)
+        if amount:
+            hits["currency"] = {"value": amount["currency"], "conf": amount["conf"], "page": amount["page"]}
+    return hits
+
+def document_index(doc: dict, position: int) -> int:
+    # ExpenseIndex is 1-based; responses without it are numbered in order
+    return doc.get("ExpenseIndex") or position + 1
+
+def primary_document(headers: list) -> int:
+    """Position of the document the header is read from: most header fields found, earliest on a tie."""
+    return max(range(len(headers)), key=lambda i: (sum(h is not None for h in headers[i].values()), -i))
+
+def _document_summary(doc: dict, position: int, hits: dict) -> dict:
+    return {"document": document_index(doc, position),
+            **{k: hits[k]["value"] if hits[k] else None
+               for k in ("vendor", "invoice_number", "invoice_date", "total", "currency")},
+            "fields": sum(h is not None for h in hits.values())}
+
 def parse_textract_expense(resp: dict) -> dict:
+    """
+    Flat invoice fields. A response can hold several ExpenseDocuments (one
+    file with more than one invoice or receipt): the header fields come from
+    primary_document(), and meta["documents"] summarizes every document so
+    the others are not lost. Line items come from all documents, each
+    tagged with its "document" index.
+    """
     docs = resp.get("ExpenseDocuments", [])
     if not docs:
         return {"error": "no_document"}
 
-    d0 = docs[0]
-    sf = d0.get("SummaryFields", [])
-
-    vendor = _find(sf, "VENDOR_NAME", "SUPPLIER", "SELLER_NAME")
-    invoice_number = _find(sf, "INVOICE_RECEIPT_ID", "INVOICE_NUMBER")
-    invoice_date = _find(sf, "INVOICE_RECEIPT_DATE", "INVOICE_DATE")
-    total = _find(sf, "TOTAL")
-    currency = _find(sf, "CURRENCY")
-
-    line_items = []
-    for group in d0.get("LineItemGroups", []):
-        for li in group.get("LineItems", []):
-            row = {"description": None, "qty": None, "unit_price": None, "amount": None}
-            for f in li.get("LineItemExpenseFields", []):
-                t = f.get("Type", {}).get("Text")
-                v = f.get("ValueDetection", {}).get("Text")
-                if t == "ITEM":
-                    row["description"] = v
-                elif t == "QUANTITY":
-                    row["qty"] = v
-                elif t == "UNIT_PRICE":
-                    row["unit_price"] = v
-                elif t in ("PRICE", "AMOUNT"):
-                    row["amount"] = v
-            line_items.append(row)
+    headers = [_header(d) for d in docs]
+    primary = primary_document(headers)
+    hits = headers[primary]
+
+    # ints keep DynamoDB happy (no floats in put_item)
+    confidence = {k: int(round(float(h["conf"]))) for k, h in hits.items() if h and h["conf"] is not None}
+    pages = {k: h["page"] for k, h in hits.items() if h and h["page"]}
+
+    # rows of every document, in document order, each tagged with its document
+    stats = {}
+    line_items, counts = [], []
+    for i, d in enumerate(docs):
+        n = len(line_items)
+        for page, fields in iter_line_items([d], stats):
+            g = fields.get
+            line_items.append({"description": g("ITEM", _NONE)[0], "qty": g("QUANTITY", _NONE)[0],
+                               "unit_price": g("UNIT_PRICE", _NONE)[0],
+                               "amount": (g("PRICE") or g("AMOUNT") or _NONE)[0], "page": page,
+                               "document": document_index(d, i)})
+        counts.append(len(line_items) - n)
+    if "min_conf" in stats:
+        confidence["line_items"] = int(round(float(stats["min_conf"])))
 
     return {
-        "vendor": vendor,
-        "invoice_number": invoice_number,
-        "invoice_date": invoice_date,
-        "total": total,
-        "currency": currency,
+        **{k: (h["value"] if h else None) for k, h in hits.items()},
         "line_items": line_items,
-        "meta": {"source": "textract.analyze_expense"}
+        "meta": {"source": "textract.analyze_expense", "confidence": confidence, "pages": pages,
+                 "primary_document": document_index(docs[primary], primary),
+                 "documents": [{**_document_summary(d, i, h), "line_items": n}
+                               for i, (d, h, n) in enumerate(zip(docs, headers, counts))]}
     }
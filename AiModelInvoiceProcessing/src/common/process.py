@@ -1,22 +1,38 @@
 # src/common/process.py
-import os, json, hashlib, boto3
+import time, hashlib
 
-# src/common/process.py  (ADD these imports)
-from .normalize import normalize_invoice
-from .config import USE_LLM
+# Keep import time minimal (Lambda cold start): no env validation, clients or
+# LLM modules at import. normalize/prompt/llm_client load only when USE_LLM.
+from .config import (USE_LLM, LLM_ROUTER, LOCAL_NORMALIZE, BEDROCK_MODEL_ID,
+                     CACHE_ENABLED, CACHE_PREFIX, RAW_BUCKET, require, MANIFEST_ENABLED,
+                     PAYLOAD_ENCODING, DDB_ITEM_MODE,
+                     TEXTRACT_MODE, TEXTRACT_SYNC_MAX_BYTES, TEXTRACT_SNIFF_PAGES, TEXTRACT_SNIFF_MIN_BYTES,
+                     TEXTRACT_SNS_TOPIC_ARN, TEXTRACT_SNS_ROLE_ARN, TEXTRACT_POLL_TIMEOUT, TEXTRACT_POLL_DELAY)
+from .cache import ResultCache, clean_etag
+from .parser import parse_textract_expense
+from .local_normalize import normalize_local
+from . import router
+from . import aws
+from . import textract_async
+from . import ratelimit
+from . import manifest
+from . import codec
+from . import query
 
 
-RAW_BUCKET = os.environ["RAW_BUCKET"]
-PROCESSED_BUCKET = os.environ["PROCESSED_BUCKET"]
-TABLE = os.environ["DDB_TABLE"]
-REGION = os.getenv("AWS_REGION", "us-east-1")
+# clients come from the shared registry on first use (see common/aws.py)
+def _s3():
+    return aws.client("s3")
 
-s3 = boto3.client("s3", region_name=REGION)
-textract = boto3.client("textract", region_name=REGION)
-ddb = boto3.resource("dynamodb", region_name=REGION)
-table = ddb.Table(TABLE)
+def _textract():
+    # analyze/start/get go through the per-instance Textract rate limiters
+    return ratelimit.LimitedClient(aws.client("textract"), ratelimit.TEXTRACT_OPS)
 
-from .parser import parse_textract_expense
+def _table():
+    return aws.resource("dynamodb").Table(require("DDB_TABLE"))
+
+def _cache() -> ResultCache:
+    return ResultCache(_s3(), require("PROCESSED_BUCKET"), prefix=CACHE_PREFIX, enabled=CACHE_ENABLED)
 
 def invoice_id_from_key(key: str) -> str:
     # stable id for idempotency
@@ -34,44 +50,278 @@ def processed_key_for(raw_key: str) -> str:
         return f"invoices/processed/misc/{invoice_id_from_key(raw_key)}/parsed.json"
 
 
-def process_one_object(bucket: str, key: str) -> dict:
-    # 1) Textract
-    resp = textract.analyze_expense(Document={"S3Object": {"Bucket": bucket, "Name": key}})
-    parsed = parse_textract_expense(resp)
+def _textract_mode(bucket: str, key: str, size: int | None) -> str:
+    """sync | async; TEXTRACT_MODE=auto goes async for large objects and multi-page PDFs."""
+    if TEXTRACT_MODE in ("sync", "async"):
+        return TEXTRACT_MODE
+    if size and size > TEXTRACT_SYNC_MAX_BYTES:
+        return "async"
+    if size and size < TEXTRACT_SNIFF_MIN_BYTES:
+        return "sync"       # small enough to try; a multi-page file is rejected and retried async
+    if TEXTRACT_SNIFF_PAGES and (textract_async.pdf_page_hint(_s3(), bucket, key) or 1) > 1:
+        return "async"
+    return "sync"
+
+def _analyze(ctx: dict, size: int | None):
+    """
+    Textract response for ctx's object, or None when an async job was started
+    with an SNS notification (textract_done/handler.py finishes it).
+    """
+    from botocore.exceptions import ClientError
+    bucket, key = ctx["bucket"], ctx["key"]
+    tx = ctx["textract"] = {"mode": _textract_mode(bucket, key, size)}
+    if tx["mode"] == "sync":
+        try:
+            return _textract().analyze_expense(Document={"S3Object": {"Bucket": bucket, "Name": key}})
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in textract_async.SYNC_REJECTED:
+                raise
+            tx.update(mode="async", fallback=code)   # multi-page or too large: retry async
+
+    token = textract_async.request_token(bucket, key, ctx["etag"])
+    if TEXTRACT_SNS_TOPIC_ARN and TEXTRACT_SNS_ROLE_ARN:
+        tx["job_id"] = textract_async.start(_textract(), bucket, key, token=token, tag=ctx["etag"],
+                                            sns_topic_arn=TEXTRACT_SNS_TOPIC_ARN, role_arn=TEXTRACT_SNS_ROLE_ARN)
+        return None
+    return textract_async.analyze(_textract(), bucket, key, token=token,
+                                  timeout=TEXTRACT_POLL_TIMEOUT, first_delay=TEXTRACT_POLL_DELAY)
+
+def prepare_object(bucket: str, key: str, etag: str | None = None, size: int | None = None,
+                   textract_job: str | None = None) -> dict:
+    """
+    Steps 0-1 (+ normalized-cache lookup) of process_one_object. Returns a
+    context dict; ctx["needs_llm"] is True when step 2 still has to run, so
+    callers such as the daily batch can normalize several invoices together.
+    ctx["pending"] is True when Textract runs as an async job that reports
+    completion over SNS; `textract_job` resumes such an object with its JobId.
+    The invoice is marked pending or error (DynamoDB + day manifest) here,
+    so every caller keeps the same status bookkeeping.
+    """
+    t0 = time.monotonic()
+    try:
+        ctx = _prepare_object(bucket, key, etag, size, textract_job)
+    except Exception as e:
+        fail(key, etag, e, size=size, t0=t0)
+        raise
+    if ctx["pending"]:
+        _record_ctx(ctx, "pending", textract_job=ctx["textract"]["job_id"])
+        mark(key, ctx["etag"], "pending")
+    return ctx
+
+def _prepare_object(bucket: str, key: str, etag: str | None, size: int | None, textract_job: str | None) -> dict:
+    # 0) Object ETag keys the result cache (S3 events and listings already carry it)
+    cache = _cache()
+    if cache.enabled and not etag:
+        head = _s3().head_object(Bucket=bucket, Key=key)
+        etag, size = head.get("ETag"), size or head.get("ContentLength")
+    etag = clean_etag(etag)
+    ctx = {"bucket": bucket, "key": key, "etag": etag, "size": size, "llm_norm": None, "prompt_version": None,
+           "needs_llm": False, "pending": False, "source": None, "textract": None,
+           "cache_meta": {}, "norm_meta": {}, "t0": time.monotonic()}
+
+    # 1) Textract (reused when the bytes are unchanged; sync or async by size/page count)
+    resp = cache.get_textract(etag)
+    ctx["cache_meta"]["textract"] = "hit" if resp is not None else "miss"
+    if resp is None:
+        if textract_job:
+            ctx["textract"] = {"mode": "async", "job_id": textract_job}
+            resp = textract_async.fetch(_textract(), textract_job)
+        else:
+            resp = _analyze(ctx, size)
+        if resp is None:
+            ctx["pending"] = True
+            return ctx
+        cache.put_textract(etag, resp)
+    ctx["resp"] = resp
+    ctx["parsed"] = parse_textract_expense(resp)
+
+    if not USE_LLM and LOCAL_NORMALIZE:
+        notes = ctx["norm_meta"]["notes"] = []
+        ctx["llm_norm"] = normalize_local(ctx["parsed"], notes)
+        ctx["source"] = "textract+local"
+        return ctx
+
+    if USE_LLM and LLM_ROUTER:
+        # complete + consistent parses are normalized locally, without Bedrock
+        decision, draft = router.route(ctx["parsed"])
+        ctx["norm_meta"]["route"] = decision
+        if decision["route"] == "local":
+            ctx["llm_norm"] = draft
+            ctx["source"] = "textract+local"
+            return ctx
 
-    # 2) (NEW) LLM normalization/enrichment
-    llm_norm = None
     if USE_LLM:
-        llm_norm = normalize_invoice(resp, parsed)
+        from .normalize import cache_version
+        ctx["prompt_version"] = cache_version()
+        ctx["llm_norm"] = cache.get_normalized(etag, BEDROCK_MODEL_ID, ctx["prompt_version"])
+        ctx["cache_meta"]["normalized"] = "hit" if ctx["llm_norm"] is not None else "miss"
+        ctx["needs_llm"] = ctx["llm_norm"] is None
+    return ctx
+
+def set_normalized(ctx: dict, llm_norm: dict) -> None:
+    ctx["llm_norm"] = llm_norm
+    ctx["needs_llm"] = False
+    _cache().put_normalized(ctx["etag"], BEDROCK_MODEL_ID, ctx["prompt_version"], llm_norm)
+
+def normalize_object(ctx: dict) -> None:
+    # 2) (NEW) LLM normalization/enrichment, one invoice per request
+    from .normalize import normalize_invoice
+    set_normalized(ctx, normalize_invoice(ctx["resp"], ctx["parsed"], meta=ctx["norm_meta"]))
+
+def _summary_attrs(parsed: dict, llm_norm: dict | None, source: str | None = None) -> dict:
+    return {
+        "vendor": (llm_norm or {}).get("vendor",{}).get("name") or parsed.get("vendor") or "",
+        "currency": (llm_norm or {}).get("invoice",{}).get("currency") or parsed.get("currency") or "",
+        "totals": (llm_norm or {}).get("totals") or {},
+        "source": source,
+        # locally normalized (router / USE_LLM=false) results are not LLM output
+        "llm_present": bool(llm_norm) and source != "textract+local",
+    }
+
+def ddb_item(raw_key: str, etag: str | None, processed_key: str, parsed: dict, llm_norm: dict | None,
+             payload_bytes: int | None = None, encoding: str | None = None, mode: str = DDB_ITEM_MODE,
+             source: str | None = None, status: str = "done") -> dict:
+    """
+    The DynamoDB item of an invoice. "slim" keeps the index/summary fields
+    and a pointer to the S3 payload (processed_key, its encoding and size);
+    "full" also embeds source_parse and llm_normalized as before.
+    """
+    item = {
+        "invoice_id": invoice_id_from_key(raw_key),
+        "raw_key": raw_key,
+        "raw_etag": etag,
+        "processed_key": processed_key,
+        **_summary_attrs(parsed, llm_norm, source),
+        **query.index_attrs(processed_key, status, parsed, llm_norm),
+        "payload_encoding": codec.effective(encoding),
+        "payload_bytes": payload_bytes,
+    }
+    if mode == "full":
+        item.update({"source_parse": parsed, "llm_normalized": llm_norm})
+    return item
+
+def _update(invoice_id: str, attrs: dict) -> None:
+    _table().update_item(
+        Key={"invoice_id": invoice_id},
+        UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in attrs),
+        ExpressionAttributeNames={f"#{k}": k for k in attrs},
+        ExpressionAttributeValues={f":{k}": v for k, v in attrs.items()},
+    )
+
+def mark(raw_key: str, etag: str | None, status: str, **extra) -> None:
+    """Set an invoice's status (pending/error) and DayStatusIndex keys without touching its other fields."""
+    out_key = processed_key_for(raw_key)
+    _update(invoice_id_from_key(raw_key), {"raw_key": raw_key, "raw_etag": etag, "processed_key": out_key,
+                                           **query.index_attrs(out_key, status), **extra})
+
+def record(raw_key: str, etag: str | None, status: str, size: int | None = None, source: str | None = None,
+           model_id: str | None = None, ms: float | None = None, **extra) -> None:
+    """Record raw_key's attempt in its day manifest (common/manifest.py); best-effort, never raises."""
+    if not MANIFEST_ENABLED:
+        return
+    entry = {"key": processed_key_for(raw_key), "invoice_id": invoice_id_from_key(raw_key), "raw_key": raw_key,
+             "etag": etag, "size": size, "status": status, "source": source, "model_id": model_id,
+             "ms": ms, "ts": round(time.time(), 3), **{k: v for k, v in extra.items() if v is not None}}
+    try:
+        manifest.append(_s3(), require("PROCESSED_BUCKET"), entry)
+    except Exception as e:
+        print(f"[manifest] could not record {status} for {raw_key}: {type(e).__name__}: {e}")
+
+def _record_ctx(ctx: dict, status: str, **extra) -> None:
+    tx = ctx.get("textract") or {}
+    record(ctx["key"], ctx["etag"], status, size=ctx.get("size"), ms=round((time.monotonic() - ctx["t0"]) * 1000, 1),
+           textract=tx.get("mode"), llm_timing=ctx["norm_meta"].get("timing"), **extra)
+
+def fail(key: str, etag: str | None, error, size: int | None = None, t0: float | None = None) -> None:
+    """Record a failed attempt and mark the invoice "error"; never raises over the original error."""
+    if isinstance(error, BaseException):
+        error = f"{type(error).__name__}: {error}"
+    error = str(error)[:300]
+    etag = clean_etag(etag) or None
+    try:
+        record(key, etag, "error", size=size, ms=round((time.monotonic() - t0) * 1000, 1) if t0 else None,
+               error=error)
+        mark(key, etag, "error", error=error)
+    except Exception as me:  # the original error is the one to report
+        print(f"[status] could not record error for {key}: {me}")
+
+def fail_object(ctx: dict, error) -> None:
+    """fail() for a prepared object, e.g. one its batch normalization dropped."""
+    fail(ctx["key"], ctx["etag"], error, size=ctx.get("size"), t0=ctx.get("t0"))
+
+def finish_object(ctx: dict) -> dict:
+    try:
+        return _finish_object(ctx)
+    except Exception as e:
+        fail_object(ctx, e)
+        raise
+
+def _finish_object(ctx: dict) -> dict:
+    key, etag, parsed, llm_norm = ctx["key"], ctx["etag"], ctx["parsed"], ctx["llm_norm"]
 
     # 3) Save processed JSON (now includes both)
     out_key = processed_key_for(key)
+    source = ctx.get("source") or ("textract+genai" if llm_norm else "textract-only")
+    model_id = BEDROCK_MODEL_ID if llm_norm and not ctx.get("source") else None
+    # queued for a Bedrock batch job: pending until collect_job merges (or re-normalizes) it
+    status = "pending" if ctx["norm_meta"].get("batch_job") == "pending" else "done"
     payload = {
-      "raw_bucket": bucket,
+      "raw_bucket": ctx["bucket"],
       "raw_key": key,
       "source_parse": parsed,         # deterministic Phase-1 parse
       "llm_normalized": llm_norm,     # GenAI Phase-2 output (or null)
-      "meta": {"source":"textract+genai" if llm_norm else "textract-only"}
+      "meta": {"source": source, "etag": etag, "model_id": model_id,
+               "prompt_version": ctx["prompt_version"] if llm_norm else None,
+               "textract": ctx.get("textract"),
+               "cache": ctx["cache_meta"], "normalize": ctx["norm_meta"]}
     }
-    s3.put_object(
-        Bucket=PROCESSED_BUCKET,
-        Key=out_key,
-        Body=json.dumps(payload).encode("utf-8"),
-        ContentType="application/json"
-    )
+    size = codec.put_json(_s3(), require("PROCESSED_BUCKET"), out_key, payload, PAYLOAD_ENCODING)
 
-    # 4) Upsert into DynamoDB (store both variants for comparison)
+    # 4) Upsert into DynamoDB (index fields + pointer to the payload; DDB_ITEM_MODE=full embeds both maps)
     inv_id = invoice_id_from_key(key)
-    table.put_item(Item={
-        "invoice_id": inv_id,
-        "raw_key": key,
-        "processed_key": out_key,
-        "vendor": (llm_norm or {}).get("vendor",{}).get("name") or parsed.get("vendor") or "",
-        "currency": (llm_norm or {}).get("invoice",{}).get("currency") or parsed.get("currency") or "",
-        "totals": (llm_norm or {}).get("totals") or {},
-        "llm_present": bool(llm_norm),
-        "source_parse": parsed,
-        "llm_normalized": llm_norm if USE_LLM else None
-    })
+    _table().put_item(Item=ddb_item(key, etag, out_key, parsed, llm_norm, size, PAYLOAD_ENCODING,
+                                    source=source, status=status))
 
+    # 5) Index it in the day manifest (after the object exists, so readers never see a dangling entry)
+    _record_ctx(ctx, status, source=source, model_id=model_id)
     return {"invoice_id": inv_id, "processed_key": out_key, "parsed": parsed, "llm": llm_norm}
+
+def pending_result(ctx: dict) -> dict:
+    # async Textract still running; textract_done/handler.py writes the invoice
+    return {"invoice_id": invoice_id_from_key(ctx["key"]), "processed_key": processed_key_for(ctx["key"]),
+            "textract_job": ctx["textract"]["job_id"], "pending": True}
+
+def process_one_object(bucket: str, key: str, etag: str | None = None, size: int | None = None,
+                       textract_job: str | None = None) -> dict:
+    ctx = prepare_object(bucket, key, etag, size=size, textract_job=textract_job)
+    if ctx["pending"]:
+        return pending_result(ctx)
+    if ctx["needs_llm"]:
+        try:
+            normalize_object(ctx)
+        except Exception as e:
+            fail_object(ctx, e)
+            raise
+    return finish_object(ctx)
+
+def merge_normalized(invoice_id: str, processed_key: str, llm_norm: dict, etag: str | None = None,
+                     prompt_version: str | None = None, norm_meta: dict | None = None) -> None:
+    """Attach a normalization produced later (Bedrock batch job) to an invoice already written by finish_object."""
+    bucket = require("PROCESSED_BUCKET")
+    payload = codec.get_json(_s3(), bucket, processed_key)
+    payload["llm_normalized"] = llm_norm
+    meta = payload.setdefault("meta", {})
+    meta.update({"source": "textract+genai", "model_id": BEDROCK_MODEL_ID, "prompt_version": prompt_version})
+    meta.setdefault("normalize", {}).update(norm_meta or {})
+    size = codec.put_json(_s3(), bucket, processed_key, payload, PAYLOAD_ENCODING)
+    record(payload.get("raw_key") or "", etag or meta.get("etag"), "done", source="textract+genai",
+           model_id=BEDROCK_MODEL_ID, batch_job=(norm_meta or {}).get("batch_job"))
+
+    attrs = {**_summary_attrs(payload.get("source_parse") or {}, llm_norm, "textract+genai"),
+             **query.index_attrs(processed_key, "done", payload.get("source_parse") or {}, llm_norm),
+             "payload_encoding": codec.effective(PAYLOAD_ENCODING), "payload_bytes": size}
+    if DDB_ITEM_MODE == "full":
+        attrs["llm_normalized"] = llm_norm
+    _update(invoice_id, attrs)
+    _cache().put_normalized(etag, BEDROCK_MODEL_ID, prompt_version, llm_norm)
@@ -1,5 +1,5 @@
 # src/common/prompt.py
-import json
+import json, hashlib
 
 SYSTEM = (
   "You are a strict, deterministic invoice-normalization engine. "
@@ -71,3 +71,33 @@ Hard rules:
 - If sum(line_items.amount) ~ totals.total (+/- 1%), set sum_matches_total=true else false.
 - Never include explanations or markdown, just JSON.
 """.strip()
+
+
+# Multi-invoice request (normalize.normalize_invoices_batch)
+BATCH_PROMPT = (
+  "Normalize EACH invoice below independently, applying the same schema and rules. "
+  "Output ONLY a minified JSON array with exactly one element per invoice: "
+  '[{"invoice_id":"<id as given>","result":{<TARGET_JSON_SCHEMA object>}}]. No prose.'
+)
+
+# Long invoices (normalize: LLM_LINE_CHUNK line items per request)
+CHUNK_PROMPT = (
+  "PART {part} of {parts} of one long invoice; its line items are split across parts. "
+  "Normalize the line items given here, in order. On parts after the first, "
+  "vendor/invoice/totals may be left empty."
+)
+
+# Field-level re-ask (normalize._reask): only fields that failed validation
+REASK_PROMPT = (
+  "Some fields of a normalized invoice failed validation. Using the EVIDENCE, correct ONLY the "
+  "listed FIELDS. Output ONLY a minified JSON object mapping each field path to its corrected "
+  'string value ("" if unknown), e.g. {"invoice.date_iso":"2025-10-04"}. No prose.'
+)
+
+# Bump PROMPT_REVISION when the message layout in normalize.build_messages changes;
+# the content hash covers edits to the texts above. Used to key cached LLM results.
+PROMPT_REVISION = 4
+PROMPT_VERSION = f"r{PROMPT_REVISION}-" + hashlib.sha1(
+    json.dumps([SYSTEM, FEW_SHOTS, SCHEMA_TEXT, SCHEMA_PROMPT, BATCH_PROMPT, CHUNK_PROMPT, REASK_PROMPT],
+               sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
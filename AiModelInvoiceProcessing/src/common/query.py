@@ -0,0 +1,116 @@
+# src/common/query.py
+# Invoices table lookups through VendorDateIndex and DayStatusIndex (template.yaml).
+import re, datetime, unicodedata
+from zoneinfo import ZoneInfo
+
+from .config import TIMEZONE
+from .local_normalize import parse_date
+
+VENDOR_DATE_INDEX = "VendorDateIndex"
+DAY_STATUS_INDEX = "DayStatusIndex"
+STATUSES = ("done", "pending", "error")
+PROJECTED = ("invoice_id", "vendor", "vendor_norm", "invoice_date", "processed_date", "status",
+             "currency", "totals", "processed_key", "llm_present")
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_LEGAL = {"inc", "llc", "ltd", "limited", "co", "corp", "corporation", "company", "gmbh", "ag", "sa", "sas",
+          "sarl", "srl", "spa", "bv", "nv", "plc", "pty", "oy", "ab", "kg"}
+
+def vendor_key(name: str | None) -> str:
+    """'Alpine GmbH', 'ALPINE, GmbH.' and 'Alpíne' -> 'alpine' (the VendorDateIndex hash key)."""
+    s = unicodedata.normalize("NFKD", name or "")
+    s = "".join(c for c in s if not unicodedata.combining(c)).casefold()
+    words = _NON_ALNUM.sub(" ", s).split()
+    while len(words) > 1 and words[-1] in _LEGAL:
+        words.pop()
+    return " ".join(words)
+
+def _day(processed_key: str | None) -> str:
+    # invoices/processed/YYYY/MM/DD/<id>/parsed.json -> YYYY-MM-DD; today (TIMEZONE) for misc/
+    parts = (processed_key or "").split("/")
+    if len(parts) > 4 and parts[2].isdigit() and parts[3].isdigit() and parts[4].isdigit():
+        return f"{parts[2]}-{parts[3]}-{parts[4]}"
+    return datetime.datetime.now(ZoneInfo(TIMEZONE)).date().isoformat()
+
+def index_attrs(processed_key: str, status: str, parsed: dict | None = None, llm_norm: dict | None = None) -> dict:
+    """
+    The GSI key attributes of an item. DynamoDB rejects empty strings in
+    index keys, so vendor_norm / invoice_date are left out when unknown.
+    """
+    out = {"processed_date": _day(processed_key), "status": status}
+    if parsed is None and llm_norm is None:
+        return out
+    parsed, llm = parsed or {}, llm_norm or {}
+    vendor = vendor_key((llm.get("vendor") or {}).get("name") or parsed.get("vendor"))
+    date = (llm.get("invoice") or {}).get("date_iso") or parse_date(parsed.get("invoice_date") or "")
+    if vendor:
+        out["vendor_norm"] = vendor
+    if date:
+        out["invoice_date"] = date
+    return out
+
+def _query(table, index: str, keys: list, currency: str | None = None, fields=None,
+           limit: int | None = None, page_size: int = 500):
+    # keys: [(attribute, op, value)] with op "=", "between" (value = (lo, hi)) or "begins_with"
+    names, values, conds = {}, {}, []
+    for i, (attr, op, v) in enumerate(keys):
+        names[f"#k{i}"] = attr
+        if op == "between":
+            values[f":k{i}a"], values[f":k{i}b"] = v
+            conds.append(f"#k{i} BETWEEN :k{i}a AND :k{i}b")
+        elif op == "begins_with":
+            values[f":k{i}"] = v
+            conds.append(f"begins_with(#k{i}, :k{i})")
+        else:
+            values[f":k{i}"] = v
+            conds.append(f"#k{i} = :k{i}")
+    kw = {"IndexName": index, "KeyConditionExpression": " AND ".join(conds)}
+    if currency:
+        names["#cur"], values[":cur"] = "currency", currency.upper()
+        kw["FilterExpression"] = "#cur = :cur"
+    fields = list(fields or PROJECTED)
+    names.update({f"#p{i}": f for i, f in enumerate(fields)})
+    kw["ProjectionExpression"] = ", ".join(f"#p{i}" for i in range(len(fields)))
+    kw.update(ExpressionAttributeNames=names, ExpressionAttributeValues=values)
+
+    n = 0
+    while True:
+        resp = table.query(Limit=page_size, **kw)
+        for item in resp.get("Items", []):
+            yield item
+            n += 1
+            if limit is not None and n >= limit:
+                return
+        if not resp.get("LastEvaluatedKey"):
+            return
+        kw["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+def by_vendor(table, vendor: str, date_from: str | None = None, date_to: str | None = None, **kw):
+    """Invoices of `vendor` (any spelling vendor_key() folds together), by invoice date, optionally in a range."""
+    keys = [("vendor_norm", "=", vendor_key(vendor))]
+    if date_from or date_to:
+        keys.append(("invoice_date", "between", (date_from or "0000-01-01", date_to or "9999-12-31")))
+    return _query(table, VENDOR_DATE_INDEX, keys, **kw)
+
+def by_day(table, day: str, status: str | None = None, **kw):
+    """Invoices processed on `day` (YYYY-MM-DD, the raw upload partition), optionally with one status."""
+    keys = [("processed_date", "=", day)]
+    if status:
+        keys.append(("status", "=", status))
+    return _query(table, DAY_STATUS_INDEX, keys, **kw)
+
+def count_day(table, day: str, status: str | None = None) -> int:
+    """Number of items processed on `day`, optionally with one status (Select=COUNT, no items read back)."""
+    names, values, cond = {"#d": "processed_date"}, {":d": day}, "#d = :d"
+    if status:
+        names["#s"], values[":s"] = "status", status
+        cond += " AND #s = :s"
+    kw = {"IndexName": DAY_STATUS_INDEX, "KeyConditionExpression": cond, "Select": "COUNT",
+          "ExpressionAttributeNames": names, "ExpressionAttributeValues": values}
+    n = 0
+    while True:
+        resp = table.query(**kw)
+        n += resp.get("Count", 0)
+        if not resp.get("LastEvaluatedKey"):
+            return n
+        kw["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
@@ -0,0 +1,163 @@
+# src/common/ratelimit.py
+# Per-instance client-side rate limiting (token buckets + AIMD) for Bedrock and Textract.
+import time, random, threading
+
+from .config import (BEDROCK_RPS, BEDROCK_TPM, TEXTRACT_RPS, TEXTRACT_GET_RPS,
+                     RATE_MAX_ATTEMPTS, RATE_MIN_RPS)
+
+THROTTLED = {"ThrottlingException", "TooManyRequestsException", "ProvisionedThroughputExceededException",
+             "LimitExceededException", "RequestLimitExceeded", "SlowDown"}
+TRANSIENT = {"ServiceUnavailableException", "ServiceUnavailable", "InternalServerException",
+             "InternalServerError", "ModelNotReadyException", "ModelTimeoutException"}
+_TRANSIENT_TYPES = {"EndpointConnectionError", "ConnectTimeoutError", "ConnectionClosedError"}
+_EPS = 1e-9   # refill arithmetic is float; don't spin on rounding leftovers
+
+def error_code(e) -> str | None:
+    return (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+
+class RateLimiter:
+    def __init__(self, name: str, rps: float, tpm: int = 0, min_rps: float = 0.1, backoff: float = 0.5,
+                 step: float | None = None, max_attempts: int = 6, base_delay: float = 0.25,
+                 max_delay: float = 20.0, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.max_rps = float(rps)
+        self.rate = float(rps)
+        self.min_rps = min(float(min_rps), self.max_rps)
+        self.backoff = backoff
+        self.step = step if step is not None else max(0.05, self.max_rps / 20)
+        self.tpm = int(tpm or 0)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay, self.max_delay = base_delay, max_delay
+        self.clock, self.sleep = clock, sleep
+        self._lock = threading.Lock()
+        self._t = clock()
+        self._req = max(1.0, self.max_rps)       # burst of one second's worth
+        self._tok = float(self.tpm)
+        self.counters = {"requests": 0, "throttled": 0, "transient": 0, "retries": 0, "failed": 0,
+                         "wait_s": 0.0, "tokens": 0}
+
+    def _refill(self):
+        now = self.clock()
+        dt, self._t = now - self._t, now
+        self._req = min(max(1.0, self.rate), self._req + dt * self.rate)
+        if self.tpm:
+            self._tok = min(float(self.tpm), self._tok + dt * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request slot (and `tokens` of the minute budget) is free; returns seconds waited."""
+        tokens = min(tokens, self.tpm) if self.tpm else 0   # an oversized request still gets through
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                need_req = 1.0 - self._req
+                need_tok = tokens - self._tok if tokens else 0.0
+                if need_req <= _EPS and need_tok <= _EPS:
+                    self._req -= 1.0
+                    self._tok -= tokens
+                    self.counters["wait_s"] += waited
+                    return waited
+                delay = max(need_req / self.rate if need_req > 0 else 0.0,
+                            need_tok * 60 / self.tpm if need_tok > 0 else 0.0)
+            self.sleep(delay)
+            waited += delay
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Return the unused part of a token reservation once the actual usage is known."""
+        with self._lock:
+            if self.tpm:
+                self._tok = min(float(self.tpm), self._tok + reserved - used)
+            self.counters["tokens"] += used
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rps, self.rate + self.step)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rps, self.rate * self.backoff)
+            self._req = min(self._req, 0.0)     # everyone waits for the slower refill
+
+    def call(self, fn, tokens: int = 0):
+        """fn() under the limiter, retrying throttled and transient failures with full jitter."""
+        for attempt in range(1, self.max_attempts + 1):
+            self.acquire(tokens)
+            with self._lock:
+                self.counters["requests"] += 1
+            try:
+                out = fn()
+            except Exception as e:
+                self.settle(tokens, 0)          # a rejected request used none of its tokens
+                code = error_code(e)
+                if code in THROTTLED:
+                    kind = "throttled"
+                    self.on_throttle()
+                elif code in TRANSIENT or type(e).__name__ in _TRANSIENT_TYPES:
+                    kind = "transient"
+                else:
+                    raise
+                with self._lock:
+                    self.counters[kind] += 1
+                    self.counters["failed" if attempt == self.max_attempts else "retries"] += 1
+                if attempt == self.max_attempts:
+                    raise
+                self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                continue
+            self.on_success()
+            return out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.counters, "wait_s": round(self.counters["wait_s"], 3),
+                    "rate_rps": round(self.rate, 3), "max_rps": self.max_rps, "tpm": self.tpm}
+
+# --------------------------
+# Per-instance registry
+# --------------------------
+_SETTINGS = {
+    "bedrock": lambda: {"rps": BEDROCK_RPS, "tpm": BEDROCK_TPM},
+    "textract": lambda: {"rps": TEXTRACT_RPS},              # AnalyzeExpense / StartExpenseAnalysis
+    "textract-get": lambda: {"rps": TEXTRACT_GET_RPS},      # GetExpenseAnalysis polls and pages
+}
+TEXTRACT_OPS = {"analyze_expense": "textract", "start_expense_analysis": "textract",
+                "get_expense_analysis": "textract-get"}
+
+_lock = threading.Lock()
+_limiters = {}
+
+def get(name: str) -> RateLimiter:
+    lim = _limiters.get(name)
+    if lim is None:
+        with _lock:
+            lim = _limiters.get(name)
+            if lim is None:
+                opts = _SETTINGS[name]()
+                lim = _limiters[name] = RateLimiter(name, min_rps=RATE_MIN_RPS,
+                                                    max_attempts=RATE_MAX_ATTEMPTS, **opts)
+    return lim
+
+def set_limiter(name: str, lim: RateLimiter) -> None:
+    """Install a pre-built limiter (tests, benchmarks)."""
+    with _lock:
+        _limiters[name] = lim
+
+def reset() -> None:
+    with _lock:
+        _limiters.clear()
+
+def stats() -> dict:
+    """Counters of every limiter used so far in this instance, for tuning concurrency."""
+    return {name: lim.snapshot() for name, lim in list(_limiters.items())}
+
+class LimitedClient:
+    """Proxy for a boto3 client that routes the operations in `ops` ({method: limiter name}) through call()."""
+    def __init__(self, client, ops: dict):
+        self._client = client
+        self._ops = ops
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self._ops:
+            return attr
+        lim = get(self._ops[name])
+        return lambda *a, **kw: lim.call(lambda: attr(*a, **kw))
@@ -0,0 +1,34 @@
+# src/common/router.py
+# Deterministic-first routing: complete, confident parses skip Bedrock.
+from .config import ROUTE_MIN_CONFIDENCE
+from .local_normalize import normalize_local
+
+DECISIVE = ("vendor", "invoice_number", "invoice_date", "currency", "subtotal", "tax", "total", "line_items")
+
+def route(parsed: dict):
+    """Returns (decision, local_result); local_result is the draft to keep when routed local."""
+    if parsed.get("error"):
+        return {"route": "llm", "reasons": [parsed["error"]]}, None
+
+    notes = []
+    draft = normalize_local(parsed, notes)
+    reasons = [f"missing:{k}" for k, v in (("vendor", draft["vendor"]["name"]),
+                                           ("invoice_number", draft["invoice"]["number"]),
+                                           ("invoice_date", draft["invoice"]["date_iso"]),
+                                           ("currency", draft["invoice"]["currency"]),
+                                           ("total", draft["totals"]["total"])) if not v]
+    # anything the normalizer had to guess or could not reconcile is for the LLM
+    reasons += [n for n in notes if n not in ("currency_missing",)]
+
+    confs = (parsed.get("meta") or {}).get("confidence") or {}
+    confs = [confs[k] for k in DECISIVE if k in confs]   # due date, PO, address don't gate routing
+    min_conf = min(confs) if confs else None
+    if min_conf is None or min_conf < ROUTE_MIN_CONFIDENCE:
+        reasons.append("low_confidence")
+    items = draft["line_items"]
+    if not items:
+        reasons.append("no_line_items")
+    elif any(not li["description"] or not li["amount"] for li in items):
+        reasons.append("incomplete_line_items")
+
+    return {"route": "llm" if reasons else "local", "reasons": reasons, "min_conf": min_conf}, draft
@@ -0,0 +1,97 @@
+# src/common/textract_async.py
+# Asynchronous AnalyzeExpense for multi-page or oversized documents.
+import re, time, random, hashlib
+
+DONE = {"SUCCEEDED", "PARTIAL_SUCCESS"}
+FAILED = {"FAILED"}
+# synchronous AnalyzeExpense errors that mean "use the async API instead"
+SYNC_REJECTED = {"UnsupportedDocumentException", "DocumentTooLargeException"}
+
+_TOKEN = re.compile(r"[^a-zA-Z0-9_-]")
+_TAG = re.compile(r"[^a-zA-Z0-9_.:-]")
+_LINEARIZED_PAGES = re.compile(rb"/Linearized\b.{0,512}?/N\s+(\d+)", re.S)
+
+def request_token(bucket: str, key: str, etag: str | None) -> str | None:
+    # tokens are idempotent account-wide: two keys with the same bytes must not share a job
+    if not etag:
+        return None
+    return hashlib.sha256(f"{bucket}/{key}:{etag}".encode("utf-8")).hexdigest()[:64]
+
+def pdf_page_hint(s3, bucket: str, key: str) -> int | None:
+    """Page count of a linearized PDF from its first KB; None when it can't be read there."""
+    if not key.lower().endswith(".pdf"):
+        return None
+    head = s3.get_object(Bucket=bucket, Key=key, Range="bytes=0-1023")["Body"].read()
+    m = _LINEARIZED_PAGES.search(head)
+    return int(m.group(1)) if m else None
+
+def start(textract, bucket: str, key: str, token: str | None = None, tag: str | None = None,
+          sns_topic_arn: str | None = None, role_arn: str | None = None) -> str:
+    """Start a job and return its JobId; retries with the same `token` get the same job."""
+    kw = {"DocumentLocation": {"S3Object": {"Bucket": bucket, "Name": key}}}
+    if token:
+        kw["ClientRequestToken"] = _TOKEN.sub("-", token)[:64]
+    if tag:
+        kw["JobTag"] = _TAG.sub("-", tag)[:64]
+    if sns_topic_arn and role_arn:
+        kw["NotificationChannel"] = {"SNSTopicArn": sns_topic_arn, "RoleArn": role_arn}
+    return textract.start_expense_analysis(**kw)["JobId"]
+
+def wait(textract, job_id: str, timeout: float = 90.0, first_delay: float = 1.0,
+         max_delay: float = 10.0, sleep=time.sleep) -> str:
+    """Poll until the job finishes; returns its final JobStatus. Raises on failure or timeout."""
+    deadline = time.monotonic() + timeout
+    delay = first_delay
+    while True:
+        resp = textract.get_expense_analysis(JobId=job_id, MaxResults=1)
+        status = resp.get("JobStatus")
+        if status in DONE:
+            return status
+        if status in FAILED:
+            raise RuntimeError(f"Textract job {job_id} failed: {resp.get('StatusMessage') or status}")
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Textract job {job_id} still {status} after {timeout:.0f}s")
+        sleep(delay * random.uniform(0.8, 1.2))   # jitter keeps concurrent pollers apart
+        delay = min(max_delay, delay * 2)
+
+def iter_result_pages(textract, job_id: str, page_size: int = 1000):
+    """Yield every GetExpenseAnalysis response of a finished job, following NextToken."""
+    token = None
+    while True:
+        kw = {"JobId": job_id, "MaxResults": page_size}
+        if token:
+            kw["NextToken"] = token
+        resp = textract.get_expense_analysis(**kw)
+        yield resp
+        token = resp.get("NextToken")
+        if not token:
+            return
+
+def fetch(textract, job_id: str) -> dict:
+    """All result pages of a finished job as one analyze_expense-shaped response (Blocks dropped)."""
+    docs, meta, status, warnings = {}, {}, None, []
+    for resp in iter_result_pages(textract, job_id):
+        status = resp.get("JobStatus") or status
+        meta = resp.get("DocumentMetadata") or meta
+        warnings += resp.get("Warnings") or []
+        if status in FAILED:
+            raise RuntimeError(f"Textract job {job_id} failed: {resp.get('StatusMessage') or status}")
+        for d in resp.get("ExpenseDocuments", []):
+            idx = d.get("ExpenseIndex") or len(docs) + 1
+            doc = docs.get(idx)
+            if doc is None:
+                doc = docs[idx] = {"ExpenseIndex": idx, "SummaryFields": [], "LineItemGroups": []}
+            doc["SummaryFields"] += d.get("SummaryFields", [])
+            doc["LineItemGroups"] += d.get("LineItemGroups", [])
+    out = {"DocumentMetadata": meta, "ExpenseDocuments": list(docs.values()),
+           "JobId": job_id, "JobStatus": status}
+    if warnings:
+        out["Warnings"] = warnings
+    return out
+
+def analyze(textract, bucket: str, key: str, token: str | None = None, timeout: float = 90.0,
+            first_delay: float = 1.0, sleep=time.sleep) -> dict:
+    """start + wait + fetch: the blocking equivalent of analyze_expense for any document."""
+    job_id = start(textract, bucket, key, token=token)
+    wait(textract, job_id, timeout=timeout, first_delay=first_delay, sleep=sleep)
+    return fetch(textract, job_id)
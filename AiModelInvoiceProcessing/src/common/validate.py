@@ -0,0 +1,217 @@
+# src/common/validate.py
+# Validation and deterministic repair of normalized invoices against prompt.SCHEMA.
+import re, datetime, functools
+from decimal import Decimal
+
+from .config import SUM_TOLERANCE
+from .prompt import SCHEMA
+from .local_normalize import parse_date, parse_amount, detect_currency, day_first_for, reconciles, CURRENCY_CODES
+
+# rule per schema path: "*" is any key of an object, "[]" every list element
+RULES = {
+    "invoice.date_iso": "date",
+    "invoice.currency": "currency",
+    "totals.*": "money",
+    "line_items[].qty": "number",
+    "line_items[].unit_price": "money",
+    "line_items[].amount": "money",
+    "confidence.*": "score",
+    "validations.sum_matches_total": "bool",
+}
+PROBLEMS = {
+    "missing": "missing",
+    "type": "wrong type",
+    "str": "not a string",
+    "date": "not a valid YYYY-MM-DD date",
+    "currency": "not an ISO 4217 currency code",
+    "money": "not a decimal amount such as 1234.50",
+    "number": "not a decimal number",
+    "score": "not a score between 0.00 and 1.00",
+    "bool": "not true/false",
+    "line_math": "qty x unit_price does not equal amount",
+    "totals_math": "subtotal + tax does not equal total",
+}
+# shipping, discounts, fees and rounding break the arithmetic on real invoices; the model can't fix them
+ARITHMETIC = {"line_math", "totals_math"}
+# fixed locally or only reported, never worth a model call
+LOCAL_ONLY = {"score", "bool", "type"} | ARITHMETIC
+
+_MONEY = re.compile(r"^-?\d+(\.\d{1,2})?$")
+_NUMBER = re.compile(r"^-?\d+(\.\d+)?$")
+
+def _is_date(v) -> bool:
+    try:
+        return isinstance(v, str) and len(v) == 10 and bool(datetime.date.fromisoformat(v))
+    except ValueError:
+        return False
+
+def _is_score(v) -> bool:
+    try:
+        return isinstance(v, str) and 0 <= float(v) <= 1
+    except ValueError:
+        return False
+
+# an empty string is the schema's "unknown" and always valid for string fields
+_CHECKS = {
+    "str": lambda v: isinstance(v, str),
+    "date": lambda v: v == "" or _is_date(v),
+    "currency": lambda v: v == "" or v in CURRENCY_CODES,
+    "money": lambda v: isinstance(v, str) and (v == "" or bool(_MONEY.match(v))),
+    "number": lambda v: isinstance(v, str) and (v == "" or bool(_NUMBER.match(v))),
+    "score": lambda v: v == "" or _is_score(v),
+    "bool": lambda v: isinstance(v, bool),
+}
+
+def _rule(pattern: str) -> str:
+    if pattern in RULES:
+        return RULES[pattern]
+    head, _, _ = pattern.rpartition(".")
+    return RULES.get(f"{head}.*", "str")
+
+def _compile(node, prefix=""):
+    if isinstance(node, dict):
+        for k, v in node.items():
+            yield from _compile(v, f"{prefix}.{k}" if prefix else k)
+    elif isinstance(node, list):
+        yield from _compile(node[0], f"{prefix}[]")
+    else:
+        yield prefix, _rule(prefix)
+
+@functools.lru_cache(maxsize=None)
+def compiled() -> tuple:
+    """((path pattern, rule, schema default), ...) for every leaf of prompt.SCHEMA."""
+    return tuple((p, r, False if r == "bool" else "") for p, r in _compile(SCHEMA))
+
+def _walk(data, parts, path=""):
+    # yield (concrete path, parent container, key) for a pattern split on "."
+    head, rest = parts[0], parts[1:]
+    is_list = head.endswith("[]")
+    key = head[:-2] if is_list else head
+    if not isinstance(data, dict):
+        return
+    if is_list:
+        items = data.get(key)
+        if not isinstance(items, list):
+            return
+        for i, item in enumerate(items):
+            if rest:
+                yield from _walk(item, rest, f"{path}{key}.{i}.")
+    elif rest:
+        yield from _walk(data.get(key), rest, f"{path}{key}.")
+    else:
+        yield f"{path}{key}", data, key
+
+def _dec(v):
+    return parse_amount(v) if isinstance(v, str) and v else None
+
+def validate(data: dict) -> list:
+    """[{"path", "code", "value"}] for every field of `data` that breaks the schema rules."""
+    if not isinstance(data, dict):
+        return [{"path": "", "code": "type", "value": None}]
+    errors = []
+    for section in ("vendor", "invoice", "totals", "confidence", "validations"):
+        if not isinstance(data.get(section), dict):
+            errors.append({"path": section, "code": "type", "value": data.get(section)})
+    if not isinstance(data.get("line_items"), list):
+        errors.append({"path": "line_items", "code": "type", "value": data.get("line_items")})
+    for pattern, rule, _ in compiled():
+        for path, parent, key in _walk(data, pattern.split(".")):
+            if key not in parent:
+                errors.append({"path": path, "code": "missing", "value": None})
+            elif not _CHECKS[rule](parent[key]):
+                errors.append({"path": path, "code": rule, "value": parent[key]})
+    if errors:
+        return errors   # arithmetic only on well-formed values
+
+    tol = Decimal(SUM_TOLERANCE)
+    for i, li in enumerate(data["line_items"]):
+        qty, unit, amt = _dec(li.get("qty")), _dec(li.get("unit_price")), _dec(li.get("amount"))
+        if None not in (qty, unit, amt) and abs(qty * unit - amt) > tol:
+            errors.append({"path": f"line_items.{i}.amount", "code": "line_math", "value": li.get("amount")})
+    t = data["totals"]
+    sub, tax, total = _dec(t.get("subtotal")), _dec(t.get("tax")), _dec(t.get("total"))
+    if None not in (sub, tax, total) and abs(sub + tax - total) > tol:
+        errors.append({"path": "totals.total", "code": "totals_math", "value": t.get("total")})
+    return errors
+
+def sum_matches(data: dict) -> bool:
+    amounts = [_dec(li.get("amount")) for li in data.get("line_items") or []]
+    if not amounts or None in amounts:
+        return False
+    t = data.get("totals") or {}
+    return reconciles(sum(amounts), _dec(t.get("subtotal")), _dec(t.get("tax")), _dec(t.get("total")))
+
+def _fix(rule: str, value, source=None, day_first: bool | None = None):
+    # deterministic reformatting of a bad value; None when it cannot be decided
+    text = value if isinstance(value, str) else ("" if value is None or isinstance(value, bool) else str(value))
+    if rule == "str":
+        return text
+    if rule == "date":
+        return parse_date(text, day_first) or parse_date(source, day_first) or None
+    if rule == "currency":
+        return detect_currency(text) or detect_currency(source) or None
+    if rule in ("money", "number"):
+        d = parse_amount(text)
+        if d is None:
+            return None
+        if rule == "money":
+            return f"{d:.2f}"
+        s = f"{d:f}"
+        return s.rstrip("0").rstrip(".") if "." in s else s
+    if rule == "score":
+        try:
+            return f"{max(0.0, min(1.0, float(text))):.2f}"
+        except ValueError:
+            return "0.00"
+    return None
+
+def repair(data: dict, parsed: dict | None = None) -> tuple:
+    """
+    Fix what is deterministic in place: missing keys from the schema, value
+    formats (dates, currency, amounts, scores) and sum_matches_total. Returns
+    (data, fixed paths, remaining errors).
+    """
+    parsed = parsed or {}
+    fixed = []
+    for section, default in (("vendor", {}), ("invoice", {}), ("totals", {}), ("confidence", {}),
+                             ("validations", {}), ("line_items", [])):
+        if not isinstance(data.get(section), type(default)):
+            data[section] = default
+            fixed.append(section)
+    data["line_items"] = [li for li in data["line_items"] if isinstance(li, dict)]
+    sources = {"invoice.date_iso": parsed.get("invoice_date"), "invoice.currency": parsed.get("currency")}
+    currency = detect_currency(str(data["invoice"].get("currency") or ""), parsed.get("currency"), parsed.get("total"))
+    for pattern, rule, default in compiled():
+        if rule == "bool":
+            continue
+        for path, parent, key in _walk(data, pattern.split(".")):
+            if key in parent and _CHECKS[rule](parent[key]):
+                continue
+            v = _fix(rule, parent.get(key), sources.get(pattern), day_first_for(currency))
+            if v is not None or key not in parent:
+                parent[key] = default if v is None else v
+                fixed.append(path)
+    flag = sum_matches(data)
+    if data["validations"].get("sum_matches_total") is not flag:
+        data["validations"]["sum_matches_total"] = flag
+        fixed.append("validations.sum_matches_total")
+    return data, fixed, validate(data)
+
+def set_path(data: dict, path: str, value) -> bool:
+    """Write one dotted path ("line_items.3.amount") that exists in the schema; False if it doesn't."""
+    parts = path.split(".")
+    pattern = ".".join("[]" if p.isdigit() else p for p in parts).replace(".[]", "[]")
+    if pattern not in {p for p, _, _ in compiled()}:
+        return False
+    node = data
+    for p in parts[:-1]:
+        try:
+            node = node[int(p)] if p.isdigit() else node.get(p)
+        except (IndexError, AttributeError, TypeError):
+            return False
+        if node is None:
+            return False
+    if not isinstance(node, dict):
+        return False
+    node[parts[-1]] = value
+    return True
@@ -1,39 +1,258 @@
 # src/daily_batch/handler.py
-import os, datetime
+import datetime, itertools, time
 from zoneinfo import ZoneInfo
-import boto3
 
-RAW_BUCKET = os.environ["RAW_BUCKET"]
-REGION = os.getenv("AWS_REGION", "us-east-1")
-TZ = os.getenv("TIMEZONE", "America/Chicago")
+from common import aws, ratelimit, manifest
+from common.process import (process_one_object, invoice_id_from_key, pending_result, fail_object,
+                            prepare_object, set_normalized, finish_object, merge_normalized)
+from common.fanout import run_bounded
+from common.idempotency import ProcessedFilter
+from common.config import (BATCH_WORKERS, SKIP_PROCESSED, USE_LLM, LLM_BATCH_SIZE,
+                           NORMALIZE_BACKEND, BEDROCK_BATCH_ROLE_ARN, BATCH_INFERENCE_MIN_RECORDS,
+                           BEDROCK_MODEL_ID, MANIFEST_ENABLED, TIMEZONE as TZ, require)
 
-s3 = boto3.client("s3", region_name=REGION)
-from common.process import process_one_object
-
-def today_prefix():
-    now = datetime.datetime.now(ZoneInfo(TZ))
+def today_prefix(days_ago: int = 0):
+    now = datetime.datetime.now(ZoneInfo(TZ)) - datetime.timedelta(days=days_ago)
     yyyy = f"{now.year:04d}"
     mm = f"{now.month:02d}"
     dd = f"{now.day:02d}"
     return f"invoices/raw/{yyyy}/{mm}/{dd}/"
 
-def handler(event, context):
-    prefix = today_prefix()
+def iter_raw_objects(prefix: str):
+    """Yield raw objects page by page so processing can start before listing ends."""
     token = None
-    processed = []
     while True:
-        kwargs = {"Bucket": RAW_BUCKET, "Prefix": prefix, "MaxKeys": 1000}
+        kwargs = {"Bucket": require("RAW_BUCKET"), "Prefix": prefix, "MaxKeys": 1000}
         if token:
             kwargs["ContinuationToken"] = token
-        resp = s3.list_objects_v2(**kwargs)
+        resp = aws.client("s3").list_objects_v2(**kwargs)
         for obj in resp.get("Contents", []):
             key = obj["Key"]
             if key.endswith("/") or key.lower().endswith(".tmp"):
                 continue
-            # process each object idempotently
-            processed.append(process_one_object(RAW_BUCKET, key))
+            yield {"key": key, "etag": obj.get("ETag"), "size": obj.get("Size")}
         if resp.get("IsTruncated"):
             token = resp.get("NextContinuationToken")
         else:
             break
-    return {"ok": True, "prefix": prefix, "count": len(processed)}
+
+def _process(obj):
+    # process each object idempotently; keep only ids in the Lambda response
+    out = process_one_object(require("RAW_BUCKET"), obj["key"], etag=obj["etag"], size=obj.get("size"))
+    return _ids(out)
+
+def _ids(out):
+    # async Textract jobs finished by textract_done are reported as pending
+    ids = {"invoice_id": out["invoice_id"], "processed_key": out["processed_key"]}
+    return {**ids, "pending": True} if out.get("pending") else ids
+
+def _windows(items, n):
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+def _finish(ctx):
+    if "batched" in ctx:
+        set_normalized(ctx, ctx.pop("batched"))
+    return finish_object(ctx)
+
+def run_llm_batched(objects, workers: int, batch_size: int) -> dict:
+    """
+    Same result shape as run_bounded, but invoices needing the LLM are
+    normalized several per Bedrock request. Works one window of
+    workers * batch_size objects at a time to keep memory bounded:
+    Textract/parse concurrently -> multi-invoice normalization -> persist.
+    """
+    from common.normalize import normalize_invoices_batch
+    t0 = time.perf_counter()
+    raw_bucket = require("RAW_BUCKET")
+    succeeded, failed = [], []
+    timings = {"prepare_busy_ms": 0.0, "normalize_ms": 0.0, "finish_busy_ms": 0.0, "llm_invoices": 0}
+
+    for chunk in _windows(objects, max(1, workers) * batch_size):
+        prep = run_bounded(chunk, lambda o: prepare_object(raw_bucket, o["key"], etag=o["etag"], size=o.get("size")),
+                           workers=workers, label=lambda o: o["key"])
+        failed += prep["failed"]
+        timings["prepare_busy_ms"] += prep["timings"]["busy_ms"]
+        prep_ms = {p["key"]: p["ms"] for p in prep["succeeded"]}
+        ctxs = []
+        for p in prep["succeeded"]:
+            c = p["result"]
+            if c["pending"]:
+                succeeded.append({"key": p["key"], "ms": p["ms"], "result": _ids(pending_result(c))})
+            else:
+                ctxs.append(c)
+
+        pending = {invoice_id_from_key(c["key"]): c for c in ctxs if c["needs_llm"]}
+        if pending:
+            t1 = time.perf_counter()
+            metas = {i: c["norm_meta"] for i, c in pending.items()}
+            out = normalize_invoices_batch(((i, c["resp"], c["parsed"]) for i, c in pending.items()),
+                                           metas=metas, max_items=batch_size, workers=workers)
+            timings["normalize_ms"] += (time.perf_counter() - t1) * 1000
+            timings["llm_invoices"] += len(pending)
+            for i, c in pending.items():
+                if i in out:
+                    c["batched"] = out[i]
+                else:
+                    error = metas[i].get("error", "normalization failed")
+                    fail_object(c, error)
+                    failed.append({"key": c["key"], "ms": prep_ms[c["key"]], "error": error})
+                    ctxs.remove(c)
+
+        fin = run_bounded(ctxs, _finish, workers=workers, label=lambda c: c["key"])
+        failed += fin["failed"]
+        timings["finish_busy_ms"] += fin["timings"]["busy_ms"]
+        for f in fin["succeeded"]:
+            r = f["result"]
+            succeeded.append({"key": f["key"], "ms": round(f["ms"] + prep_ms[f["key"]], 1),
+                              "result": {"invoice_id": r["invoice_id"], "processed_key": r["processed_key"]}})
+
+    timings = {k: round(v, 1) for k, v in timings.items()}
+    timings["wall_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return {"succeeded": succeeded, "failed": failed, "timings": timings}
+
+def _job_runner(n_records: int):
+    from common import batch_inference as bi
+    from common.llm_client import invoke_model_body
+    if n_records >= BATCH_INFERENCE_MIN_RECORDS and BEDROCK_BATCH_ROLE_ARN:
+        return bi.BedrockJobRunner(aws.client("s3"), aws.client("bedrock"), require("PROCESSED_BUCKET"),
+                                   BEDROCK_BATCH_ROLE_ARN, BEDROCK_MODEL_ID)
+    # too few records for a Bedrock job: same records, run on demand in-process
+    return bi.LocalJobRunner(invoke_model_body, workers=BATCH_WORKERS)
+
+def _merge_record(manifest):
+    from common.normalize import result_from_model_output
+    def merge(entry, model_output, invoice_id):
+        usage, meta = {}, {"batch_job": manifest["job_name"]}
+        normalized = result_from_model_output(model_output, usage, meta)
+        merge_normalized(invoice_id, entry["processed_key"], normalized, etag=entry.get("etag"),
+                         prompt_version=manifest.get("prompt_version"), norm_meta={**meta, "usage": usage})
+    return merge
+
+def _fallback(workers: int):
+    # records a job did not answer are normalized on demand, as if the job had never been used
+    def run(entries: dict) -> int:
+        raw_bucket = require("RAW_BUCKET")
+        out = run_bounded(list(entries.values()),
+                          lambda e: process_one_object(raw_bucket, e["key"], etag=e.get("etag")),
+                          workers=workers, label=lambda e: e["key"])
+        for f in out["failed"]:
+            print(f"[daily_batch] batch fallback failed key={f['key']} error={f['error']}")
+        return len(out["succeeded"])
+    return run
+
+def collect_batch_jobs(runner_name: str = "bedrock", workers: int = BATCH_WORKERS) -> list:
+    """Merge the output of finished Bedrock batch jobs submitted by earlier runs."""
+    from common import batch_inference as bi
+    s3, bucket = aws.client("s3"), require("PROCESSED_BUCKET")
+    runner = _job_runner(BATCH_INFERENCE_MIN_RECORDS) if runner_name == "bedrock" else None
+    if runner is None or runner.name != runner_name:
+        return []
+    return [bi.collect_job(runner, s3, bucket, m, _merge_record(m), _fallback(workers))
+            for m in bi.pending_manifests(s3, bucket, runner_name)]
+
+def run_batch_inference(objects, workers: int) -> dict:
+    """
+    Textract/parse and write every invoice now (status "pending" until its
+    job is collected), and queue one request body per invoice for a single
+    model-invocation job.
+    """
+    from common import batch_inference as bi
+    from common.normalize import model_input_for, cache_version
+    raw_bucket = require("RAW_BUCKET")
+
+    def _stage(o):
+        ctx = prepare_object(raw_bucket, o["key"], etag=o["etag"], size=o.get("size"))
+        if ctx["pending"]:
+            return {**_ids(pending_result(ctx)), "etag": ctx["etag"], "record": None}
+        record = None
+        if ctx["needs_llm"]:
+            ctx["norm_meta"]["batch_job"] = "pending"
+            record = model_input_for(ctx["resp"], ctx["parsed"])
+        out = finish_object(ctx)
+        return {"invoice_id": out["invoice_id"], "processed_key": out["processed_key"],
+                "etag": ctx["etag"], "record": record}
+
+    run = run_bounded(objects, _stage, workers=workers, label=lambda o: o["key"])
+    records, index = [], {}
+    for s in run["succeeded"]:
+        r = s["result"]
+        body = r.pop("record")
+        if body is not None:
+            records.append({"recordId": r["invoice_id"], "modelInput": body})
+            index[r["invoice_id"]] = {"key": s["key"], "processed_key": r["processed_key"], "etag": r.pop("etag")}
+        r.pop("etag", None)
+
+    if records:
+        runner = _job_runner(len(records))
+        manifest = bi.submit_job(runner, aws.client("s3"), require("PROCESSED_BUCKET"), records, index,
+                                 extra={"model_id": BEDROCK_MODEL_ID, "prompt_version": cache_version()})
+        run["job"] = {"job_name": manifest["job_name"], "runner": runner.name, "records": len(records)}
+        if runner.name == "local":
+            run["job"]["collected"] = bi.collect_job(runner, aws.client("s3"), require("PROCESSED_BUCKET"),
+                                                     manifest, _merge_record(manifest), _fallback(workers))
+    return run
+
+def handler(event, context):
+    prefix = today_prefix()
+    event = event or {}
+    workers = int(event.get("workers") or BATCH_WORKERS)
+    backend = event.get("backend") or NORMALIZE_BACKEND
+    batch_jobs = backend == "batch-inference" and USE_LLM
+
+    collected = collect_batch_jobs(workers=workers) if batch_jobs else []
+    if event.get("action") == "collect":
+        return {"ok": True, "collected": collected}
+
+    # skip keys whose DynamoDB item already has the same ETag ({"force": true} reprocesses all)
+    objects = iter_raw_objects(prefix)
+    skip = None
+    if SKIP_PROCESSED and not event.get("force"):
+        skip = ProcessedFilter(aws.resource("dynamodb"), require("DDB_TABLE"), invoice_id_from_key)
+        objects = skip.filter(objects)
+
+    llm_batch = int(event.get("llm_batch") or LLM_BATCH_SIZE)
+    if batch_jobs:
+        run = run_batch_inference(objects, workers)
+    elif USE_LLM and llm_batch > 1:
+        run = run_llm_batched(objects, workers, llm_batch)
+    else:
+        run = run_bounded(objects, _process, workers=workers, label=lambda o: o["key"])
+    succeeded, failed = run["succeeded"], run["failed"]
+    for f in failed:
+        print(f"[daily_batch] failed key={f['key']} error={f['error']}")
+
+    compacted = None
+    if MANIFEST_ENABLED:
+        # merge today's and yesterday's per-invoice manifest entries into compact.jsonl
+        # (yesterday: uploads after its run that sqs_consumer left below MANIFEST_COMPACT_MIN)
+        compacted = 0
+        for day in (prefix, today_prefix(days_ago=1)):
+            try:
+                compacted += manifest.compact(aws.client("s3"), require("PROCESSED_BUCKET"),
+                                              day.replace("invoices/raw/", "invoices/processed/", 1))
+            except Exception as e:
+                print(f"[daily_batch] manifest compaction failed {day}: {e}")
+
+    return {
+        "ok": not failed,
+        "prefix": prefix,
+        "workers": workers,
+        "llm_batch": llm_batch if USE_LLM else None,
+        "count": len(succeeded),
+        "listed": skip.checked if skip else len(succeeded) + len(failed),
+        "skipped": skip.skipped if skip else 0,
+        "failed_count": len(failed),
+        "succeeded": [{"key": s["key"], "ms": s["ms"], **s["result"]} for s in succeeded],
+        "failed": failed,
+        "timings": run["timings"],
+        "backend": backend if USE_LLM else None,
+        "batch_job": run.get("job"),
+        "collected": collected,
+        "manifest_compacted": compacted,
+        "rate_limits": ratelimit.stats(),     # per-service requests/throttles/waits for tuning workers
+    }
@@ -0,0 +1,74 @@
+# src/sqs_consumer/handler.py
+# Raw upload notifications from SQS; failed invoices come back in batchItemFailures.
+import json, urllib.parse
+
+from common import aws, ratelimit, manifest
+from common.process import process_one_object, invoice_id_from_key, processed_key_for
+from common.fanout import run_bounded
+from common.idempotency import ProcessedFilter
+from common.config import SQS_WORKERS, SKIP_PROCESSED, MANIFEST_ENABLED, MANIFEST_COMPACT_MIN, require
+
+def _objects(record, raw_bucket):
+    """{"bucket", "key", "etag", "size"} for each raw-bucket object in one SQS message."""
+    body = json.loads(record["body"])
+    for rec in body.get("Records", []):     # s3:TestEvent has no Records
+        s3 = rec["s3"]
+        if s3["bucket"]["name"] != raw_bucket:
+            continue
+        obj = s3["object"]
+        yield {"bucket": raw_bucket, "key": urllib.parse.unquote_plus(obj["key"]),
+               "etag": obj.get("eTag"), "size": obj.get("size")}
+
+def _process(obj):
+    out = process_one_object(obj["bucket"], obj["key"], etag=obj["etag"], size=obj["size"])
+    return {"invoice_id": out["invoice_id"], "processed_key": out["processed_key"]}
+
+def _compact(objects) -> int:
+    # keep the days just written to a compact.jsonl plus a few entries, so readers need few GETs
+    merged = 0
+    for day in sorted({manifest.day_prefix(processed_key_for(o["key"])) for o in objects}):
+        try:
+            merged += manifest.compact(aws.client("s3"), require("PROCESSED_BUCKET"), day,
+                                       min_shards=MANIFEST_COMPACT_MIN)
+        except Exception as e:     # best-effort; the next batch or the daily run retries
+            print(f"[sqs_consumer] manifest compaction failed day={day}: {type(e).__name__}: {e}")
+    return merged
+
+def handler(event, context):
+    raw_bucket = require("RAW_BUCKET")
+    failures = []                 # messageIds, in delivery order
+    objects, messages = {}, {}    # (key, etag) -> object / [messageId]: duplicate events run once
+    for record in event.get("Records", []):
+        mid = record["messageId"]
+        try:
+            found = list(_objects(record, raw_bucket))
+        except (ValueError, KeyError, TypeError) as e:
+            # malformed body: leave it on the queue so redrive parks it in the DLQ
+            print(f"[sqs_consumer] bad message id={mid} error={type(e).__name__}: {e}")
+            failures.append(mid)
+            continue
+        for o in found:
+            k = (o["key"], o["etag"])
+            objects.setdefault(k, o)
+            messages.setdefault(k, []).append(mid)
+
+    # delivery is at-least-once: skip objects already stored with the same ETag
+    todo = objects.values()
+    skip = None
+    if SKIP_PROCESSED and objects:
+        skip = ProcessedFilter(aws.resource("dynamodb"), require("DDB_TABLE"), invoice_id_from_key)
+        todo = skip.filter(todo)
+
+    run = run_bounded(todo, _process, workers=SQS_WORKERS, label=lambda o: (o["key"], o["etag"]))
+    for f in run["failed"]:
+        print(f"[sqs_consumer] failed key={f['key'][0]} error={f['error']}")
+        failures += [m for m in messages[f["key"]] if m not in failures]
+
+    return {
+        "batchItemFailures": [{"itemIdentifier": m} for m in failures],
+        "processed": len(run["succeeded"]),
+        "skipped": skip.skipped if skip else 0,
+        "timings": run["timings"],
+        "manifest_compacted": _compact(objects.values()) if MANIFEST_ENABLED else None,
+        "rate_limits": ratelimit.stats(),
+    }
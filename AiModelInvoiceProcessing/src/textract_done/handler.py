@@ -0,0 +1,35 @@
+# src/textract_done/handler.py
+# Completion notices of async Textract jobs (SNS).
+import json
+from common.process import process_one_object, mark, record
+
+def _failed_job(msg: dict, bucket: str, key: str) -> str:
+    # a failed job leaves the invoice "pending"; mark it so the daily batch retries it
+    error = f"Textract job {msg.get('JobId')} ended {msg.get('Status')}"
+    etag = msg.get("JobTag")
+    record(key, etag, "error", error=error, textract_job=msg.get("JobId"))
+    mark(key, etag, "error", error=error)
+    return error
+
+def handler(event, context):
+    # one bad record must not fail (and redrive) records that already finished
+    results, failed = [], []
+    for rec in event["Records"]:
+        key = None
+        try:
+            msg = json.loads(rec["Sns"]["Message"])
+            loc = msg.get("DocumentLocation") or {}
+            bucket, key = loc.get("S3Bucket"), loc.get("S3ObjectName")
+            if msg.get("Status") != "SUCCEEDED":
+                error = _failed_job(msg, bucket, key)
+                print(f"[textract_done] key={key} {error}")
+                failed.append({"key": key, "error": error})
+                continue
+            # JobTag carries the object ETag (result cache key)
+            out = process_one_object(bucket, key, etag=msg.get("JobTag"), textract_job=msg["JobId"])
+            results.append({"invoice_id": out["invoice_id"], "processed_key": out["processed_key"]})
+        except Exception as e:
+            # process_one_object has already marked and recorded the error
+            print(f"[textract_done] failed key={key} error={type(e).__name__}: {e}")
+            failed.append({"key": key, "error": f"{type(e).__name__}: {e}"[:300]})
+    return {"ok": not failed, "processed": results, "failed": failed}
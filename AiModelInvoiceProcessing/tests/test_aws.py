@@ -0,0 +1,34 @@
+# tests/test_aws.py
+import sys, types, threading
+
+from common import aws
+
+def test_resources_come_from_a_session_per_thread(monkeypatch):
+    sessions = []
+
+    class Session:
+        def __init__(self):
+            sessions.append(self)
+
+        def resource(self, service, region_name=None, config=None):
+            return (self, service, region_name)
+
+    mod = types.ModuleType("boto3.session")
+    mod.Session = Session
+    pkg = types.ModuleType("boto3")
+    pkg.session = mod
+    monkeypatch.setitem(sys.modules, "boto3", pkg)
+    monkeypatch.setitem(sys.modules, "boto3.session", mod)
+    monkeypatch.setattr(aws, "_config", lambda service: None)
+    aws.reset()
+    try:
+        main = aws.resource("dynamodb", "us-east-1")
+        assert aws.resource("dynamodb", "us-east-1") is main
+        assert aws.resource("dynamodb", "eu-west-1")[0] is main[0]      # same thread, same session
+        other = []
+        t = threading.Thread(target=lambda: other.append(aws.resource("dynamodb", "us-east-1")))
+        t.start()
+        t.join()
+        assert other[0][0] is not main[0] and len(sessions) == 2
+    finally:
+        aws.reset()
@@ -0,0 +1,78 @@
+# tests/test_batch_inference.py
+import json
+import datetime
+
+from common import batch_inference as bi
+from fake_aws import FakeS3
+
+def _invoke(model_input):
+    if model_input.get("fail"):
+        raise RuntimeError("ThrottlingException")
+    return {"content": [{"type": "text", "text": json.dumps({"n": model_input["n"]})}]}
+
+def _submit(tmp_path, s3, failing=()):
+    runner = bi.LocalJobRunner(_invoke, workdir=str(tmp_path), workers=2)
+    records = [{"recordId": f"inv{i}", "modelInput": {"n": i, "fail": i in failing}} for i in range(4)]
+    index = {f"inv{i}": {"key": f"raw/{i}.pdf", "processed_key": f"proc/{i}/parsed.json", "etag": f"e{i}"}
+             for i in range(4)}
+    return runner, bi.submit_job(runner, s3, "b", records, index, extra={"prompt_version": "v1"})
+
+def _manifest(s3, job_name):
+    return json.loads(s3.get_object(Bucket="b", Key=f"batch-jobs/{job_name}/manifest.json")["Body"].read())
+
+def test_job_names_are_unique_within_a_second():
+    now = datetime.datetime(2025, 10, 4, 1, 2, 3, tzinfo=datetime.timezone.utc)
+    a, b = bi.job_name_for(now), bi.job_name_for(now)
+    assert a != b and a.startswith("invoices-20251004-010203-")
+
+def test_local_job_submit_run_collect(tmp_path):
+    s3 = FakeS3()
+    runner, m = _submit(tmp_path, s3, failing={2})
+    assert [p["job_name"] for p in bi.pending_manifests(s3, "b", "local")] == [m["job_name"]]
+    merged, fell_back = {}, []
+    def merge(entry, output, invoice_id):
+        merged[invoice_id] = (entry["processed_key"], json.loads(output["content"][0]["text"])["n"])
+    def fallback(entries):
+        fell_back.extend(entries)
+        return len(entries)
+
+    summary = bi.collect_job(runner, s3, "b", m, merge, fallback)
+    assert summary == {"job_name": m["job_name"], "state": "Completed", "merged": 3, "errors": 1, "fallback": 1}
+    assert merged == {f"inv{i}": (f"proc/{i}/parsed.json", i) for i in (0, 1, 3)}
+    assert fell_back == ["inv2"]                      # the per-record error is re-normalized
+    stored = _manifest(s3, m["job_name"])
+    assert stored["status"] == "collected" and stored["unmerged"] == ["inv2"]
+    assert list(bi.pending_manifests(s3, "b", "local")) == []
+
+def test_merge_error_falls_back(tmp_path):
+    s3 = FakeS3()
+    runner, m = _submit(tmp_path, s3)
+    def merge(entry, output, invoice_id):
+        if invoice_id == "inv1":
+            raise ValueError("no JSON object")
+    fell_back = []
+    summary = bi.collect_job(runner, s3, "b", m, merge, lambda e: fell_back.extend(e) or 0)
+    assert (summary["merged"], summary["errors"], summary["fallback"]) == (3, 1, 0)
+    assert fell_back == ["inv1"]
+
+def test_failed_job_falls_back_for_every_record(tmp_path):
+    s3 = FakeS3()
+    runner, m = _submit(tmp_path, s3)
+    (tmp_path / "batch-jobs" / m["job_name"] / "records.jsonl.out").unlink()    # LocalJobRunner reports Failed
+    merged, fell_back = [], {}
+    summary = bi.collect_job(runner, s3, "b", m, lambda *a: merged.append(a), lambda e: fell_back.update(e) or 4)
+    assert summary["state"] == "Failed" and summary["fallback"] == 4 and not merged
+    assert fell_back == m["records"]
+    assert _manifest(s3, m["job_name"])["status"] == "failed"
+
+class RunningRunner(bi.LocalJobRunner):
+    def status(self, job_id):
+        return "InProgress"
+
+def test_unfinished_job_is_left_for_next_run(tmp_path):
+    s3 = FakeS3()
+    _, m = _submit(tmp_path, s3)
+    runner = RunningRunner(_invoke, workdir=str(tmp_path))
+    summary = bi.collect_job(runner, s3, "b", m, lambda *a: None, lambda e: 0)
+    assert summary["state"] == "InProgress" and summary["merged"] == 0
+    assert _manifest(s3, m["job_name"])["status"] == "submitted"
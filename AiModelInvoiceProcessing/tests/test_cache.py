@@ -0,0 +1,44 @@
+# tests/test_cache.py
+from common.cache import ResultCache, clean_etag
+from fake_aws import FakeS3
+
+def _cache(**kw):
+    return ResultCache(FakeS3(), "b", **kw)
+
+def test_keys():
+    c = _cache(prefix="c/")
+    assert c.textract_key('"abc"') == c.textract_key("abc") == "c/textract/abc.json"
+    k = c.normalized_key("abc", "model", "v1")
+    assert k.startswith("c/normalized/") and k == c.normalized_key('"abc"', "model", "v1")
+    assert len({k, c.normalized_key("abc", "model", "v2"), c.normalized_key("abc", "other", "v1"),
+                c.normalized_key("abd", "model", "v1")}) == 4
+    assert clean_etag(None) == ""
+
+def test_textract_hit_and_miss():
+    c = _cache()
+    assert c.get_textract("e1") is None
+    c.put_textract("e1", {"ExpenseDocuments": [{"ExpenseIndex": 1}]})
+    assert c.get_textract('"e1"') == {"ExpenseDocuments": [{"ExpenseIndex": 1}]}
+    assert c.get_textract("e2") is None
+
+def test_only_complete_async_results_are_cached():
+    c = _cache()
+    c.put_textract("partial", {"JobStatus": "PARTIAL_SUCCESS", "ExpenseDocuments": []})
+    c.put_textract("ok", {"JobStatus": "SUCCEEDED", "ExpenseDocuments": []})
+    assert c.get_textract("partial") is None
+    assert c.get_textract("ok") is not None
+
+def test_normalized_hit_is_per_model_and_prompt():
+    c = _cache()
+    c.put_normalized("e1", "m", "v1", {"vendor": {"name": "A"}})
+    assert c.get_normalized("e1", "m", "v1") == {"vendor": {"name": "A"}}
+    assert c.get_normalized("e1", "m", "v2") is None
+    c.put_normalized("e1", "m", "v2", {})                    # empty results are not cached
+    assert c.get_normalized("e1", "m", "v2") is None
+
+def test_disabled_or_unknown_etag_is_a_no_op():
+    for c, etag in ((_cache(enabled=False), "e1"), (_cache(), None), (ResultCache(FakeS3(), ""), "e1")):
+        c.put_textract(etag, {"x": 1})
+        c.put_normalized(etag, "m", "v", {"x": 1})
+        assert c.get_textract(etag) is None and c.get_normalized(etag, "m", "v") is None
+        assert not c.s3.objects
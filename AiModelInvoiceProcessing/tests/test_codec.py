@@ -0,0 +1,40 @@
+# tests/test_codec.py
+import gzip
+
+import pytest
+
+from common import codec
+from fake_aws import FakeS3
+
+DOC = {"vendor": "Zürich AG", "totals": {"total": "1.50"}, "line_items": [{"description": "x" * 200}] * 20}
+
+@pytest.mark.parametrize("encoding", codec.ENCODINGS)
+def test_round_trip(encoding):
+    body, extra = codec.encode(DOC, encoding)
+    assert codec.loads(body, extra.get("ContentEncoding")) == DOC
+    assert codec.loads(body) == DOC                    # copied without metadata: magic bytes
+    if codec.effective(encoding) != "identity":
+        assert len(body) < len(codec.dumps(DOC))
+
+def test_identity_is_compact_utf8():
+    assert codec.dumps({"a": [1, "é"]}) == '{"a":[1,"é"]}'.encode("utf-8")
+    assert codec.encode(DOC, None) == (codec.dumps(DOC), {})
+
+def test_zstd_falls_back_to_gzip_without_zstandard(monkeypatch):
+    monkeypatch.setattr(codec, "zstandard", None)
+    assert codec.effective("ZSTD") == "gzip"
+    body, extra = codec.encode(DOC, "zstd")
+    assert extra == {"ContentEncoding": "gzip"} and gzip.decompress(body) == codec.dumps(DOC)
+    with pytest.raises(RuntimeError):
+        codec.decode(b"\x28\xb5\x2f\xfd" + b"\0" * 8)
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        codec.effective("brotli")
+
+def test_s3_helpers():
+    s3 = FakeS3()
+    size = codec.put_json(s3, "b", "k.json", DOC, "gzip")
+    assert s3.objects[("b", "k.json")]["ContentEncoding"] == "gzip"
+    assert size == len(s3.objects[("b", "k.json")]["Body"])
+    assert codec.get_json(s3, "b", "k.json") == DOC
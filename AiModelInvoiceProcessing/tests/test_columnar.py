@@ -0,0 +1,64 @@
+# tests/test_columnar.py
+import copy
+
+import pytest
+
+from common import columnar
+from common.parser import parse_textract_expense
+from common.local_normalize import normalize_local
+from fake_aws import synthetic_expense
+import score_day
+
+pytestmark = pytest.mark.skipif(columnar.pa is None, reason="pyarrow not installed")
+
+DAY = "2025-10-04"
+
+def _docs(n: int = 12):
+    out = []
+    for i in range(n):
+        parsed = parse_textract_expense(synthetic_expense(pages=1 + i % 3, lines_per_page=4, seed=i))
+        llm = normalize_local(parsed)
+        source, route = ("textract+local", "local") if i % 4 == 0 else ("textract+genai", "llm")
+        if i % 3 == 1:
+            parsed = {**parsed, "vendor": None}                         # model fills it
+        if i % 5 == 2:
+            llm = copy.deepcopy(llm)
+            llm["totals"]["total"] = round(float(llm["totals"]["total"] or 0) * 1.5, 2)   # off by >1%
+        data = {"raw_key": f"invoices/raw/2025/10/04/inv-{i}.pdf", "source_parse": parsed,
+                "llm_normalized": llm if i % 7 != 6 else None,
+                "meta": {"source": source, "normalize": {"route": {"route": route}}}}
+        out.append((f"invoices/processed/2025/10/04/inv-{i}/parsed.json", data))
+    return out
+
+def test_write_read_round_trip_matches_score_day(tmp_path):
+    docs = _docs()
+    counts = columnar.write_day(str(tmp_path), DAY, (columnar.rows_for(k, d) for k, d in docs), batch_rows=3)
+    assert counts["invoices"] == counts["metrics"] == len(docs)
+
+    table = columnar.read(str(tmp_path), "metrics", days=[DAY])
+    assert table.num_rows == len(docs)
+    agg, _, _ = score_day._aggregate((d for d in docs), lambda k: k.split("/")[-2])
+    assert columnar.aggregate_metrics(table) == agg
+    assert agg["n"] and agg["routed_local"] and agg["routed_llm"]
+
+    lines = columnar.read(str(tmp_path), "line_items", days=[DAY])
+    assert lines.num_rows == counts["line_items"] > 0
+
+def test_rewrite_replaces_partition(tmp_path):
+    docs = _docs()
+    columnar.write_day(str(tmp_path), DAY, (columnar.rows_for(k, d) for k, d in docs))
+    columnar.write_day(str(tmp_path), DAY, (columnar.rows_for(k, d) for k, d in docs[:2]))
+    assert columnar.read(str(tmp_path), "invoices", days=[DAY]).num_rows == 2
+
+def test_failed_write_keeps_previous_partition(tmp_path):
+    docs = _docs()
+    columnar.write_day(str(tmp_path), DAY, (columnar.rows_for(k, d) for k, d in docs))
+
+    def broken():
+        yield columnar.rows_for(*docs[0])
+        raise RuntimeError("fetch failed")
+
+    with pytest.raises(RuntimeError):
+        columnar.write_day(str(tmp_path), DAY, broken(), batch_rows=1)
+    assert columnar.read(str(tmp_path), "invoices", days=[DAY]).num_rows == len(docs)
+    assert not list(tmp_path.rglob("_*.tmp"))
@@ -0,0 +1,83 @@
+# tests/test_daily_batch.py
+import pytest
+
+import fake_aws
+from common import aws, ratelimit, manifest, normalize, process, batch_inference as bi
+from common.ratelimit import RateLimiter
+from daily_batch import handler as daily
+
+DAY = "invoices/processed/2025/10/04/"
+
+class BadKeyTextract(fake_aws.FakeTextract):
+    def analyze_expense(self, Document, **kw):
+        if "bad" in Document["S3Object"]["Name"]:
+            raise fake_aws._err("InvalidS3ObjectException", "AnalyzeExpense")
+        return super().analyze_expense(Document, **kw)
+
+class QueuedRunner(bi.JobRunner):
+    """A Bedrock-style runner whose job is still running."""
+    name = "bedrock"
+
+    def submit(self, job_name, records):
+        self.records = records
+        return f"arn:{job_name}"
+
+    def status(self, job_id):
+        return "InProgress"
+
+@pytest.fixture
+def env(monkeypatch):
+    for k, v in {"RAW_BUCKET": "raw", "PROCESSED_BUCKET": "proc", "DDB_TABLE": "Invoices"}.items():
+        monkeypatch.setenv(k, v)
+    aws.reset()
+    ratelimit.reset()
+    for name in ("textract", "textract-get", "bedrock"):
+        ratelimit.set_limiter(name, RateLimiter(name, rps=1000))
+    monkeypatch.setattr(process, "USE_LLM", True)
+    monkeypatch.setattr(process, "LLM_ROUTER", False)
+    monkeypatch.setattr(process, "TEXTRACT_MODE", "sync")
+    monkeypatch.setattr(normalize, "USE_LLM", True)
+    monkeypatch.setattr(normalize, "BEDROCK_MODEL_ID", "anthropic.test")
+    fakes = fake_aws.install(textract=BadKeyTextract())
+    objs = []
+    for name in ("a", "b", "bad"):
+        key = f"invoices/raw/2025/10/04/{name}.pdf"
+        etag = fakes["s3"].put_object(Bucket="raw", Key=key, Body=key.encode())["ETag"]
+        objs.append({"key": key, "etag": etag, "size": 10})
+    yield fakes, objs
+    aws.reset()
+    ratelimit.reset()
+
+def _status(fakes, key):
+    return fakes["dynamodb"].Table("Invoices").get_item(
+        Key={"invoice_id": process.invoice_id_from_key(key)})["Item"]["status"]
+
+def _manifest(fakes):
+    return {e["raw_key"].rsplit("/", 1)[1]: e["status"] for e in manifest.read(fakes["s3"], "proc", DAY)[0]}
+
+def test_batched_run_records_dropped_and_failed_invoices(env, monkeypatch):
+    fakes, objs = env
+    def model_down(*a, **kw):
+        raise RuntimeError("model down")
+    monkeypatch.setattr(normalize, "invoke_bedrock_claude", model_down)
+    run = daily.run_llm_batched(objs, workers=2, batch_size=2)
+    assert not run["succeeded"] and len(run["failed"]) == 3
+    for o in objs:                                  # a Textract failure and two dropped by normalization
+        assert _status(fakes, o["key"]) == "error"
+    assert _manifest(fakes) == {"a.pdf": "error", "b.pdf": "error", "bad.pdf": "error"}
+
+def test_batch_inference_invoices_stay_pending_until_collected(env, monkeypatch):
+    fakes, objs = env
+    runner = QueuedRunner()
+    monkeypatch.setattr(daily, "_job_runner", lambda n: runner)
+    run = daily.run_batch_inference(objs, workers=2)
+    assert run["job"]["records"] == 2 and len(runner.records) == 2
+    assert [_status(fakes, o["key"]) for o in objs] == ["pending", "pending", "error"]
+    assert _manifest(fakes) == {"a.pdf": "pending", "b.pdf": "pending", "bad.pdf": "error"}
+
+def test_local_job_is_collected_and_marked_done(env):
+    fakes, objs = env
+    run = daily.run_batch_inference(objs[:2], workers=2)       # below BATCH_INFERENCE_MIN_RECORDS: LocalJobRunner
+    assert run["job"]["runner"] == "local" and run["job"]["collected"]["merged"] == 2
+    assert [_status(fakes, o["key"]) for o in objs[:2]] == ["done", "done"]
+    assert _manifest(fakes) == {"a.pdf": "done", "b.pdf": "done"}
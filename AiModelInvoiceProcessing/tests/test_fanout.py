@@ -0,0 +1,55 @@
+# tests/test_fanout.py
+import threading, time
+
+import pytest
+
+from common.fanout import run_bounded
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_failures_are_isolated(workers):
+    def fn(i):
+        if i % 3 == 0:
+            raise ValueError(f"bad {i}")
+        return i * 2
+
+    out = run_bounded(range(10), fn, workers=workers, label=lambda i: f"k{i}")
+    assert sorted(e["result"] for e in out["succeeded"]) == [i * 2 for i in range(10) if i % 3]
+    assert sorted(e["key"] for e in out["failed"]) == ["k0", "k3", "k6", "k9"]
+    assert all(e["error"].startswith("ValueError: bad") for e in out["failed"])
+    assert out["timings"]["wall_ms"] >= 0 and "p50_ms" in out["timings"]
+
+def test_in_flight_is_bounded():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def fn(i):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    out = run_bounded(range(24), fn, workers=3)
+    assert len(out["succeeded"]) == 24
+    assert 1 < peak[0] <= 3
+
+def test_items_are_consumed_lazily():
+    produced, started = [], []
+
+    def items():
+        for i in range(20):
+            produced.append(i)
+            yield i
+
+    def fn(i):
+        started.append((i, len(produced)))
+        time.sleep(0.005)
+
+    run_bounded(items(), fn, workers=2)
+    # the first call starts long before the listing is exhausted
+    assert min(n for i, n in started if i == 0) < 20
+
+def test_empty():
+    out = run_bounded([], lambda i: i, workers=4)
+    assert out["succeeded"] == out["failed"] == []
+    assert out["timings"]["max_ms"] == 0.0
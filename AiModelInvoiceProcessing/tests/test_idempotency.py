@@ -0,0 +1,51 @@
+# tests/test_idempotency.py
+from common.idempotency import ProcessedFilter, BATCH_GET_MAX
+from fake_aws import FakeDynamo
+
+def _id(key: str) -> str:
+    return key.rsplit("/", 1)[-1]
+
+def _filter(ddb):
+    return ProcessedFilter(ddb, "Invoices", _id)
+
+def test_skips_only_finished_unchanged_objects():
+    ddb = FakeDynamo()
+    t = ddb.Table("Invoices")
+    t.put_item(Item={"invoice_id": "same", "raw_etag": "e1", "status": "done"})
+    t.put_item(Item={"invoice_id": "changed", "raw_etag": "e1", "status": "done"})
+    t.put_item(Item={"invoice_id": "failed", "raw_etag": "e1", "status": "error"})
+    t.put_item(Item={"invoice_id": "pending", "raw_etag": "e1", "status": "pending"})
+    t.put_item(Item={"invoice_id": "legacy"})                     # before raw_etag/status were stored
+    objs = [{"key": "raw/same", "etag": '"e1"'}, {"key": "raw/changed", "etag": '"e2"'},
+            {"key": "raw/failed", "etag": '"e1"'}, {"key": "raw/pending", "etag": '"e1"'},
+            {"key": "raw/legacy", "etag": '"e1"'}, {"key": "raw/new", "etag": '"e1"'}]
+    f = _filter(ddb)
+    assert [o["key"] for o in f.filter(objs)] == ["raw/changed", "raw/failed", "raw/pending", "raw/new"]
+    assert (f.checked, f.skipped) == (6, 2)
+
+def test_batches_and_retries_unprocessed_keys(monkeypatch):
+    monkeypatch.setattr("common.idempotency.time.sleep", lambda s: None)
+    ddb = FakeDynamo()
+    t = ddb.Table("Invoices")
+    n = BATCH_GET_MAX * 2 + 5
+    for i in range(0, n, 2):
+        t.put_item(Item={"invoice_id": f"i{i}", "raw_etag": "e", "status": "done"})
+    calls = []
+    inner = ddb.batch_get_item
+
+    def flaky(RequestItems, **kw):
+        # first answer of every batch leaves half of the keys unprocessed
+        req = RequestItems["Invoices"]
+        calls.append(len(req["Keys"]))
+        if len(calls) % 2:
+            half = req["Keys"][len(req["Keys"]) // 2:]
+            resp = inner({"Invoices": {**req, "Keys": req["Keys"][:len(req["Keys"]) // 2]}})
+            resp["UnprocessedKeys"] = {"Invoices": {**req, "Keys": half}}
+            return resp
+        return inner(RequestItems)
+
+    monkeypatch.setattr(ddb, "batch_get_item", flaky)
+    f = _filter(ddb)
+    kept = [o["key"] for o in f.filter({"key": f"raw/i{i}", "etag": "e"} for i in range(n))]
+    assert kept == [f"raw/i{i}" for i in range(1, n, 2)]
+    assert max(calls) <= BATCH_GET_MAX and len(calls) == 6
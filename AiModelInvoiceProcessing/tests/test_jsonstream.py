@@ -0,0 +1,35 @@
+# tests/test_jsonstream.py
+import json
+
+import pytest
+
+from common.jsonstream import JsonScanner, first_json
+
+DOC = {"vendor": {"name": "Brace {Co} [x]"}, "note": "say \"}\" \\", "items": [{"a": 1}, []]}
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_streamed_pieces(size):
+    text = "Here you go: " + json.dumps(DOC) + "\nLet me know if {anything} else."
+    sc = JsonScanner()
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    fed = 0
+    for p in pieces:
+        fed += 1
+        if sc.feed(p):
+            break
+    assert sc.done
+    assert json.loads(sc.text()) == DOC
+    assert fed < len(pieces) or size == 1000       # stops before the trailing prose
+    assert sc.feed("more }") is True and json.loads(sc.text()) == DOC
+
+def test_array_opener():
+    assert json.loads(first_json('ok [{"i": 0}, {"i": "]"}] {"x": 1}', "[")) == [{"i": 0}, {"i": "]"}]
+
+def test_incomplete_and_absent():
+    sc = JsonScanner()
+    assert sc.text() == ""
+    assert not sc.feed('prefix {"a": [1, 2')
+    assert sc.text() == '{"a": [1, 2'
+    assert first_json("no json here") is None
+    assert first_json('{"open": true') is None
+    assert first_json(None) is None
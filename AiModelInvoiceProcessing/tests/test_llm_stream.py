@@ -0,0 +1,76 @@
+# tests/test_llm_stream.py
+import json
+
+import pytest
+
+from common import aws, config, llm_client, ratelimit
+from common.ratelimit import RateLimiter
+from fake_aws import FakeBedrock, FakeStream
+
+BODY = {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 1000,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": "x" * 400}]}]}
+
+class BrokenStreamBedrock(FakeBedrock):
+    """Streams `good` chunk events, then a mid-stream error event instead of the rest."""
+    def __init__(self, good: int = 2, **kw):
+        super().__init__(**kw)
+        self.good = good
+
+    def invoke_model_with_response_stream(self, **kw):
+        events = super().invoke_model_with_response_stream(**kw)["body"].events[:1 + self.good]
+        events.append({"modelStreamErrorException": {"message": "model crashed"}})
+        self.streams[-1] = FakeStream(events)
+        return {"body": self.streams[-1]}
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    monkeypatch.setattr(llm_client, "BEDROCK_MODEL_ID", "anthropic.test")
+    lim = RateLimiter("bedrock", rps=1000, tpm=100_000)
+    ratelimit.set_limiter("bedrock", lim)
+
+    def install(fake):
+        aws.set_client("bedrock-runtime", fake, config.BEDROCK_REGION)
+        return fake
+    yield install, lim
+    aws.reset()
+    ratelimit.reset()
+
+def test_stream_stops_at_the_end_of_the_json(bedrock):
+    install, lim = bedrock
+    fake = install(FakeBedrock(trailer="\nHope this helps! " * 40, chunk_chars=16))
+    timing = {}
+    out = llm_client.invoke_model_stream(BODY, until="{", timing=timing)
+    text = llm_client.text_from_output(out)
+    assert json.loads(text[:text.rindex("}") + 1])["invoice"]["number"] == "INV-1"
+    stream = fake.streams[0]
+    assert stream.closed and stream.consumed < len(stream.events)       # the trailer was never read
+    assert timing["stopped_early"] is True
+    assert out["usage"]["output_tokens"] == llm_client.estimate_tokens(text)   # estimated: cut before message_delta
+    assert lim.snapshot()["tokens"] == out["usage"]["input_tokens"] + out["usage"]["output_tokens"]
+
+def test_without_until_the_whole_stream_is_read(bedrock):
+    install, _ = bedrock
+    fake = install(FakeBedrock(trailer=" done.", chunk_chars=16))
+    timing = {}
+    out = llm_client.invoke_model_stream(BODY, until=None, timing=timing)
+    assert llm_client.text_from_output(out).endswith(" done.")
+    assert fake.streams[0].consumed == len(fake.streams[0].events)
+    assert timing["stopped_early"] is False
+    assert out["usage"]["output_tokens"] == len(fake._text() + " done.") // 4    # reported by message_delta
+
+def test_mid_stream_error_fails_and_releases_tokens(bedrock):
+    install, lim = bedrock
+    fake = install(BrokenStreamBedrock(good=2))
+    with pytest.raises(RuntimeError, match="Bedrock invoke failed.*modelStreamErrorException"):
+        llm_client.invoke_model_stream(BODY)
+    assert fake.streams[0].closed
+    assert lim.acquire(tokens=100_000 - 200) == 0.0        # only input + streamed text stayed charged
+
+def test_timing_splits_first_token_and_generation(bedrock):
+    install, _ = bedrock
+    install(FakeBedrock(chunk_chars=64, delay=0.01))
+    timing = {}
+    llm_client.invoke_model_stream(BODY, until=None, timing=timing)
+    assert timing["ttft_ms"] >= 15                          # message_start + first delta
+    assert timing["gen_ms"] >= 20
+    assert timing["total_ms"] >= timing["ttft_ms"] + timing["gen_ms"] - 1
@@ -0,0 +1,105 @@
+# tests/test_manifest.py
+import pytest
+
+from common import manifest
+from fake_aws import FakeS3
+
+DAY = "invoices/processed/2025/10/04/"
+
+def _entry(inv: str, status: str = "done", ts: float = 1.0) -> dict:
+    return {"key": f"{DAY}{inv}/parsed.json", "invoice_id": inv, "status": status, "ts": ts}
+
+def test_prefix():
+    assert manifest.manifest_prefix(f"{DAY}inv1/parsed.json") == DAY + manifest.SHARD_DIR
+
+def test_latest_attempt_wins():
+    s3 = FakeS3()
+    assert manifest.read(s3, "b", DAY) == (None, None)
+    manifest.append(s3, "b", _entry("a", "pending", 1))
+    manifest.append(s3, "b", _entry("b", "done", 1))
+    manifest.append(s3, "b", _entry("a", "done", 2))
+    entries, digest = manifest.read(s3, "b", DAY)
+    assert [(e["invoice_id"], e["status"]) for e in entries] == [("a", "done"), ("b", "done")]
+    assert digest.startswith("manifest:")
+
+def test_compact_merges_and_deletes_entries():
+    s3 = FakeS3()
+    for inv in "abc":
+        manifest.append(s3, "b", _entry(inv))
+    before, _ = manifest.read(s3, "b", DAY)
+    assert manifest.compact(s3, "b", DAY) == 3
+    assert [k for k, _ in manifest.listing(s3, "b", DAY)] == [DAY + manifest.SHARD_DIR + manifest.COMPACT]
+    assert manifest.read(s3, "b", DAY)[0] == before
+    manifest.append(s3, "b", _entry("a", "error", 5))            # newer attempt after compaction
+    assert manifest.compact(s3, "b", DAY) == 1
+    assert {e["invoice_id"]: e["status"] for e in manifest.read(s3, "b", DAY)[0]} == \
+        {"a": "error", "b": "done", "c": "done"}
+
+class RacingS3(FakeS3):
+    """Another compaction rewrites compact.jsonl between our read and our conditional write."""
+    def __init__(self, races: int):
+        super().__init__()
+        self.races = races
+
+    def put_object(self, Bucket, Key, Body, **kw):
+        if self.races and Key.endswith(manifest.COMPACT) and ("IfMatch" in kw or "IfNoneMatch" in kw):
+            self.races -= 1
+            cur = self.objects.get((Bucket, Key), {}).get("Body", b"")
+            other = manifest._encode([_entry(f"other{self.races}")])
+            super().put_object(Bucket=Bucket, Key=Key, Body=cur + other)
+        return super().put_object(Bucket=Bucket, Key=Key, Body=Body, **kw)
+
+def test_conflicting_compaction_is_retried():
+    s3 = RacingS3(races=2)
+    manifest.append(s3, "b", _entry("a"))
+    assert manifest.compact(s3, "b", DAY) == 1
+    ids = {e["invoice_id"] for e in manifest.read(s3, "b", DAY)[0]}
+    assert ids == {"a", "other0", "other1"}          # neither side's merge is lost
+
+def test_conflict_gives_up_after_attempts():
+    s3 = RacingS3(races=10)
+    manifest.append(s3, "b", _entry("a"))
+    with pytest.raises(Exception) as e:
+        manifest.compact(s3, "b", DAY)
+    assert manifest._code(e.value) == "PreconditionFailed"
+
+def test_backfill_adds_only_unknown_keys():
+    s3 = FakeS3()
+    manifest.append(s3, "b", _entry("a", "error", 3))
+    old = [{**_entry(inv), "ts": None, "backfilled": True} for inv in "ab"]
+    assert manifest.backfill(s3, "b", DAY, old) == 1
+    assert {e["invoice_id"]: e["status"] for e in manifest.read(s3, "b", DAY)[0]} == {"a": "error", "b": "done"}
+    assert manifest.backfill(s3, "b", DAY, old) == 0
+
+class LateAttemptS3(FakeS3):
+    """A newer attempt for `inv` rewrites its entry while compact.jsonl is being written."""
+    def __init__(self, inv: str):
+        super().__init__()
+        self.inv = inv
+
+    def put_object(self, Bucket, Key, Body, **kw):
+        out = super().put_object(Bucket=Bucket, Key=Key, Body=Body, **kw)
+        if Key.endswith(manifest.COMPACT) and self.inv:
+            inv, self.inv = self.inv, None
+            manifest.append(self, Bucket, _entry(inv, "error", 9))
+        return out
+
+def test_compact_keeps_entries_rewritten_meanwhile():
+    s3 = LateAttemptS3("a")
+    for inv in "ab":
+        manifest.append(s3, "b", _entry(inv))
+    assert manifest.compact(s3, "b", DAY) == 2
+    assert [k for k, _ in manifest.listing(s3, "b", DAY)] == \
+        [manifest.entry_key(DAY + manifest.SHARD_DIR, "a"), DAY + manifest.SHARD_DIR + manifest.COMPACT]
+    assert {e["invoice_id"]: e["status"] for e in manifest.read(s3, "b", DAY)[0]} == {"a": "error", "b": "done"}
+    assert manifest.compact(s3, "b", DAY) == 1
+    assert len(manifest.listing(s3, "b", DAY)) == 1
+
+def test_compact_waits_for_min_shards():
+    s3 = FakeS3()
+    for inv in "ab":
+        manifest.append(s3, "b", _entry(inv))
+    assert manifest.compact(s3, "b", DAY, min_shards=3) == 0
+    assert len(manifest.listing(s3, "b", DAY)) == 2
+    manifest.append(s3, "b", _entry("c"))
+    assert manifest.compact(s3, "b", DAY, min_shards=3) == 3
@@ -0,0 +1,122 @@
+# tests/test_normalize_batch.py
+import json
+
+import pytest
+
+from common import normalize
+from common.local_normalize import normalize_local
+from common.parser import parse_textract_expense
+from fake_aws import synthetic_expense
+
+def _invoice(seed: int, lines: int = 3):
+    raw = synthetic_expense(pages=1, lines_per_page=lines, seed=seed)
+    return f"inv{seed}", raw, parse_textract_expense(raw)
+
+class FakeModel:
+    """invoke_bedrock_claude stand-in: answers from the PARSE it is sent, like a perfect model."""
+    def __init__(self, batch_answer=None, fail_single=()):
+        self.calls = []
+        self.batch_answer = batch_answer
+        self.fail_single = set(fail_single)
+
+    def __call__(self, messages, usage=None, max_tokens=2048, timing=None, until="{"):
+        content = messages[-1]["content"]
+        if usage is not None:
+            usage.update(input_tokens=100, output_tokens=20)
+        if "INVOICE_ID=" in content:
+            self.calls.append(("batch", content.count("INVOICE_ID=")))
+            blocks = content.split("\n\nINVOICE_ID=")[1:]
+            answer = [{"invoice_id": b.split("\n", 1)[0],
+                       "result": normalize_local(json.loads(b.rsplit("PARSE=", 1)[1]))} for b in blocks]
+            return self.batch_answer(answer) if self.batch_answer else json.dumps(answer)
+        parsed = json.loads(content.rsplit("PARSE=", 1)[1])
+        self.calls.append(("single", parsed["invoice_number"], len(parsed.get("line_items") or [])))
+        if parsed["invoice_number"] in self.fail_single:
+            raise RuntimeError("model down")
+        return "Sure: " + json.dumps(normalize_local(parsed))
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(normalize, "USE_LLM", True)
+    monkeypatch.setattr(normalize, "BEDROCK_MODEL_ID", "anthropic.test")
+    monkeypatch.setattr(normalize, "VALIDATE_REASK", False)
+    def install(**kw):
+        m = FakeModel(**kw)
+        monkeypatch.setattr(normalize, "invoke_bedrock_claude", m)
+        return m
+    return install
+
+def test_pack_respects_items_tokens_and_output():
+    entries = [{"id": i, "tokens": t, "out_tokens": 100} for i, t in enumerate([400, 400, 400, 900, 100, 100])]
+    packs = normalize._pack(entries, token_budget=1000, max_items=3, max_output=10_000)
+    assert [[e["id"] for e in p] for p in packs] == [[0, 1], [2], [3, 4], [5]]
+    assert [[e["id"] for e in p] for p in normalize._pack(entries, 10_000, 2, 10_000)] == [[0, 1], [2, 3], [4, 5]]
+    assert [len(p) for p in normalize._pack(entries, 10_000, 10, 250)] == [2, 2, 2]
+    assert normalize._pack([{"id": 0, "tokens": 5000, "out_tokens": 1}], 1000, 5, 100) != []   # oversized goes alone
+
+def test_batch_answers_are_mapped_back_by_invoice_id(model):
+    m = model()
+    items = [_invoice(s) for s in range(4)]
+    metas = {}
+    out = normalize.normalize_invoices_batch(items, metas, max_items=2, token_budget=100_000)
+    assert m.calls == [("batch", 2), ("batch", 2)]
+    assert set(out) == {i for i, _, _ in items}
+    for inv_id, _, parsed in items:
+        assert out[inv_id]["invoice"]["number"] == parsed["invoice_number"]
+        assert metas[inv_id]["batch"]["size"] == 2
+
+def test_malformed_or_partial_batch_falls_back_to_single_calls(model):
+    items = [_invoice(s) for s in range(3)]
+    m = model(batch_answer=lambda answer: "I could not do that [oops")
+    out = normalize.normalize_invoices_batch(items, {}, max_items=3, token_budget=100_000)
+    assert set(out) == {"inv0", "inv1", "inv2"}
+    assert [c[0] for c in m.calls] == ["batch", "single", "single", "single"]
+
+    m = model(batch_answer=lambda answer: json.dumps(answer[:1] + [{"invoice_id": "inv9", "result": {}}]))
+    metas = {}
+    out = normalize.normalize_invoices_batch(items, metas, max_items=3, token_budget=100_000)
+    assert set(out) == {"inv0", "inv1", "inv2"}
+    assert [c[0] for c in m.calls] == ["batch", "single", "single"]
+    assert "batch" in metas["inv0"] and "batch" not in metas["inv1"]
+
+def test_failed_invoice_is_left_out(model):
+    items = [_invoice(s) for s in range(2)]
+    model(batch_answer=lambda answer: "[]", fail_single={items[1][2]["invoice_number"]})
+    metas = {}
+    out = normalize.normalize_invoices_batch(items, metas, max_items=2, token_budget=100_000)
+    assert set(out) == {"inv0"}
+    assert metas["inv1"]["error"] == "RuntimeError: model down"
+
+def test_long_invoice_is_chunked_and_merged(model, monkeypatch):
+    monkeypatch.setattr(normalize, "LLM_LINE_CHUNK", 3)
+    m = model()
+    inv_id, raw, parsed = _invoice(7, lines=8)
+    meta = {}
+    out = normalize.normalize_invoice(raw, parsed, meta=meta)
+    assert [c[2] for c in m.calls] == [3, 3, 2]
+    assert [li["description"] for li in out["line_items"]] == [li["description"] for li in parsed["line_items"]]
+    assert meta["parts"] == 3 and meta["usage"]["input_tokens"] == 300
+    assert out["validations"]["sum_matches_total"] is True
+
+def test_chunks_keep_compacted_and_parse_rows_aligned():
+    _, raw, parsed = _invoice(3, lines=7)
+    compacted = normalize.compact_textract(raw, "standard")
+    parts = normalize._line_chunks(compacted, parsed, 3)
+    assert [(p[0], p[1]) for p in parts] == [(1, 3), (2, 3), (3, 3)]
+    for _, _, comp, parse in parts:
+        assert len(comp["ExpenseDocuments"][0]["LineItems"]) == len(parse["line_items"])
+    assert parts[0][2]["ExpenseDocuments"][0]["SummaryFields"] and not parts[1][2]["ExpenseDocuments"][0]["SummaryFields"]
+    assert normalize._line_chunks(compacted, parsed, 0) == [(1, 1, compacted, parsed)]
+
+def test_chunks_span_documents_in_stream_order():
+    raw = synthetic_expense(seed=5, lines_per_page=4, docs=2)
+    parsed = parse_textract_expense(raw)
+    compacted = normalize.compact_textract(raw, "standard")
+    parts = normalize._line_chunks(compacted, parsed, 3)
+    assert len(parts) == 3
+    for _, _, comp, parse in parts:
+        rows = [(d["ExpenseIndex"], li["ITEM"]) for d in comp["ExpenseDocuments"] for li in d["LineItems"]]
+        assert rows == [(li["document"], li["description"]) for li in parse["line_items"]]
+    # the part straddling both documents keeps them apart; only part 1 carries summaries
+    assert [d["ExpenseIndex"] for d in parts[1][2]["ExpenseDocuments"]] == [1, 2]
+    assert [bool(d["SummaryFields"]) for p in parts for d in p[2]["ExpenseDocuments"]] == [True, True, False, False, False]
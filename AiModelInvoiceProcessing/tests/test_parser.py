@@ -0,0 +1,38 @@
+# tests/test_parser.py
+from common.compact import compact_textract
+from common.parser import parse_textract_expense
+from fake_aws import synthetic_expense
+
+def _drop(doc, *types):
+    doc["SummaryFields"] = [f for f in doc["SummaryFields"] if f["Type"]["Text"] not in types]
+
+def test_single_document():
+    parsed = parse_textract_expense(synthetic_expense(seed=1))
+    assert parsed["invoice_number"] == "INV-0001-0"
+    assert parsed["meta"]["primary_document"] == 1
+    assert [d["document"] for d in parsed["meta"]["documents"]] == [1]
+
+def test_every_document_is_summarized_and_the_primary_recorded():
+    resp = synthetic_expense(seed=2, docs=3)
+    _drop(resp["ExpenseDocuments"][0], "TOTAL", "SUBTOTAL")     # a cover sheet-like first document
+    parsed = parse_textract_expense(resp)
+    docs = parsed["meta"]["documents"]
+    assert [d["invoice_number"] for d in docs] == ["INV-0002-0", "INV-0002-1", "INV-0002-2"]
+    assert docs[0]["total"] is None and docs[0]["fields"] < docs[1]["fields"]
+    # most header fields wins; the earlier of two equally complete documents
+    assert parsed["meta"]["primary_document"] == 2
+    assert parsed["invoice_number"] == "INV-0002-1" and parsed["total"] == docs[1]["total"]
+
+def test_compacted_documents_carry_their_index_when_there_are_several():
+    one = compact_textract(synthetic_expense(seed=3))
+    assert "ExpenseIndex" not in one["ExpenseDocuments"][0]
+    many = compact_textract(synthetic_expense(seed=3, docs=2))
+    assert [d["ExpenseIndex"] for d in many["ExpenseDocuments"]] == [1, 2]
+
+def test_no_document():
+    assert parse_textract_expense({"ExpenseDocuments": []}) == {"error": "no_document"}
+
+def test_line_items_of_every_document_are_tagged():
+    parsed = parse_textract_expense(synthetic_expense(seed=4, lines_per_page=3, docs=2))
+    assert [li["document"] for li in parsed["line_items"]] == [1, 1, 1, 2, 2, 2]
+    assert [d["line_items"] for d in parsed["meta"]["documents"]] == [3, 3]
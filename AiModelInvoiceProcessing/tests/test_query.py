@@ -0,0 +1,67 @@
+# tests/test_query.py
+from common import query
+from fake_aws import FakeDynamo
+
+class Pages:
+    """Table proxy recording query kwargs; `max_page` caps every page like DynamoDB's 1 MB limit does."""
+    def __init__(self, table, max_page: int | None = None):
+        self.table, self.max_page = table, max_page
+        self.calls = []
+
+    def query(self, **kw):
+        self.calls.append(kw)
+        if self.max_page:
+            kw = {**kw, "Limit": min(kw.get("Limit") or self.max_page, self.max_page)}
+        return self.table.query(**kw)
+
+def _table():
+    t = FakeDynamo().Table("Invoices")
+    rows = [("i1", "Alpine GmbH", "2025-10-01", "2025-10-04", "done", "EUR"),
+            ("i2", "ALPINE, GmbH.", "2025-10-03", "2025-10-04", "done", "EUR"),
+            ("i3", "Alpíne", "2025-09-20", "2025-10-04", "error", "USD"),
+            ("i4", "Beta Ltd", "2025-10-02", "2025-10-04", "done", "EUR"),
+            ("i5", "alpine", "2025-10-05", "2025-10-05", "pending", "EUR")]
+    for inv, vendor, date, day, status, cur in rows:
+        key = f"invoices/processed/{day.replace('-', '/')}/{inv}/parsed.json"
+        t.put_item(Item={"invoice_id": inv, "vendor": vendor, "currency": cur, "processed_key": key,
+                         "source_parse": {"big": "x" * 100}, "raw_etag": "e",
+                         **query.index_attrs(key, status, {"vendor": vendor, "invoice_date": date})})
+    return t
+
+def test_vendor_key_folds_spellings():
+    assert {query.vendor_key(v) for v in ("Alpine GmbH", "ALPINE, GmbH.", "Alpíne", "alpine")} == {"alpine"}
+    assert query.vendor_key("Co") == "co"                  # a lone legal word is the name
+    assert query.index_attrs("invoices/processed/2025/10/04/x/parsed.json", "error") == \
+        {"processed_date": "2025-10-04", "status": "error"}
+
+def test_by_vendor_pages_through_and_projects():
+    t = Pages(_table())
+    items = list(query.by_vendor(t, "alpine gmbh", page_size=2))
+    assert sorted(it["invoice_id"] for it in items) == ["i1", "i2", "i3", "i5"]
+    assert len(t.calls) == 2 and "ExclusiveStartKey" in t.calls[1]
+    assert t.calls[0]["IndexName"] == query.VENDOR_DATE_INDEX
+    assert all(set(it) <= set(query.PROJECTED) for it in items) and "source_parse" not in items[0]
+
+    ranged = query.by_vendor(t, "Alpine", "2025-09-25", "2025-10-04", fields=("invoice_id", "invoice_date"))
+    assert list(ranged) == [{"invoice_id": "i1", "invoice_date": "2025-10-01"},
+                            {"invoice_id": "i2", "invoice_date": "2025-10-03"}]
+    assert [it["invoice_id"] for it in query.by_vendor(t, "alpine", currency="usd")] == ["i3"]
+
+def test_limit_stops_paging():
+    t = Pages(_table())
+    assert len(list(query.by_vendor(t, "alpine", page_size=2, limit=2))) == 2
+    assert len(t.calls) == 1
+
+def test_by_day_with_and_without_status():
+    t = Pages(_table())
+    assert sorted(it["invoice_id"] for it in query.by_day(t, "2025-10-04", page_size=1)) == ["i1", "i2", "i3", "i4"]
+    assert len(t.calls) == 4
+    assert [it["invoice_id"] for it in query.by_day(t, "2025-10-04", status="error")] == ["i3"]
+    assert t.calls[-1]["IndexName"] == query.DAY_STATUS_INDEX
+
+def test_count_day_sums_pages_without_reading_items():
+    t = Pages(_table(), max_page=1)
+    assert query.count_day(t, "2025-10-04") == 4
+    assert len(t.calls) == 4 and all(c["Select"] == "COUNT" for c in t.calls)
+    assert query.count_day(t, "2025-10-04", status="done") == 3
+    assert query.count_day(t, "2025-10-06") == 0
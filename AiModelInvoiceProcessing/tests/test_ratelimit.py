@@ -0,0 +1,133 @@
+# tests/test_ratelimit.py
+import pytest
+
+from common.ratelimit import RateLimiter, LimitedClient, set_limiter, reset
+from fake_aws import ClientError, FakeTextract, Throttling
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, s):
+        self.slept.append(s)
+        self.t += s
+
+def _limiter(clock, **kw):
+    return RateLimiter("test", clock=clock, sleep=clock.sleep, **kw)
+
+def _err(code):
+    return ClientError({"Error": {"Code": code}}, "Op")
+
+def test_requests_per_second():
+    clock = Clock()
+    lim = _limiter(clock, rps=2)
+    waits = [lim.acquire() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]                     # one second's burst
+    assert waits[2] == pytest.approx(0.5) and waits[3] == pytest.approx(0.5)
+    assert clock.t == pytest.approx(1.0)
+
+def test_token_budget_and_settle():
+    clock = Clock()
+    lim = _limiter(clock, rps=100, tpm=600)
+    assert lim.acquire(tokens=600) == 0.0
+    lim.settle(600, 300)                               # half of the reservation comes back
+    assert lim.acquire(tokens=300) == 0.0
+    assert lim.acquire(tokens=60) == pytest.approx(6.0)   # 10 tokens/s refill
+    assert lim.snapshot()["tokens"] == 300
+
+def test_throttle_halves_rate_then_recovers():
+    clock = Clock()
+    lim = _limiter(clock, rps=4, step=1, base_delay=0)
+    outcomes = iter([_err("ThrottlingException"), "ok"])
+
+    def fn():
+        o = next(outcomes)
+        if isinstance(o, Exception):
+            raise o
+        return o
+
+    assert lim.call(fn) == "ok"
+    snap = lim.snapshot()
+    assert (snap["throttled"], snap["retries"], snap["requests"]) == (1, 1, 2)
+    assert snap["rate_rps"] == 3.0                     # 4 -> 2 on the throttle, +1 on the success
+
+def test_min_rate_floor():
+    lim = _limiter(Clock(), rps=1, min_rps=0.25)
+    for _ in range(5):
+        lim.on_throttle()
+    assert lim.rate == 0.25
+
+def test_gives_up_after_max_attempts():
+    lim = _limiter(Clock(), rps=10, max_attempts=3, base_delay=0)
+
+    def fn():
+        raise _err("ServiceUnavailableException")
+
+    with pytest.raises(ClientError):
+        lim.call(fn)
+    snap = lim.snapshot()
+    assert (snap["transient"], snap["retries"], snap["failed"]) == (3, 2, 1)
+
+def test_other_errors_are_not_retried():
+    lim = _limiter(Clock(), rps=10)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise _err("ValidationException")
+
+    with pytest.raises(ClientError):
+        lim.call(fn)
+    assert len(calls) == 1
+
+def test_limited_client_routes_listed_ops():
+    class Client:
+        def analyze_expense(self, **kw):
+            return "analyzed"
+
+        def other(self):
+            return "direct"
+
+    lim = _limiter(Clock(), rps=10)
+    set_limiter("textract", lim)
+    try:
+        c = LimitedClient(Client(), {"analyze_expense": "textract"})
+        assert c.analyze_expense(Document={}) == "analyzed"
+        assert c.other() == "direct"
+        assert lim.snapshot()["requests"] == 1
+    finally:
+        reset()
+
+def test_other_errors_release_their_tokens():
+    lim = _limiter(Clock(), rps=10, tpm=600)
+
+    def fn():
+        raise _err("ValidationException")
+
+    with pytest.raises(ClientError):
+        lim.call(fn, tokens=500)
+    assert lim.acquire(tokens=600) == 0.0              # the whole budget is free again
+
+def test_limited_client_over_throttling_fake():
+    clock = Clock()
+    lim = _limiter(clock, rps=8, step=1, base_delay=0.1)
+    set_limiter("textract", lim)
+    tx = Throttling(FakeTextract(), ops=("analyze_expense",), first=2, every=5)
+    try:
+        c = LimitedClient(tx, {"analyze_expense": "textract"})
+        doc = {"S3Object": {"Bucket": "b", "Name": "a.pdf"}}
+        for _ in range(3):
+            assert c.analyze_expense(Document=doc)["ExpenseDocuments"]
+    finally:
+        reset()
+    # calls 1, 2 (first=2) and 5 (every=5) throttled; each retried once more
+    assert (tx.calls, tx.throttled) == (6, 3)
+    snap = lim.snapshot()
+    assert (snap["requests"], snap["throttled"], snap["retries"], snap["failed"]) == (6, 3, 3, 0)
+    # AIMD: 8 -> 4 -> 2, +1 on success -> 3, +1 -> 4, halved -> 2, +1 -> 3
+    assert snap["rate_rps"] == 3.0
+    assert len(clock.slept) >= 3 and snap["wait_s"] > 0          # jittered backoff and slower refill
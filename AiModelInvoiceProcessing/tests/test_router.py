@@ -0,0 +1,40 @@
+# tests/test_router.py
+from common import router
+from common.parser import parse_textract_expense
+from fake_aws import synthetic_expense
+
+def _parsed(**over):
+    parsed = parse_textract_expense(synthetic_expense(pages=1, lines_per_page=4, seed=1))
+    return {**parsed, **over}
+
+def test_complete_confident_parse_stays_local():
+    decision, draft = router.route(_parsed())
+    assert decision == {"route": "local", "reasons": [], "min_conf": 99}
+    assert draft["totals"]["total"] == "754.50"
+
+def test_missing_fields_go_to_llm():
+    decision, _ = router.route(_parsed(vendor=None, invoice_number=""))
+    assert decision["route"] == "llm"
+    assert {"missing:vendor", "missing:invoice_number"} <= set(decision["reasons"])
+
+def test_low_confidence_on_a_decisive_field():
+    parsed = _parsed()
+    parsed["meta"] = {**parsed["meta"], "confidence": {**parsed["meta"]["confidence"], "total": 40}}
+    decision, _ = router.route(parsed)
+    assert decision["route"] == "llm" and decision["min_conf"] == 40
+    assert "low_confidence" in decision["reasons"]
+
+def test_other_fields_do_not_gate():
+    parsed = _parsed()
+    parsed["meta"] = {**parsed["meta"], "confidence": {**parsed["meta"]["confidence"], "due_date": 10}}
+    assert router.route(parsed)[0]["route"] == "local"
+
+def test_line_items():
+    assert "no_line_items" in router.route(_parsed(line_items=[]))[0]["reasons"]
+    items = [dict(li) for li in _parsed()["line_items"]]
+    items[0]["description"] = ""
+    assert "incomplete_line_items" in router.route(_parsed(line_items=items))[0]["reasons"]
+
+def test_parse_error():
+    decision, draft = router.route({"error": "textract_failed"})
+    assert decision == {"route": "llm", "reasons": ["textract_failed"]} and draft is None
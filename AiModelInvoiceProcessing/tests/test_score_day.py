@@ -0,0 +1,43 @@
+# tests/test_score_day.py
+import pytest
+
+from common import manifest
+from fake_aws import FakeS3, FakeDynamo
+import score_day
+
+DAY = "invoices/processed/2025/10/04/"
+
+@pytest.fixture
+def env(monkeypatch):
+    s3, table = FakeS3(), FakeDynamo().Table("Invoices")
+    monkeypatch.setattr(score_day, "_client", s3)
+    monkeypatch.setattr(score_day, "_table", table)
+    return s3, table
+
+def _done(s3, table, inv: str, in_manifest: bool = True):
+    key = f"{DAY}{inv}/parsed.json"
+    s3.put_object(Bucket="b", Key=key, Body=b"{}")
+    table.put_item(Item={"invoice_id": inv, "processed_date": "2025-10-04", "status": "done"})
+    if in_manifest:
+        manifest.append(s3, "b", {"key": key, "invoice_id": inv, "status": "done", "ts": 1})
+    return key
+
+def test_manifest_used_when_counts_match(env, monkeypatch):
+    s3, table = env
+    keys = [_done(s3, table, f"inv{i}") for i in range(3)]
+    # a listing would also see this object; the manifest path must not
+    s3.put_object(Bucket="b", Key=f"{DAY}stray/parsed.json", Body=b"{}")
+    fp = score_day.Fingerprint()
+    assert sorted(score_day.list_parsed_json_s3("b", DAY, fp, use_manifest=True)) == keys
+    assert fp.hexdigest()
+
+def test_partial_manifest_falls_back_to_listing(env, capsys):
+    s3, table = env
+    keys = [_done(s3, table, f"inv{i}", in_manifest=i != 1) for i in range(3)]
+    assert sorted(score_day.list_parsed_json_s3("b", DAY, use_manifest=True)) == keys
+    assert "listing the partition" in capsys.readouterr().err
+
+def test_missing_manifest_lists(env):
+    s3, table = env
+    s3.put_object(Bucket="b", Key=f"{DAY}inv0/parsed.json", Body=b"{}")
+    assert list(score_day.list_parsed_json_s3("b", DAY, use_manifest=True)) == [f"{DAY}inv0/parsed.json"]
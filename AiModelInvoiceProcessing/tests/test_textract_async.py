@@ -0,0 +1,161 @@
+# tests/test_textract_async.py
+import json
+
+import pytest
+
+import fake_aws
+from common import aws, ratelimit, textract_async, process, manifest
+from common.parser import parse_textract_expense
+from common.ratelimit import RateLimiter
+from textract_done import handler as textract_done
+
+KEY = "invoices/raw/2025/10/04/a.pdf"
+DAY = "invoices/processed/2025/10/04/"
+
+class Sleeps:
+    def __init__(self):
+        self.delays = []
+
+    def __call__(self, s):
+        self.delays.append(s)
+
+class PagedTextract(fake_aws.FakeTextract):
+    """Returns at most `page_size` ExpenseDocuments parts per GetExpenseAnalysis call."""
+    page_size = 1
+
+    def get_expense_analysis(self, JobId, MaxResults=1000, NextToken=None, **kw):
+        return super().get_expense_analysis(JobId, min(MaxResults, self.page_size), NextToken, **kw)
+
+class FailingTextract(fake_aws.FakeTextract):
+    def get_expense_analysis(self, JobId, **kw):
+        return {"JobStatus": "FAILED", "StatusMessage": "unsupported format"}
+
+@pytest.fixture
+def env(monkeypatch):
+    for k, v in {"RAW_BUCKET": "raw", "PROCESSED_BUCKET": "proc", "DDB_TABLE": "Invoices"}.items():
+        monkeypatch.setenv(k, v)
+    aws.reset()
+    ratelimit.reset()
+    for name in ("textract", "textract-get"):
+        ratelimit.set_limiter(name, RateLimiter(name, rps=1000))
+    monkeypatch.setattr(process, "TEXTRACT_POLL_DELAY", 0.0)
+
+    def install(textract):
+        fakes = fake_aws.install(textract=textract)
+        fakes["s3"].put_object(Bucket="raw", Key=KEY, Body=b"%PDF-1.7 not linearized")
+        return fakes
+    yield install
+    aws.reset()
+    ratelimit.reset()
+
+def _item(fakes, key=KEY):
+    return fakes["dynamodb"].Table("Invoices").get_item(Key={"invoice_id": process.invoice_id_from_key(key)})["Item"]
+
+# --------------------------
+# textract_async
+# --------------------------
+def test_wait_backs_off_until_done():
+    tx, sleep = fake_aws.FakeTextract(polls=4), Sleeps()
+    job = textract_async.start(tx, "raw", KEY)
+    assert textract_async.wait(tx, job, timeout=60, first_delay=1.0, max_delay=4.0, sleep=sleep) == "SUCCEEDED"
+    assert len(sleep.delays) == 4
+    for got, base in zip(sleep.delays, [1.0, 2.0, 4.0, 4.0]):       # doubling, capped, +/-20% jitter
+        assert 0.8 * base <= got <= 1.2 * base
+
+def test_wait_gives_up_and_reports_failure():
+    tx = fake_aws.FakeTextract(polls=100)
+    with pytest.raises(TimeoutError):
+        textract_async.wait(tx, textract_async.start(tx, "raw", KEY), timeout=3, sleep=Sleeps())
+    tx = FailingTextract()
+    with pytest.raises(RuntimeError, match="unsupported format"):
+        textract_async.wait(tx, textract_async.start(tx, "raw", KEY), sleep=Sleeps())
+
+def test_fetch_merges_result_pages_by_expense_index():
+    tx = PagedTextract(pages=3, lines_per_page=2)
+    job = textract_async.start(tx, "raw", KEY)
+    resp = textract_async.fetch(tx, job)
+    assert tx.calls == 3                                   # one part per call, followed by NextToken
+    assert [d["ExpenseIndex"] for d in resp["ExpenseDocuments"]] == [1]
+    sync = tx.analyze_expense(Document={"S3Object": {"Bucket": "raw", "Name": KEY}})
+    a, b = parse_textract_expense(resp), parse_textract_expense(sync)
+    assert a["line_items"] == b["line_items"] and a["total"] == b["total"]
+
+def test_request_token_depends_on_key_and_etag():
+    assert textract_async.request_token("raw", KEY, None) is None
+    t = textract_async.request_token("raw", KEY, "e1")
+    assert t != textract_async.request_token("raw", KEY + "x", "e1") and len(t) == 64
+
+# --------------------------
+# process: routing and sync -> async fallback
+# --------------------------
+def test_textract_mode_routing(env, monkeypatch):
+    fakes = env(fake_aws.FakeTextract())
+    monkeypatch.setattr(process, "TEXTRACT_MODE", "auto")
+    monkeypatch.setattr(process, "TEXTRACT_SYNC_MAX_BYTES", 1000)
+    monkeypatch.setattr(process, "TEXTRACT_SNIFF_MIN_BYTES", 100)
+    assert process._textract_mode("raw", KEY, 5000) == "async"          # over the sync limit
+    assert process._textract_mode("raw", KEY, 50) == "sync"             # too small to sniff
+    assert process._textract_mode("raw", KEY, 500) == "sync"            # not linearized: no hint
+    fakes["s3"].put_object(Bucket="raw", Key=KEY, Body=b"%PDF-1.7\n1 0 obj<</Linearized 1/L 500/N 3>>")
+    assert process._textract_mode("raw", KEY, 500) == "async"           # three pages
+    monkeypatch.setattr(process, "TEXTRACT_SNIFF_PAGES", False)
+    assert process._textract_mode("raw", KEY, 500) == "sync"
+    monkeypatch.setattr(process, "TEXTRACT_MODE", "async")
+    assert process._textract_mode("raw", KEY, 50) == "async"
+
+def test_rejected_sync_call_is_retried_async(env, monkeypatch):
+    tx = fake_aws.FakeTextract(pages=3, lines_per_page=2, sync_max_pages=1)
+    fakes = env(tx)
+    monkeypatch.setattr(process, "TEXTRACT_MODE", "sync")
+    out = process.process_one_object("raw", KEY)
+    assert tx.started == 1 and len(out["parsed"]["line_items"]) == 6
+    payload = json.loads(fakes["s3"].get_object(Bucket="proc", Key=out["processed_key"])["Body"].read())
+    assert payload["meta"]["textract"] == {"mode": "async", "fallback": "UnsupportedDocumentException"}
+    assert _item(fakes)["status"] == "done"
+
+# --------------------------
+# textract_done
+# --------------------------
+def _start_with_sns(env, monkeypatch, tx):
+    fakes = env(tx)
+    monkeypatch.setattr(process, "TEXTRACT_MODE", "async")
+    monkeypatch.setattr(process, "TEXTRACT_SNS_TOPIC_ARN", "arn:topic")
+    monkeypatch.setattr(process, "TEXTRACT_SNS_ROLE_ARN", "arn:role")
+    out = process.process_one_object("raw", KEY)
+    assert out["pending"] and _item(fakes)["status"] == "pending"
+    return fakes, out["textract_job"]
+
+def _statuses(fakes):
+    return {e["invoice_id"]: e["status"] for e in manifest.read(fakes["s3"], "proc", DAY)[0]}
+
+def test_completion_notice_writes_the_invoice(env, monkeypatch):
+    tx = fake_aws.FakeTextract(pages=2)
+    fakes, job = _start_with_sns(env, monkeypatch, tx)
+    out = textract_done.handler(tx.completion_event(job, "raw"), None)
+    assert out["ok"] and out["processed"][0]["invoice_id"] == process.invoice_id_from_key(KEY)
+    assert _item(fakes)["status"] == "done"
+    assert set(_statuses(fakes).values()) == {"done"}
+
+def test_failed_job_marks_the_invoice(env, monkeypatch):
+    tx = fake_aws.FakeTextract()
+    fakes, job = _start_with_sns(env, monkeypatch, tx)
+    event = tx.completion_event(job, "raw")
+    msg = json.loads(event["Records"][0]["Sns"]["Message"])
+    event["Records"][0]["Sns"]["Message"] = json.dumps({**msg, "Status": "FAILED"})
+    out = textract_done.handler(event, None)
+    assert not out["ok"] and out["failed"][0]["key"] == KEY
+    item = _item(fakes)
+    assert item["status"] == "error" and job in item["error"]
+    assert set(_statuses(fakes).values()) == {"error"}
+
+def test_one_bad_record_does_not_fail_the_others(env, monkeypatch):
+    tx = fake_aws.FakeTextract()
+    fakes, job = _start_with_sns(env, monkeypatch, tx)
+    good = tx.completion_event(job, "raw")["Records"][0]
+    msg = json.loads(good["Sns"]["Message"])
+    bad = {"Sns": {"Message": json.dumps({**msg, "JobId": "no-such-job",
+                                          "DocumentLocation": {"S3Bucket": "raw", "S3ObjectName": KEY + "2"}})}}
+    out = textract_done.handler({"Records": [bad, good, {"Sns": {"Message": "not json"}}]}, None)
+    assert len(out["processed"]) == 1 and len(out["failed"]) == 2
+    assert _item(fakes)["status"] == "done"
+    assert _item(fakes, KEY + "2")["status"] == "error"
@@ -0,0 +1,66 @@
+# tests/test_validate.py
+import copy
+
+from common import validate
+from common.local_normalize import normalize_local
+from common.parser import parse_textract_expense
+from fake_aws import synthetic_expense
+
+def _doc():
+    parsed = parse_textract_expense(synthetic_expense(pages=1, lines_per_page=4, seed=1))
+    return parsed, normalize_local(parsed)
+
+def test_local_result_is_valid():
+    _, doc = _doc()
+    assert validate.validate(doc) == []
+
+def test_format_errors():
+    _, doc = _doc()
+    doc["invoice"]["date_iso"] = "04.10.2025"
+    doc["totals"]["tax"] = "12,5 EUR"
+    doc["confidence"]["vendor"] = "high"
+    del doc["invoice"]["currency"]
+    codes = {e["path"]: e["code"] for e in validate.validate(doc)}
+    assert codes == {"invoice.date_iso": "date", "totals.tax": "money", "confidence.vendor": "score",
+                     "invoice.currency": "missing"}
+
+def test_arithmetic_is_reported_only_on_clean_values():
+    _, doc = _doc()
+    doc["totals"]["total"] = f"{float(doc['totals']['total']) + 10:.2f}"
+    errors = validate.validate(doc)
+    assert [e["code"] for e in errors] == ["totals_math"]
+    assert {e["code"] for e in errors} <= validate.ARITHMETIC <= validate.LOCAL_ONLY
+
+def test_repair_reformats_and_recomputes_flag():
+    parsed, doc = _doc()
+    doc["invoice"]["date_iso"] = "04/10/2025"
+    doc["totals"]["subtotal"] = "€628.75"
+    doc["confidence"]["totals"] = "1.7"
+    doc["validations"]["sum_matches_total"] = not doc["validations"]["sum_matches_total"]
+    fixed_doc, fixed, remaining = validate.repair(copy.deepcopy(doc), parsed)
+    assert remaining == []
+    assert fixed_doc["invoice"]["date_iso"] == "2025-10-04"     # EUR invoice: day first
+    assert fixed_doc["totals"]["subtotal"] == "628.75"
+    assert fixed_doc["confidence"]["totals"] == "1.00"
+    assert fixed_doc["validations"]["sum_matches_total"] is validate.sum_matches(fixed_doc)
+    assert {"invoice.date_iso", "totals.subtotal", "confidence.totals", "validations.sum_matches_total"} <= set(fixed)
+
+def test_repair_dates_month_first_for_usd():
+    parsed, doc = _doc()
+    doc["invoice"]["currency"] = "USD"
+    doc["invoice"]["date_iso"] = "04/10/2025"
+    fixed_doc, _, _ = validate.repair(doc, {**parsed, "currency": "USD"})
+    assert fixed_doc["invoice"]["date_iso"] == "2025-04-10"
+
+def test_repair_fills_missing_sections():
+    data, fixed, remaining = validate.repair({"line_items": [None, {"amount": "x"}]})
+    assert set(fixed) >= {"vendor", "invoice", "totals", "confidence", "validations"}
+    assert len(data["line_items"]) == 1
+    assert all(e["code"] != "type" for e in remaining)
+
+def test_set_path():
+    _, doc = _doc()
+    assert validate.set_path(doc, "line_items.0.amount", "1.00")
+    assert doc["line_items"][0]["amount"] == "1.00"
+    assert not validate.set_path(doc, "line_items.99.amount", "1.00")
+    assert not validate.set_path(doc, "invoice.unknown", "x")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# tools/backfill_index.py
+# Adds the GSI key attributes (common/query.index_attrs) to Invoices items
+# written before the indexes existed, so they show up in DayStatusIndex and
+# VendorDateIndex. Scans once for items without processed_date; vendor and
+# invoice date come from the item itself (DDB_ITEM_MODE=full) or its
+# parsed.json. Run it after each index rollout step (troubleshooting.txt).
+#
+#   python3 tools/backfill_index.py --dry-run
+#   python3 tools/backfill_index.py --table Invoices --bucket my-processed
+import os, sys, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from score_day import fetch_ordered, get_json_s3_optional, _s3, WORKERS
+from src.common import aws, query
+from src.common.process import processed_key_for
+
+FIELDS = ("invoice_id", "raw_key", "processed_key", "status", "source_parse", "llm_normalized")
+
+def unindexed(table, page_size: int = 500):
+    """Items without processed_date (the DayStatusIndex hash key)."""
+    names = {f"#p{i}": f for i, f in enumerate(FIELDS)}
+    kw = {"FilterExpression": "attribute_not_exists(#pd)", "Limit": page_size,
+          "ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": {**names, "#pd": "processed_date"}}
+    while True:
+        resp = table.scan(**kw)
+        yield from resp.get("Items", [])
+        if not resp.get("LastEvaluatedKey"):
+            return
+        kw["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+def attrs_for(item: dict, bucket: str | None) -> dict | None:
+    """index_attrs() for a legacy item; None when it has no key to date it by."""
+    key = item.get("processed_key") or (processed_key_for(item["raw_key"]) if item.get("raw_key") else None)
+    if not key:
+        return None
+    status = item.get("status") or "done"    # items before status tracking were only written when done
+    if "source_parse" in item or "llm_normalized" in item:
+        parsed, llm = item.get("source_parse") or {}, item.get("llm_normalized")
+    elif bucket and status == "done":
+        data = get_json_s3_optional(bucket, key) or {}
+        parsed, llm = data.get("source_parse") or {}, data.get("llm_normalized")
+    else:
+        parsed = llm = None
+    return query.index_attrs(key, status, parsed, llm)
+
+def _set(table, invoice_id: str, attrs: dict) -> bool:
+    # conditional: an invoice reprocessed meanwhile already has fresher keys
+    try:
+        table.update_item(
+            Key={"invoice_id": invoice_id},
+            UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in attrs),
+            ConditionExpression="attribute_not_exists(#processed_date)",
+            ExpressionAttributeNames={f"#{k}": k for k in attrs},
+            ExpressionAttributeValues={f":{k}": v for k, v in attrs.items()},
+        )
+    except Exception as e:
+        if (getattr(e, "response", None) or {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+def backfill(table, bucket: str | None, workers: int = WORKERS, dry_run=False) -> dict:
+    counts = {"updated": 0, "skipped": 0, "undated": 0}
+    for item, attrs in fetch_ordered(unindexed(table), lambda it: attrs_for(it, bucket), workers):
+        if attrs is None:
+            counts["undated"] += 1
+        elif dry_run or _set(table, item["invoice_id"], attrs):
+            counts["updated"] += 1
+        else:
+            counts["skipped"] += 1
+    return counts
+
+def main():
+    ap = argparse.ArgumentParser(description="Add GSI key attributes to Invoices items that lack them.")
+    ap.add_argument("--table", default=os.getenv("DDB_TABLE", "Invoices"))
+    ap.add_argument("--bucket", default=os.getenv("PROCESSED_BUCKET"),
+                    help="Processed bucket, to read vendor/date from parsed.json for slim items")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--dry-run", action="store_true", help="Count only, write nothing")
+    args = ap.parse_args()
+
+    if args.bucket:
+        _s3(args.workers)
+    table = aws.resource("dynamodb").Table(args.table)
+    counts = backfill(table, args.bucket, args.workers, args.dry_run)
+    print(("Would update" if args.dry_run else "Updated") + f" {counts['updated']} item(s); "
+          f"{counts['skipped']} reprocessed meanwhile, {counts['undated']} without a raw/processed key")
+
+if __name__ == "__main__":
+    main()
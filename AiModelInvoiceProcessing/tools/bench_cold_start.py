@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# tools/bench_cold_start.py
+# Cold-start benchmark: each run is a fresh interpreter (like a new Lambda
+# sandbox) that measures `import common.process` and the first
+# process_one_object call against in-memory AWS fakes (tools/fake_aws.py).
+#
+#   python3 tools/bench_cold_start.py --runs 15
+#   python3 tools/bench_cold_start.py --use-llm
+import os, sys, json, argparse, statistics, subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHILD = r"""
+import sys, time, json
+WATCH = ("boto3", "botocore", "common.normalize", "common.llm_client", "common.prompt")
+t0 = time.perf_counter()
+import common.process as p
+t1 = time.perf_counter()
+loaded_at_import = [m for m in WATCH if m in sys.modules]
+sys.path.insert(0, TOOLS)
+import fake_aws
+fakes = fake_aws.install()
+fakes["s3"].put_object(Bucket="raw", Key="invoices/raw/2025/10/04/a.pdf", Body=b"%PDF-1.4 fake")
+t2 = time.perf_counter()
+p.process_one_object("raw", "invoices/raw/2025/10/04/a.pdf")
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "first_call_ms": (t3 - t2) * 1000,
+                  "loaded_after_import": loaded_at_import,
+                  "loaded_after_call": [m for m in WATCH if m in sys.modules]}))
+"""
+
+def _run_once(env) -> dict:
+    code = f"TOOLS = {str(ROOT / 'tools')!r}\n" + CHILD
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=str(ROOT / "src"),
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _pct(vals, q):
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))]
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure import time and time to first process_one_object.")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--use-llm", action="store_true", help="Exercise the USE_LLM path (fake Bedrock)")
+    ap.add_argument("--cache", action="store_true", help="Enable the result cache (extra HEAD/GETs)")
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "RAW_BUCKET": "raw", "PROCESSED_BUCKET": "processed", "DDB_TABLE": "Invoices",
+        "AWS_REGION": "us-east-1", "USE_LLM": "true" if args.use_llm else "false",
+        "CACHE_ENABLED": "true" if args.cache else "false",
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT / "src"), os.getenv("PYTHONPATH")])),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+
+    runs = [_run_once(env) for _ in range(args.runs)]
+    imp = [r["import_ms"] for r in runs]
+    first = [r["first_call_ms"] for r in runs]
+    print(f"Cold start — {args.runs} fresh interpreters, USE_LLM={env['USE_LLM']} CACHE_ENABLED={env['CACHE_ENABLED']}")
+    print(f"  import common.process      median {statistics.median(imp):7.2f} ms   p90 {_pct(imp, 0.9):7.2f} ms")
+    print(f"  first process_one_object   median {statistics.median(first):7.2f} ms   p90 {_pct(first, 0.9):7.2f} ms")
+    print(f"  loaded by import:          {runs[0]['loaded_after_import'] or '-'}")
+    print(f"  loaded after first call:   {runs[0]['loaded_after_call'] or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# tools/bench_metrics.py
+# Scoring benchmark on synthetic (source_parse, llm_normalized) pairs: the
+# per-invoice metrics.compare_case loop vs the columnar metrics.compare_bulk
+# (numpy). Every pair is checked for identical results.
+#
+#   python3 tools/bench_metrics.py --pairs 100000
+import sys, time, random, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from common import metrics
+from common.metrics import compare_case, compare_bulk, flatten, case_at, bulk_totals, FIELDS
+
+VENDORS = ["Papeterie Paris", "Alpha Supplies Inc.", "Northwind Traders Ltd", "Alpine GmbH", "Maple Office Co."]
+CURRENCIES = ["USD", "EUR", "GBP", "", None]
+
+def _amount(rng):
+    # the shapes seen in real output: clean, formatted, empty, missing, odd types
+    v = round(rng.uniform(1, 20000), 2)
+    return rng.choice([f"{v:.2f}", f"${v:,.2f}", f"{v:.2f} EUR", str(int(v)), v, "", None, float("nan"), "n/a"])
+
+def synthetic_pair(rng):
+    total, tax = _amount(rng), _amount(rng)
+    source = {
+        "vendor": rng.choice(VENDORS + [None]),
+        "invoice_number": rng.choice([f"INV-{rng.randint(1, 999)}", None]),
+        "invoice_date": rng.choice(["2025-10-04", "10/04/2025", None]),
+        "currency": rng.choice(CURRENCIES),
+        "total": total,
+        "tax": tax,
+    }
+    if rng.random() < 0.6:   # source_parse with the normalized layout
+        source = {"vendor": {"name": source["vendor"]}, "invoice": {"number": source["invoice_number"]},
+                  "totals": {"total": total, "tax": tax}}
+    def drift(v):
+        if rng.random() < 0.7 or not isinstance(v, str):
+            return v
+        return rng.choice([v.replace("$", ""), f"{rng.uniform(1, 20000):.2f}", ""])
+    model = {
+        "vendor": {"name": rng.choice(VENDORS)},
+        "invoice": {"number": f"INV-{rng.randint(1, 999)}", "date_iso": rng.choice(["2025-10-04", ""]),
+                    "currency": rng.choice(CURRENCIES)},
+        "totals": {"total": drift(total), "tax": drift(tax)},
+        "validations": {"sum_matches_total": rng.random() < 0.8},
+        "confidence": {"totals": "0.9"},
+    }
+    if rng.random() < 0.05:
+        model = rng.choice([None, {}, {"totals": None}])
+    return source, model
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and a != a and b != b:
+        return True
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    return a == b
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare scalar and columnar invoice scoring.")
+    ap.add_argument("--pairs", type=int, default=100000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    if metrics.np is None:
+        raise SystemExit("numpy not installed; `pip install numpy`")
+
+    rng = random.Random(args.seed)
+    pairs = [synthetic_pair(rng) for _ in range(args.pairs)]
+    print(f"{args.pairs} synthetic pairs")
+
+    t0 = time.perf_counter()
+    scalar = [compare_case(s, m) for s, m in pairs]
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    cols = flatten(pairs)
+    t_flat = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    bulk = compare_bulk(cols)
+    t_bulk = time.perf_counter() - t0
+
+    mismatches = [i for i, r in enumerate(scalar) if not _same(r, case_at(bulk, i))]
+    totals = bulk_totals(bulk)
+    expect = {
+        "coverage_delta_sum": sum(r["coverage_delta"] for r in scalar),
+        "near1pct_total": sum(r["numeric"]["totals.total"]["near@1pct"] for r in scalar),
+        "near1pct_tax": sum(r["numeric"]["totals.tax"]["near@1pct"] for r in scalar),
+        "wins_fill_counts": {f: sum(r["wins_fill"][f] for r in scalar) for f in FIELDS},
+        "wins_fix_counts": {f: sum(r["wins_fix"][f] for r in scalar) for f in FIELDS},
+    }
+    totals_ok = all(totals[k] == v for k, v in expect.items())
+
+    print(f"  compare_case loop      {t_scalar * 1e3:9.1f} ms  ({t_scalar / args.pairs * 1e6:.2f} us/pair)")
+    print(f"  flatten                {t_flat * 1e3:9.1f} ms")
+    print(f"  compare_bulk           {t_bulk * 1e3:9.1f} ms")
+    print(f"  flatten + compare_bulk {(t_flat + t_bulk) * 1e3:9.1f} ms  "
+          f"(x{t_scalar / max(t_flat + t_bulk, 1e-9):.1f})")
+    print(f"  identical results: {args.pairs - len(mismatches)}/{args.pairs}; totals {'match' if totals_ok else 'DIFFER'}")
+    if mismatches:
+        i = mismatches[0]
+        print(f"  first mismatch #{i}: {pairs[i]}\n    scalar {scalar[i]}\n    bulk   {case_at(bulk, i)}")
+    sys.exit(0 if not mismatches and totals_ok else 1)
+
+if __name__ == "__main__":
+    main()
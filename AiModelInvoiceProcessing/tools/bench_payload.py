@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# tools/bench_payload.py
+# Storage benchmark on synthetic invoices (1/10/50 pages): parsed.json size
+# as written before (json.dumps defaults) vs compact/gzip/zstd (common/codec.py)
+# with encode/decode timings, and the DynamoDB item size of the full vs slim
+# item shape (process.ddb_item) in bytes and write capacity units. Ends with a
+# monthly S3 + DynamoDB estimate at list prices (override with the flags).
+#
+#   python3 tools/bench_payload.py --pages 1 10 50 --invoices 100000
+import sys, json, time, argparse
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from common import codec
+from common.parser import parse_textract_expense
+from common.local_normalize import normalize_local
+from common.process import ddb_item
+from fake_aws import synthetic_expense
+
+def _payload(pages: int, lines: int) -> tuple:
+    parsed = parse_textract_expense(synthetic_expense(pages=pages, lines_per_page=lines, seed=pages, other_fields=10))
+    llm = normalize_local(parsed)
+    key = f"invoices/raw/2025/10/04/inv-{pages:03d}.pdf"
+    payload = {"raw_key": key, "source_parse": parsed, "llm_normalized": llm,
+               "meta": {"etag": "0123456789abcdef0123456789abcdef", "source": "textract+local", "model_id": None,
+                        "prompt_version": None, "textract": {"mode": "sync", "pages": pages},
+                        "cache": {"hit": False}, "normalize": {"route": {"route": "local"}}}}
+    return key, parsed, llm, payload
+
+def _timed(fn, repeat: int) -> tuple:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - t0) / repeat * 1e3
+
+def ddb_size(v) -> int:
+    """Approximate DynamoDB attribute value size (the published sizing rules)."""
+    if v is None or isinstance(v, bool):
+        return 1
+    if isinstance(v, (int, float, Decimal)):
+        digits = len(str(abs(v)).replace(".", "").lstrip("0")) or 1
+        return 1 + (digits + 1) // 2
+    if isinstance(v, str):
+        return len(v.encode("utf-8"))
+    if isinstance(v, dict):
+        return 3 + sum(len(k.encode("utf-8")) + ddb_size(x) + 1 for k, x in v.items())
+    if isinstance(v, (list, tuple)):
+        return 3 + sum(ddb_size(x) + 1 for x in v)
+    return len(str(v))
+
+def item_size(item: dict) -> int:
+    return sum(len(k.encode("utf-8")) + ddb_size(v) for k, v in item.items())
+
+def _wcu(size: int) -> int:
+    return max(1, -(-size // 1024))
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare parsed.json encodings and DynamoDB item shapes.")
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50])
+    ap.add_argument("--lines", type=int, default=25, help="line items per page")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--invoices", type=int, default=100000, help="invoices per month for the cost estimate")
+    ap.add_argument("--s3-gb-month", type=float, default=0.023, help="S3 Standard $/GB-month")
+    ap.add_argument("--ddb-gb-month", type=float, default=0.25, help="DynamoDB Standard $/GB-month")
+    ap.add_argument("--ddb-wru-million", type=float, default=0.625, help="DynamoDB on-demand $/million write units")
+    args = ap.parse_args()
+
+    encodings = [e for e in codec.ENCODINGS if codec.effective(e) == e]
+    if "zstd" not in encodings:
+        print("(zstandard not installed: zstd falls back to gzip and is skipped)\n")
+
+    print(f"parsed.json — {args.lines} line items per page, {args.repeat} repeats")
+    print(f"  {'pages':>5}  {'legacy B':>9}  " + "  ".join(f"{e + ' B':>10}  {'ratio':>5}  {'enc ms':>6}  {'dec ms':>6}"
+                                                       for e in encodings))
+    rows = []
+    for pages in args.pages:
+        key, parsed, llm, payload = _payload(pages, args.lines)
+        legacy = len(json.dumps(payload).encode("utf-8"))
+        cols, sizes = [], {}
+        for e in encodings:
+            (body, extra), enc_ms = _timed(lambda: codec.encode(payload, e), args.repeat)
+            back, dec_ms = _timed(lambda: codec.loads(body, extra.get("ContentEncoding")), args.repeat)
+            assert back == json.loads(json.dumps(payload)), f"{e} round trip differs"
+            sizes[e] = len(body)
+            cols.append(f"{len(body):>10}  {legacy / len(body):>4.1f}x  {enc_ms:>6.2f}  {dec_ms:>6.2f}")
+        print(f"  {pages:>5}  {legacy:>9}  " + "  ".join(cols))
+        best = min(sizes, key=sizes.get)
+        full = item_size(ddb_item(key, "etag", key, parsed, llm, legacy, "identity", mode="full"))
+        slim = item_size(ddb_item(key, "etag", key, parsed, llm, sizes[best], best, mode="slim"))
+        rows.append((pages, legacy, best, sizes[best], full, slim))
+
+    print("\nDynamoDB item (full: + source_parse/llm_normalized maps; slim: index fields + S3 pointer)")
+    print(f"  {'pages':>5}  {'full B':>8}  {'WCU':>4}  {'slim B':>7}  {'WCU':>4}")
+    for pages, _, _, _, full, slim in rows:
+        over = "  (over the 400 KB item limit)" if full > 400 * 1024 else ""
+        print(f"  {pages:>5}  {full:>8}  {_wcu(full):>4}  {slim:>7}  {_wcu(slim):>4}{over}")
+
+    gb = args.invoices / 1024 ** 3
+    print(f"\nPer month at {args.invoices:,} invoices (storage added that month + DynamoDB writes)")
+    print(f"  {'pages':>5}  {'before $':>9}  {'after $':>8}  encoding")
+    for pages, legacy, best, best_size, full, slim in rows:
+        before = (legacy * args.s3_gb_month + full * args.ddb_gb_month) * gb \
+                 + _wcu(full) * args.invoices / 1e6 * args.ddb_wru_million
+        after = (best_size * args.s3_gb_month + slim * args.ddb_gb_month) * gb \
+                + _wcu(slim) * args.invoices / 1e6 * args.ddb_wru_million
+        print(f"  {pages:>5}  {before:>9.2f}  {after:>8.2f}  {best}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# tools/bench_prompt.py
+# Prompt-size benchmark on synthetic multi-page Textract responses:
+#  1) estimated input tokens of the final user message per compaction level
+#  2) memoized system/few-shot prefix vs the original per-call layout that
+#     re-serialised every few-shot with SCHEMA in each turn, and the tokens a
+#     Bedrock cache point saves per invoice
+#
+#   python3 tools/bench_prompt.py --pages 1 3 10 --lines 25
+import sys, json, time, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from common.compact import compact_textract, estimate_tokens, DETAIL_LEVELS
+from common.parser import parse_textract_expense
+from common.config import PROMPT_CACHE_MIN_TOKENS
+from common.normalize import build_messages, _prefix_messages
+from common.prompt import SYSTEM, FEW_SHOTS, SCHEMA_TEXT, SCHEMA_PROMPT
+from fake_aws import synthetic_expense
+
+def _timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - t0) * 1000 / repeat
+
+def bench_compaction(pages_list, lines, repeat):
+    print(f"Textract compaction — {lines} line items per page, {repeat} repeats")
+    print(f"  {'pages':>5}  {'level':>8}  {'tokens(est)':>11}  {'vs raw':>7}  {'build ms':>8}")
+    for pages in pages_list:
+        resp = synthetic_expense(pages=pages, lines_per_page=lines, seed=pages)
+        parsed = parse_textract_expense(resp)
+        raw_tokens = estimate_tokens(resp)
+        for level in DETAIL_LEVELS:
+            msgs, ms = _timed(lambda: build_messages(resp, parsed, detail=level), repeat)
+            tokens = estimate_tokens(msgs[-1]["content"])
+            print(f"  {pages:>5}  {level:>8}  {tokens:>11}  {tokens / raw_tokens:>6.0%}  {ms:>8.3f}")
+    print()
+
+def _legacy_build_messages(compacted: dict, deterministic_parse: dict):
+    # layout before the prefix was memoized: schema repeated in every turn
+    msgs = [{"role": "system", "content": SYSTEM}]
+    for ex in FEW_SHOTS:
+        note = ex.get("input_schema_note", "Few-shot example")
+        tex_hint = json.dumps(ex.get("textract_hint", {}), separators=(",", ":"))
+        det = json.dumps(ex.get("deterministic_parse", {}), separators=(",", ":"))
+        out = json.dumps(ex.get("output", {}), separators=(",", ":"))
+        msgs.append({"role": "user",
+                     "content": f"{note}\nTEXTRACT={tex_hint}\nPARSE={det}\nSCHEMA={SCHEMA_TEXT}\n{SCHEMA_PROMPT}"})
+        msgs.append({"role": "assistant", "content": out})
+    tex = json.dumps(compacted or {}, separators=(",", ":"))
+    det = json.dumps(deterministic_parse or {}, separators=(",", ":"))
+    msgs.append({"role": "user", "content": f"TEXTRACT={tex}\nPARSE={det}\nSCHEMA={SCHEMA_TEXT}\n{SCHEMA_PROMPT}"})
+    return msgs
+
+def _tokens(msgs):
+    return sum(estimate_tokens(m["content"]) for m in msgs)
+
+def bench_prefix(lines, repeat, detail="standard"):
+    resp = synthetic_expense(pages=1, lines_per_page=lines, seed=1)
+    parsed = parse_textract_expense(resp)
+    compacted = compact_textract(resp, detail)
+
+    legacy, legacy_ms = _timed(lambda: _legacy_build_messages(compacted, parsed), repeat)
+    current, current_ms = _timed(lambda: build_messages(resp, parsed, detail=detail, compacted=compacted), repeat)
+    prefix_tokens = _tokens(_prefix_messages(detail))
+    legacy_tokens, current_tokens = _tokens(legacy), _tokens(current)
+
+    print(f"Prompt prefix — 1 page x {lines} lines, detail={detail}, {repeat} repeats")
+    print(f"  per-call layout:   {legacy_tokens:>6} input tokens (est)   build {legacy_ms:.3f} ms")
+    print(f"  memoized prefix:   {current_tokens:>6} input tokens (est)   build {current_ms:.3f} ms")
+    print(f"  saved per invoice: {legacy_tokens - current_tokens:>6} tokens, {legacy_ms - current_ms:.3f} ms serialisation")
+    cached = any(m.get("cache") for m in _prefix_messages(detail))
+    if cached:
+        print(f"  cacheable prefix:  {prefix_tokens:>6} tokens; with BEDROCK_PROMPT_CACHE only "
+              f"{current_tokens - prefix_tokens} tokens per invoice are billed at the full input rate")
+    else:
+        print(f"  static prefix:     {prefix_tokens:>6} tokens; too short to cache, every token is billed in full")
+    print(f"  cache point:       {'set' if cached else 'not set'} (PROMPT_CACHE_MIN_TOKENS={PROMPT_CACHE_MIN_TOKENS}; "
+          "Bedrock only caches prefixes above the model minimum: 1024 tokens, 2048 on Haiku models)")
+    print()
+
+def main():
+    ap = argparse.ArgumentParser(description="Estimate prompt tokens per Textract compaction level.")
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 3, 10])
+    ap.add_argument("--lines", type=int, default=25, help="Line items per page")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+    bench_compaction(args.pages, args.lines, args.repeat)
+    bench_prefix(args.lines, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# tools/export_parquet.py
+# Compacts a day (or range) of invoices/processed/YYYY/MM/DD/**/parsed.json
+# into the day-partitioned Parquet datasets of common/columnar.py: invoice
+# headers, line items and per-invoice compare_case metrics. Re-running a day
+# replaces its partitions. score_day.py and render_report.py read the result
+# with --parquet instead of opening every parsed.json.
+#
+#   python3 tools/export_parquet.py 2025-10-04
+#   python3 tools/export_parquet.py --from 2025-10-01 --to 2025-10-31 --out s3://my-processed/analytics
+import os, sys, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+import score_day
+from score_day import fetch_ordered, list_parsed_json_s3, get_json_s3, Progress, _s3, _days, _today_parts, WORKERS, REGION
+from src.common import columnar
+
+def export_day(day: str, bucket: str, out: str, prefix_tpl="invoices/processed/{yyyy}/{mm}/{dd}/",
+               workers: int = WORKERS, progress: bool | None = None) -> dict:
+    """Export one day partition; returns {dataset: row count}."""
+    yyyy, mm, dd = day.split("-")
+    prefix = prefix_tpl.format(yyyy=yyyy, mm=mm, dd=dd)
+    bar = Progress(progress)
+
+    def parts():
+        for n, (key, data) in enumerate(fetch_ordered(list_parsed_json_s3(bucket, prefix),
+                                                      lambda k: get_json_s3(bucket, k), workers), 1):
+            yield columnar.rows_for(key, data)
+            bar.update(n)
+
+    try:
+        return columnar.write_day(out, day, parts(), region=REGION)
+    finally:
+        bar.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Export processed invoices to partitioned Parquet datasets.")
+    ap.add_argument("date", nargs="?", help="YYYY-MM-DD (defaults to today in TIMEZONE)")
+    ap.add_argument("--from", dest="date_from", help="First day of a range")
+    ap.add_argument("--to", dest="date_to", help="Last day of a range (default: today)")
+    ap.add_argument("--bucket", help="Processed S3 bucket (PROCESSED_BUCKET env by default)")
+    ap.add_argument("--prefix-tpl", default="invoices/processed/{yyyy}/{mm}/{dd}/")
+    ap.add_argument("--out", help="Dataset root: s3://bucket/prefix or a local directory "
+                                  "(default: s3://<bucket>/analytics)")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--progress", dest="progress", action="store_true", default=None)
+    ap.add_argument("--no-progress", dest="progress", action="store_false")
+    args = ap.parse_args()
+
+    bucket = args.bucket or os.getenv("PROCESSED_BUCKET")
+    if not bucket:
+        raise SystemExit("Missing bucket. Set --bucket or PROCESSED_BUCKET env.")
+    if columnar.pa is None:
+        raise SystemExit("pyarrow not installed; `pip install pyarrow`")
+    out = args.out or f"s3://{bucket}/analytics"
+    if args.date_from or args.date_to:
+        days = [d.isoformat() for d in _days(args.date_from or args.date_to, args.date_to or "-".join(_today_parts()))]
+    else:
+        days = ["-".join(score_day._yymmdd(args.date))]
+
+    _s3(args.workers)
+    for day in days:
+        counts = export_day(day, bucket, out, args.prefix_tpl, args.workers, args.progress)
+        print(f"  {day}  " + "  ".join(f"{name} {n:>6}" for name, n in counts.items()))
+    print(f"Wrote {len(days)} day partition(s) under {out}/{{{','.join(columnar.DATASETS)}}}/")
+
+if __name__ == "__main__":
+    main()
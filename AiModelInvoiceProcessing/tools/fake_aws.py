@@ -0,0 +1,404 @@
+# tools/fake_aws.py
+# In-memory stand-ins for the AWS clients used by src/common, for offline
+# benchmarks and local harnesses. install() registers them in common.aws.
+import io, re, json, time, random, hashlib
+
+try:
+    from botocore.exceptions import ClientError
+except Exception:  # allow running without botocore installed
+    class ClientError(Exception):
+        def __init__(self, error_response, operation_name):
+            self.response = error_response
+            self.operation_name = operation_name
+            super().__init__(f"{operation_name}: {error_response.get('Error', {}).get('Code')}")
+
+def _err(code, op, status=400):
+    return ClientError({"Error": {"Code": code, "Message": code},
+                        "ResponseMetadata": {"HTTPStatusCode": status}}, op)
+
+# --------------------------
+# Synthetic Textract responses
+# --------------------------
+VENDORS = ["Papeterie Paris", "Alpha Supplies Inc.", "Northwind Traders Ltd", "Alpine GmbH", "Maple Office Co."]
+ITEMS = ["A4 Paper (500 sheets)", "Printer Ink Cartridge - Black", "Stapler Set", "Desk Lamp", "Toner XL"]
+
+def _field(t, v, conf=99.0, page=1, label=None):
+    geo = {"BoundingBox": {"Width": 0.1, "Height": 0.02, "Left": 0.5, "Top": 0.1},
+           "Polygon": [{"X": 0.5, "Y": 0.1}, {"X": 0.6, "Y": 0.1}, {"X": 0.6, "Y": 0.12}, {"X": 0.5, "Y": 0.12}]}
+    f = {"Type": {"Text": t, "Confidence": conf},
+         "ValueDetection": {"Text": v, "Geometry": geo, "Confidence": conf},
+         "PageNumber": page}
+    if label:
+        f["LabelDetection"] = {"Text": label, "Geometry": geo, "Confidence": conf}
+    return f
+
+def synthetic_expense(pages: int = 1, lines_per_page: int = 5, seed: int = 0, docs: int = 1,
+                      other_fields: int = 0) -> dict:
+    """
+    A Textract AnalyzeExpense-shaped response, including geometry noise.
+    `other_fields` adds that many OTHER summary fields per page, plus a
+    low-confidence "carried forward" TOTAL on every page but the last, as
+    real multi-page statements have.
+    """
+    rnd = random.Random(seed)
+    out_docs = []
+    for d in range(docs):
+        vendor = rnd.choice(VENDORS)
+        items, subtotal = [], 0.0
+        for p in range(1, pages + 1):
+            for _ in range(lines_per_page):
+                qty = rnd.randint(1, 9)
+                price = round(rnd.uniform(1, 80), 2)
+                amt = round(qty * price, 2)
+                subtotal += amt
+                items.append({"LineItemExpenseFields": [
+                    _field("ITEM", rnd.choice(ITEMS), page=p),
+                    _field("QUANTITY", str(qty), page=p),
+                    _field("UNIT_PRICE", f"{price:.2f}", page=p),
+                    _field("PRICE", f"{amt:.2f}", page=p),
+                    _field("EXPENSE_ROW", f"{qty} x {price:.2f}", page=p),
+                ]})
+        subtotal = round(subtotal, 2)
+        tax = round(subtotal * 0.2, 2)
+        summary = [
+            _field("VENDOR_NAME", vendor, label="From"),
+            _field("INVOICE_RECEIPT_ID", f"INV-{seed:04d}-{d}", label="Invoice #"),
+            _field("INVOICE_RECEIPT_DATE", "2025-10-04", label="Date"),
+            _field("SUBTOTAL", f"{subtotal:.2f}", page=pages, label="Subtotal"),
+            _field("TAX", f"{tax:.2f}", page=pages, label="VAT"),
+            _field("TOTAL", f"{subtotal + tax:.2f}", page=pages, label="Total"),
+            _field("CURRENCY", "EUR"),
+        ]
+        if other_fields:
+            summary += [_field("DUE_DATE", "2025-11-03", label="Due"), _field("PO_NUMBER", f"PO-{seed}")]
+            addr = _field("ADDRESS", "12 Rue de la Paix, 75002 Paris", label="Address")
+            addr["GroupProperties"] = [{"Types": ["VENDOR"], "Id": "g1"}]
+            summary.append(addr)
+            for p in range(1, pages + 1):
+                summary += [_field("OTHER", f"note {p}.{k}", conf=rnd.uniform(40, 99), page=p, label=f"Ref {k}")
+                            for k in range(other_fields)]
+                if p < pages:
+                    summary.append(_field("TOTAL", f"{rnd.uniform(1, 500):.2f}", conf=62.0, page=p,
+                                          label="Carried forward"))
+            rnd.shuffle(summary)   # reading order interleaves OTHER fields with the known types
+        out_docs.append({
+            "ExpenseIndex": d + 1,
+            "SummaryFields": summary,
+            "LineItemGroups": [{"LineItemGroupIndex": 1, "LineItems": items}],
+            "Blocks": [{"BlockType": "PAGE", "Id": f"p{p}", "Confidence": 99.9,
+                        "Geometry": {"BoundingBox": {"Width": 1, "Height": 1, "Left": 0, "Top": 0}}}
+                       for p in range(1, pages + 1)],
+        })
+    return {"DocumentMetadata": {"Pages": pages}, "ExpenseDocuments": out_docs,
+            "ResponseMetadata": {"RequestId": "fake", "HTTPStatusCode": 200}}
+
+# --------------------------
+# Clients
+# --------------------------
+class FakeS3:
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> {"Body": bytes, ...}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kw):
+        cur = self.objects.get((Bucket, Key))
+        if (IfNoneMatch == "*" and cur is not None) or (IfMatch and (cur is None or cur["ETag"] != IfMatch)):
+            raise _err("PreconditionFailed", "PutObject", 412)
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        body = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        self.objects[(Bucket, Key)] = {"Body": body, "ETag": etag, **kw}
+        return {"ETag": etag}
+
+    def get_object(self, Bucket, Key, **kw):
+        o = self.objects.get((Bucket, Key))
+        if o is None:
+            raise _err("NoSuchKey", "GetObject", 404)
+        out = {k: v for k, v in o.items() if k != "Body"}
+        body = o["Body"]
+        if kw.get("Range"):   # "bytes=a-b"
+            a, _, b = kw["Range"][len("bytes="):].partition("-")
+            body = body[int(a):int(b) + 1 if b else None]
+        out["Body"] = io.BytesIO(body)
+        out["ContentLength"] = len(body)
+        return out
+
+    def head_object(self, Bucket, Key, **kw):
+        o = self.objects.get((Bucket, Key))
+        if o is None:
+            raise _err("404", "HeadObject", 404)
+        return {"ETag": o["ETag"], "ContentLength": len(o["Body"])}
+
+    def delete_objects(self, Bucket, Delete, **kw):
+        for o in Delete["Objects"]:
+            self.objects.pop((Bucket, o["Key"]), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None, **kw):
+        keys = sorted(k for (b, k) in self.objects if b == Bucket and k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        resp = {"Contents": [{"Key": k, "ETag": self.objects[(Bucket, k)]["ETag"],
+                              "Size": len(self.objects[(Bucket, k)]["Body"])} for k in page],
+                "IsTruncated": start + MaxKeys < len(keys)}
+        if resp["IsTruncated"]:
+            resp["NextContinuationToken"] = str(start + MaxKeys)
+        return resp
+
+def split_by_page(resp: dict) -> list:
+    """The ExpenseDocuments of `resp` cut into per-page parts, as GetExpenseAnalysis pages them."""
+    parts = []
+    for d in resp["ExpenseDocuments"]:
+        items = [li for g in d["LineItemGroups"] for li in g["LineItems"]]
+        for p in range(1, resp["DocumentMetadata"]["Pages"] + 1):
+            parts.append({
+                "ExpenseIndex": d["ExpenseIndex"],
+                "SummaryFields": [f for f in d["SummaryFields"] if f.get("PageNumber") == p],
+                "LineItemGroups": [{"LineItemGroupIndex": 1, "LineItems": [
+                    li for li in items if li["LineItemExpenseFields"][0].get("PageNumber") == p]}],
+            })
+    return parts
+
+class FakeTextract:
+    """
+    analyze_expense plus the async job API. `sync_max_pages` makes the
+    synchronous call reject longer documents like the real one does;
+    `polls` is how many GetExpenseAnalysis calls report IN_PROGRESS.
+    """
+    def __init__(self, pages: int = 1, lines_per_page: int = 5, sync_max_pages: int | None = None,
+                 polls: int = 0):
+        self.pages = pages
+        self.lines_per_page = lines_per_page
+        self.sync_max_pages = sync_max_pages
+        self.polls = polls
+        self.calls = 0
+        self.jobs = {}      # JobId -> {"name", "polls", "tag", "channel"}
+        self.started = 0
+
+    def _response(self, name):
+        seed = int(hashlib.sha1(name.encode()).hexdigest()[:6], 16)
+        return synthetic_expense(self.pages, self.lines_per_page, seed=seed)
+
+    def analyze_expense(self, Document, **kw):
+        self.calls += 1
+        if self.sync_max_pages is not None and self.pages > self.sync_max_pages:
+            raise _err("UnsupportedDocumentException", "AnalyzeExpense")
+        return self._response(Document["S3Object"]["Name"])
+
+    def start_expense_analysis(self, DocumentLocation, ClientRequestToken=None, JobTag=None,
+                               NotificationChannel=None, **kw):
+        job_id = hashlib.sha1((ClientRequestToken or str(len(self.jobs))).encode()).hexdigest()
+        if job_id not in self.jobs:   # same token -> same job
+            self.started += 1
+            self.jobs[job_id] = {"name": DocumentLocation["S3Object"]["Name"], "polls": self.polls,
+                                 "tag": JobTag, "channel": NotificationChannel}
+        return {"JobId": job_id}
+
+    def get_expense_analysis(self, JobId, MaxResults=1000, NextToken=None, **kw):
+        self.calls += 1
+        job = self.jobs.get(JobId)
+        if job is None:
+            raise _err("InvalidJobIdException", "GetExpenseAnalysis")
+        if job["polls"] > 0:
+            job["polls"] -= 1
+            return {"JobStatus": "IN_PROGRESS"}
+        full = self._response(job["name"])
+        parts = split_by_page(full)
+        start = int(NextToken or 0)
+        resp = {"JobStatus": "SUCCEEDED", "DocumentMetadata": full["DocumentMetadata"],
+                "ExpenseDocuments": parts[start:start + MaxResults]}
+        if start + MaxResults < len(parts):
+            resp["NextToken"] = str(start + MaxResults)
+        return resp
+
+    def completion_event(self, job_id: str, bucket: str) -> dict:
+        """The SNS event Textract publishes when `job_id` finishes (input of textract_done.handler)."""
+        job = self.jobs[job_id]
+        msg = {"JobId": job_id, "Status": "SUCCEEDED", "API": "StartExpenseAnalysis", "JobTag": job["tag"],
+               "DocumentLocation": {"S3ObjectName": job["name"], "S3Bucket": bucket}}
+        return {"Records": [{"EventSource": "aws:sns", "Sns": {"Message": json.dumps(msg)}}]}
+
+class FakeStream:
+    """An EventStream stand-in: yields chunk events, counts what was consumed, records close()."""
+    def __init__(self, events, delay: float = 0.0):
+        self.events, self.delay = events, delay
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for e in self.events:
+            if self.delay:
+                time.sleep(self.delay)
+            self.consumed += 1
+            yield e
+
+    def close(self):
+        self.closed = True
+
+class FakeBedrock:
+    """
+    invoke_model returns a canned Claude-style message with one normalized
+    invoice; invoke_model_with_response_stream streams the same text in
+    `chunk_chars` deltas (`delay` seconds apart) followed by `trailer`.
+    """
+    def __init__(self, text: str | None = None, trailer: str = "", chunk_chars: int = 16, delay: float = 0.0):
+        self.text = text
+        self.trailer = trailer
+        self.chunk_chars, self.delay = chunk_chars, delay
+        self.calls = 0
+        self.streams = []
+
+    def _text(self):
+        return self.text or json.dumps({
+            "vendor": {"name": "Alpha Supplies Inc.", "country_hint": "US"},
+            "invoice": {"number": "INV-1", "date_iso": "2025-10-04", "currency": "USD"},
+            "totals": {"subtotal": "10.00", "tax": "1.00", "total": "11.00"},
+            "line_items": [{"description": "x", "qty": "1", "unit_price": "10.00", "amount": "10.00"}],
+            "confidence": {"structure": "0.9", "vendor": "0.9", "totals": "0.9", "lines": "0.9"},
+            "validations": {"sum_matches_total": True},
+        })
+
+    def invoke_model(self, modelId, body, **kw):
+        self.calls += 1
+        text = self._text() + self.trailer
+        payload = {"content": [{"type": "text", "text": text}],
+                   "usage": {"input_tokens": len(body) // 4, "output_tokens": len(text) // 4}}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kw):
+        self.calls += 1
+        text = self._text() + self.trailer
+        def ev(d):
+            return {"chunk": {"bytes": json.dumps(d).encode("utf-8")}}
+        events = [ev({"type": "message_start", "message": {"usage": {"input_tokens": len(body) // 4,
+                                                                      "output_tokens": 1}}})]
+        events += [ev({"type": "content_block_delta", "index": 0,
+                       "delta": {"type": "text_delta", "text": text[i:i + self.chunk_chars]}})
+                   for i in range(0, len(text), self.chunk_chars)]
+        events += [ev({"type": "message_delta", "usage": {"output_tokens": len(text) // 4}}),
+                   ev({"type": "message_stop"})]
+        stream = FakeStream(events, self.delay)
+        self.streams.append(stream)
+        return {"body": stream}
+
+class Throttling:
+    """
+    Wraps a fake client so that calls to `ops` fail with ThrottlingException
+    in a fixed pattern: every `every`-th call, or the first `first` calls.
+    Other attributes pass through. `calls` / `throttled` count per wrapper.
+    """
+    def __init__(self, inner, ops=("invoke_model", "analyze_expense"), every: int = 0, first: int = 0):
+        self.inner, self.ops = inner, set(ops)
+        self.every, self.first = every, first
+        self.calls = self.throttled = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name not in self.ops:
+            return attr
+        def call(*a, **kw):
+            self.calls += 1
+            if self.calls <= self.first or (self.every and self.calls % self.every == 0):
+                self.throttled += 1
+                raise _err("ThrottlingException", name, 429)
+            return attr(*a, **kw)
+        return call
+
+class FakeTable:
+    def __init__(self, name):
+        self.name = name
+        self.items = {}
+
+    def put_item(self, Item, **kw):
+        self.items[Item["invoice_id"]] = Item
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues,
+                    ExpressionAttributeNames=None, **kw):
+        # supports the "SET #a = :a, ..." form used by src/common
+        names = ExpressionAttributeNames or {}
+        item = self.items.setdefault(Key["invoice_id"], dict(Key))
+        for part in UpdateExpression[len("SET "):].split(","):
+            lhs, rhs = (x.strip() for x in part.split("="))
+            item[names.get(lhs, lhs)] = ExpressionAttributeValues[rhs]
+        return {}
+
+    def get_item(self, Key, **kw):
+        it = self.items.get(Key["invoice_id"])
+        return {"Item": it} if it else {}
+
+    def scan(self, FilterExpression=None, ExpressionAttributeNames=None, ProjectionExpression=None,
+             Limit=None, ExclusiveStartKey=None, **kw):
+        # supports "attribute_not_exists(#a)" filters; Limit counts items scanned, as in DynamoDB
+        names = ExpressionAttributeNames or {}
+        ids = sorted(self.items)
+        if ExclusiveStartKey:
+            ids = ids[ids.index(ExclusiveStartKey["invoice_id"]) + 1:]
+        page = ids[:Limit] if Limit else ids
+        missing = [names[a] for a in re.findall(r"attribute_not_exists\((#\w+)\)", FilterExpression or "")]
+        fields = [names.get(f.strip(), f.strip()) for f in ProjectionExpression.split(",")] if ProjectionExpression else None
+        hits = [self.items[i] for i in page if not any(a in self.items[i] for a in missing)]
+        out = {"Items": [{k: v for k, v in it.items() if fields is None or k in fields} for it in hits],
+               "Count": len(hits)}
+        if Limit and len(ids) > Limit:
+            out["LastEvaluatedKey"] = {"invoice_id": page[-1]}
+        return out
+
+    _COND = re.compile(r"(?:(#\w+) = (:\w+)|(#\w+) BETWEEN (:\w+) AND (:\w+)|begins_with\((#\w+), (:\w+)\))")
+
+    def query(self, KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+              FilterExpression=None, ProjectionExpression=None, Limit=None, ExclusiveStartKey=None, **kw):
+        # supports the "=", "BETWEEN" and "begins_with" conditions built by src/common/query.py
+        names, values = ExpressionAttributeNames, ExpressionAttributeValues
+        tests, sort_attr = [], None
+        for expr in filter(None, (KeyConditionExpression, FilterExpression)):
+            for eq, ev, bt, lo, hi, bw, pre in self._COND.findall(expr):
+                if eq:
+                    tests.append(lambda it, a=names[eq], v=values[ev]: it.get(a) == v)
+                elif bt:
+                    sort_attr = names[bt]
+                    tests.append(lambda it, a=sort_attr, l=values[lo], h=values[hi]: a in it and l <= it[a] <= h)
+                else:
+                    sort_attr = names[bw]
+                    tests.append(lambda it, a=sort_attr, p=values[pre]: str(it.get(a, "")).startswith(p))
+        hits = sorted((it for it in self.items.values() if all(t(it) for t in tests)),
+                      key=lambda it: (str(it.get(sort_attr, "")), it["invoice_id"]))
+        if ExclusiveStartKey:
+            hits = hits[[it["invoice_id"] for it in hits].index(ExclusiveStartKey["invoice_id"]) + 1:]
+        page = hits[:Limit] if Limit else hits
+        fields = [names.get(f.strip(), f.strip()) for f in ProjectionExpression.split(",")] if ProjectionExpression else None
+        out = {"Count": len(page)}
+        if kw.get("Select") != "COUNT":
+            out["Items"] = [{k: v for k, v in it.items() if fields is None or k in fields} for it in page]
+        if Limit and len(hits) > Limit:
+            out["LastEvaluatedKey"] = {"invoice_id": page[-1]["invoice_id"]}
+        return out
+
+class FakeDynamo:
+    def __init__(self):
+        self.tables = {}
+
+    def Table(self, name):
+        return self.tables.setdefault(name, FakeTable(name))
+
+    def batch_get_item(self, RequestItems, **kw):
+        out = {}
+        for name, req in RequestItems.items():
+            t = self.Table(name)
+            out[name] = [t.items[k["invoice_id"]] for k in req["Keys"] if k["invoice_id"] in t.items]
+        return {"Responses": out, "UnprocessedKeys": {}}
+
+def install(region: str | None = None, **overrides) -> dict:
+    """Register fakes in common.aws and return them by service name."""
+    from common import aws, config
+    fakes = {
+        "s3": overrides.get("s3") or FakeS3(),
+        "textract": overrides.get("textract") or FakeTextract(),
+        "bedrock-runtime": overrides.get("bedrock") or FakeBedrock(),
+        "dynamodb": overrides.get("dynamodb") or FakeDynamo(),
+    }
+    for svc in ("s3", "textract"):
+        aws.set_client(svc, fakes[svc], region)
+    aws.set_client("bedrock-runtime", fakes["bedrock-runtime"], config.BEDROCK_REGION)
+    aws.set_resource("dynamodb", fakes["dynamodb"], region)
+    return fakes
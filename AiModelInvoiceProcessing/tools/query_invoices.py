@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# tools/query_invoices.py
+# Invoice lookups through the Invoices table GSIs (common/query.py) instead of
+# a Scan: by vendor and invoice-date range, or by processing day and status,
+# optionally filtered on currency. Prints a table or, with --json, one item
+# per line.
+#
+#   python3 tools/query_invoices.py --day 2025-10-04 --status error
+#   python3 tools/query_invoices.py --vendor "Alpine GmbH" --from 2025-10-01 --to 2025-10-31
+#   python3 tools/query_invoices.py --day 2025-10-04 --currency EUR --json
+import os, sys, json, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from score_day import _yymmdd
+from src.common import aws, query
+
+COLUMNS = {"processed_date": 14, "status": 7, "invoice_date": 12, "vendor": 28, "currency": 4, "total": 12,
+           "invoice_id": 40}
+
+def _row(item: dict) -> dict:
+    return {**item, "total": (item.get("totals") or {}).get("total")}
+
+def print_table(items) -> int:
+    n = 0
+    print("  ".join(f"{c[:w]:<{w}}" for c, w in COLUMNS.items()))
+    for item in items:
+        row = _row(item)
+        print("  ".join(f"{str('—' if row.get(c) in (None, '') else row[c])[:w]:<{w}}" for c, w in COLUMNS.items()))
+        n += 1
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description="Query invoices by vendor/date or processing day/status.")
+    ap.add_argument("--vendor", help="Vendor name (folded like the index: case, accents, legal suffixes)")
+    ap.add_argument("--from", dest="date_from", help="First invoice date (with --vendor)")
+    ap.add_argument("--to", dest="date_to", help="Last invoice date (with --vendor)")
+    ap.add_argument("--day", help="Processing day YYYY-MM-DD (default: today in TIMEZONE)")
+    ap.add_argument("--status", choices=query.STATUSES, help="Only this status (with --day)")
+    ap.add_argument("--currency", help="Only this currency, e.g. EUR")
+    ap.add_argument("--fields", help=f"Comma-separated attributes (default: {','.join(query.PROJECTED)})")
+    ap.add_argument("--limit", type=int, default=50, help="Stop after this many items (0: all)")
+    ap.add_argument("--table", default=os.getenv("DDB_TABLE", "Invoices"))
+    ap.add_argument("--json", action="store_true", help="One JSON item per line")
+    args = ap.parse_args()
+
+    table = aws.resource("dynamodb").Table(args.table)
+    opts = {"currency": args.currency, "limit": args.limit or None,
+            "fields": args.fields.split(",") if args.fields else None}
+    if args.vendor:
+        items = query.by_vendor(table, args.vendor, args.date_from, args.date_to, **opts)
+        what = f"vendor {query.vendor_key(args.vendor)!r}"
+    else:
+        day = "-".join(_yymmdd(args.day))
+        items = query.by_day(table, day, args.status, **opts)
+        what = f"processed {day}" + (f" status={args.status}" if args.status else "")
+
+    if args.json:
+        for item in items:
+            print(json.dumps(item, default=str))
+        return
+    n = print_table(items)
+    print(f"\n{n} invoice(s), {what}" + (f" currency={args.currency.upper()}" if args.currency else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# tools/rebuild_manifest.py
+# Backfills the per-day _manifest/ (common/manifest.py) for partitions
+# processed before manifests existed: lists the partition once, reads each
+# parsed.json's meta and adds the keys the manifest is missing. --compact
+# only merges per-invoice entries into compact.jsonl.
+#
+#   python3 tools/rebuild_manifest.py 2025-10-04
+#   python3 tools/rebuild_manifest.py --from 2025-09-01 --to 2025-09-30
+import os, sys, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+from score_day import fetch_ordered, list_parsed_json_s3, get_json_s3, _s3, _days, _yymmdd, _today_parts, WORKERS
+from src.common import manifest
+
+def entry_for(key: str, data: dict) -> dict:
+    meta = data.get("meta") or {}
+    return {"key": key, "invoice_id": key.rstrip("/").split("/")[-2], "raw_key": data.get("raw_key"),
+            "etag": meta.get("etag"), "size": None, "status": "done", "source": meta.get("source"),
+            "model_id": meta.get("model_id"), "ms": None, "backfilled": True}
+
+def rebuild_day(day: str, bucket: str, workers: int = WORKERS, compact_only=False) -> str:
+    yyyy, mm, dd = day.split("-")
+    prefix = f"invoices/processed/{yyyy}/{mm}/{dd}/"
+    if compact_only:
+        return f"{manifest.compact(_s3(), bucket, prefix)} entries merged"
+    keys = list_parsed_json_s3(bucket, prefix, use_manifest=False)
+    entries = (entry_for(k, data) for k, data in fetch_ordered(keys, lambda k: get_json_s3(bucket, k), workers))
+    return f"{manifest.backfill(_s3(), bucket, prefix, entries)} entries added"
+
+def main():
+    ap = argparse.ArgumentParser(description="Backfill or compact per-day processed manifests.")
+    ap.add_argument("date", nargs="?", help="YYYY-MM-DD (defaults to today in TIMEZONE)")
+    ap.add_argument("--from", dest="date_from")
+    ap.add_argument("--to", dest="date_to")
+    ap.add_argument("--bucket", help="Processed S3 bucket (PROCESSED_BUCKET env by default)")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--compact", action="store_true", help="Only merge per-invoice entries")
+    args = ap.parse_args()
+
+    bucket = args.bucket or os.getenv("PROCESSED_BUCKET")
+    if not bucket:
+        raise SystemExit("Missing bucket. Set --bucket or PROCESSED_BUCKET env.")
+    if args.date_from or args.date_to:
+        days = [d.isoformat() for d in _days(args.date_from or args.date_to, args.date_to or "-".join(_today_parts()))]
+    else:
+        days = ["-".join(_yymmdd(args.date))]
+    _s3(args.workers)
+    for day in days:
+        print(f"  {day}  {rebuild_day(day, bucket, args.workers, args.compact)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # tools/render_report.py
-import os, sys, csv, json, datetime
+import os, sys, csv, json, datetime, argparse
 from zoneinfo import ZoneInfo
 import boto3
 from io import StringIO
@@ -10,6 +10,8 @@ TZ     = os.getenv("TIMEZONE", "America/Chicago")
 BUCKET = os.environ["PROCESSED_BUCKET"]  # required
 s3 = boto3.client("s3", region_name=REGION)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
 FIELDS = [
     "vendor.name",
     "invoice.number",
@@ -39,6 +41,26 @@ def _rows_from_csv(text):
     r = csv.DictReader(f)
     return list(r)
 
+def _inputs_from_parquet(root, date_str):
+    # aggregate + per-invoice rows straight from the export_parquet.py metrics dataset
+    from common import columnar
+    table = columnar.read(root, "metrics", days=[date_str], region=REGION)
+    c = columnar.aggregate_metrics(table)
+    n = c["n"]
+    agg = {
+        "count_scored": n,
+        "avg_coverage_delta": c["coverage_delta_sum"] / n if n else 0.0,
+        "pct_sum_matches_total": c["sum_matches_total_true"] / n if n else 0.0,
+        "pct_near1pct_total": c["near1pct_total"] / n if n else 0.0,
+        "pct_near1pct_tax": c["near1pct_tax"] / n if n else 0.0,
+        "wins_fill_counts": c["wins_fill_counts"],
+        "wins_fix_counts": c["wins_fix_counts"],
+    }
+    cols = ["processed_key", "coverage_delta", "sum_matches_total", "near1pct_total", "near1pct_tax"]
+    rows = [{**r, "key": r["processed_key"]}
+            for r in table.filter(table.column("scored")).select(cols).to_pylist()]
+    return agg, rows
+
 def _bar(pct: float) -> str:
     pct = max(0.0, min(1.0, float(pct or 0.0)))
     width = int(pct * 100)
@@ -180,7 +202,7 @@ def build_html(date_str, agg: dict, score_rows: list) -> str:
 </html>"""
     return html
 
-def main(date_str=None):
+def main(date_str=None, parquet_root=None):
     if date_str:
         yyyy, mm, dd = date_str.split("-")
     else:
@@ -189,9 +211,12 @@ def main(date_str=None):
     agg_key, csv_key, report_key = _keys_for_date(yyyy, mm, dd)
 
     # Load inputs
-    agg = _get_s3_json(BUCKET, agg_key)
-    csv_text = _get_s3_text(BUCKET, csv_key)
-    rows = _rows_from_csv(csv_text)
+    if parquet_root:
+        agg, rows = _inputs_from_parquet(parquet_root, f"{yyyy}-{mm}-{dd}")
+    else:
+        agg = _get_s3_json(BUCKET, agg_key)
+        csv_text = _get_s3_text(BUCKET, csv_key)
+        rows = _rows_from_csv(csv_text)
 
     # Build + write HTML
     html = build_html(f"{yyyy}-{mm}-{dd}", agg, rows)
@@ -204,4 +229,9 @@ def main(date_str=None):
     print(f"Wrote s3://{BUCKET}/{report_key}")
 
 if __name__ == "__main__":
-    main(sys.argv[1] if len(sys.argv) > 1 else None)
+    ap = argparse.ArgumentParser(description="Render the daily metrics report to HTML.")
+    ap.add_argument("date", nargs="?", help="YYYY-MM-DD (defaults to today in TIMEZONE)")
+    ap.add_argument("--parquet", nargs="?", const=f"s3://{BUCKET}/analytics", metavar="ROOT",
+                    help="Read the export_parquet.py metrics dataset instead of aggregate.json/score.csv")
+    args = ap.parse_args()
+    main(args.date, args.parquet)
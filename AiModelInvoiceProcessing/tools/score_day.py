@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 # tools/score_day.py
-import os, sys, csv, json, argparse, datetime, re
+import os, sys, io, csv, json, time, argparse, datetime, re, tempfile, threading, hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from zoneinfo import ZoneInfo
 from pathlib import Path
-from io import StringIO
 
 # --- Repo imports (works regardless of CWD)
 ROOT = Path(__file__).resolve().parents[1]
@@ -11,6 +12,7 @@ sys.path.insert(0, str(ROOT))
 sys.path.insert(0, str(ROOT / "src"))
 
 from src.common.metrics import compare_case, FIELDS  # expects src/common/metrics.py
+from src.common import columnar, manifest, codec, query
 
 # --- AWS (optional; only needed for S3 mode)
 try:
@@ -18,8 +20,17 @@ try:
 except Exception:  # allow running without boto3 when using --local-dir
     boto3 = None
 
-REGION = os.getenv("AWS_REGION", "us-east-1")
-TZ     = os.getenv("TIMEZONE", "America/Chicago")
+REGION  = os.getenv("AWS_REGION", "us-east-1")
+TZ      = os.getenv("TIMEZONE", "America/Chicago")
+WORKERS = int(os.getenv("SCORE_WORKERS", "16"))   # concurrent parsed.json fetches
+USE_MANIFEST = True    # read the day's _manifest/ instead of listing the partition (--no-manifest)
+DDB_TABLE = os.getenv("DDB_TABLE", "Invoices")   # a manifest is used only if its count matches this table's
+
+ROW_FIELDS = ["key", "invoice_id", "coverage_baseline", "coverage_model", "coverage_delta",
+              "sum_matches_total", "near1pct_total", "near1pct_tax"]
+PER_INVOICE_ROWS = 6    # printed; all rows go to score.csv
+SAMPLE_DIFFS     = 12
+AGG_VERSION      = 2    # aggregate.json layout with mergeable "counters"; older files are recomputed
 
 def _today_parts():
     now = datetime.datetime.now(ZoneInfo(TZ))
@@ -37,14 +48,78 @@ def _yymmdd(date_str: str | None):
 # --------------------------
 # S3 helpers
 # --------------------------
-def _s3():
-    if not boto3:
-        raise SystemExit("boto3 not installed; use --local-dir or `pip install boto3`")
-    return boto3.client("s3", region_name=REGION)
-
-def list_parsed_json_s3(bucket: str, prefix: str):
-    """Yield keys ending with parsed.json under an S3 prefix."""
+_client = None
+_client_lock = threading.Lock()
+
+def _s3(pool: int = WORKERS):
+    # one client for the whole run (clients are thread-safe, creating them is slow and not)
+    global _client
+    if _client is None:
+        if not boto3:
+            raise SystemExit("boto3 not installed; use --local-dir or `pip install boto3`")
+        from botocore.config import Config
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client("s3", region_name=REGION,
+                                       config=Config(max_pool_connections=max(10, pool)))
+    return _client
+
+_table = None
+_DAY_PREFIX = re.compile(r"(\d{4})/(\d{2})/(\d{2})/?$")
+
+def _ddb():
+    global _table
+    if _table is None:
+        _table = boto3.resource("dynamodb", region_name=REGION).Table(DDB_TABLE)
+    return _table
+
+def _done_count(prefix: str) -> int | None:
+    # invoices DynamoDB has as done for the prefix's day; None when it can't tell
+    m = _DAY_PREFIX.search(prefix)
+    if not m:
+        return None
+    try:
+        return query.count_day(_ddb(), "-".join(m.groups()), "done")
+    except Exception as e:
+        print(f"[manifest] could not count {DDB_TABLE} items for {prefix}: {e}", file=sys.stderr)
+        return None
+
+class Fingerprint:
+    """Digest of a partition listing (key and ETag of every parsed.json); None until the listing is complete."""
+    def __init__(self):
+        self._h = hashlib.sha256()
+        self.complete = False
+
+    def add(self, key: str, etag: str):
+        self._h.update(f"{key}\t{etag}\n".encode("utf-8"))
+
+    def hexdigest(self) -> str | None:
+        return self._h.hexdigest()[:32] if self.complete else None
+
+def list_parsed_json_s3(bucket: str, prefix: str, fp: Fingerprint | None = None,
+                        use_manifest: bool | None = None):
+    """
+    Yield keys ending with parsed.json under an S3 prefix (feeding `fp`).
+    Days with a manifest (common/manifest.py) are read from its objects
+    instead of listing every object, but only while its "done" entries
+    match DynamoDB's done count for the day; otherwise the partition is
+    listed (the manifest is best-effort and may miss attempts).
+    """
     s3 = _s3()
+    if USE_MANIFEST if use_manifest is None else use_manifest:
+        entries, digest = manifest.read(s3, bucket, prefix)
+        if entries is not None:
+            done = [e["key"] for e in entries if e.get("status") == "done"]
+            expected = _done_count(prefix)
+            if expected == len(done):
+                if fp:
+                    fp.add(manifest.SHARD_DIR, digest)
+                yield from done
+                if fp:
+                    fp.complete = True
+                return
+            print(f"[manifest] {prefix}: {len(done)} done entries, {DDB_TABLE} has "
+                  f"{'?' if expected is None else expected}; listing the partition instead", file=sys.stderr)
     token = None
     while True:
         kw = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": 1000}
@@ -54,20 +129,41 @@ def list_parsed_json_s3(bucket: str, prefix: str):
         for o in resp.get("Contents", []) or []:
             k = o["Key"]
             if k.endswith("parsed.json"):
+                if fp:
+                    fp.add(k, o.get("ETag", ""))
                 yield k
         if resp.get("IsTruncated"):
             token = resp.get("NextContinuationToken")
         else:
             break
+    if fp:
+        fp.complete = True
+
+def partition_fingerprint(bucket: str, prefix: str) -> str:
+    fp = Fingerprint()
+    for _ in list_parsed_json_s3(bucket, prefix, fp):
+        pass
+    return fp.hexdigest()
 
 def get_json_s3(bucket: str, key: str) -> dict:
-    s3 = _s3()
-    b = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
-    return json.loads(b)
+    o = _s3().get_object(Bucket=bucket, Key=key)
+    return codec.loads(o["Body"].read(), o.get("ContentEncoding"))
+
+def get_json_s3_optional(bucket: str, key: str) -> dict | None:
+    try:
+        return get_json_s3(bucket, key)
+    except Exception as e:
+        if (getattr(e, "response", None) or {}).get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
 
 def put_text_s3(bucket: str, key: str, body: str, content_type: str):
     _s3().put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"), ContentType=content_type)
 
+def put_file_s3(bucket: str, key: str, f, content_type: str):
+    f.seek(0)
+    _s3().put_object(Bucket=bucket, Key=key, Body=f, ContentType=content_type)
+
 # --------------------------
 # Local helpers
 # --------------------------
@@ -77,7 +173,60 @@ def list_parsed_json_local(root: Path):
         yield str(p)
 
 def get_json_local(path: str) -> dict:
-    return json.loads(Path(path).read_text(encoding="utf-8"))
+    return codec.loads(Path(path).read_bytes())   # plain, or gzip/zstd by magic bytes
+
+# --------------------------
+# Concurrent fetching
+# --------------------------
+def fetch_ordered(items, fetch, workers: int = WORKERS, window: int | None = None):
+    """
+    Yield (item, fetch(item)) in input order with up to `workers` fetches in
+    flight. At most `window` fetched documents are held at once, so memory
+    stays flat however many items there are; closing the generator (e.g. on
+    --limit) cancels whatever is still queued.
+    """
+    window = max(1, window or workers * 4)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        try:
+            for item in items:
+                pending.append((item, pool.submit(fetch, item)))
+                if len(pending) >= window:
+                    head, fut = pending.popleft()
+                    yield head, fut.result()
+            while pending:
+                head, fut = pending.popleft()
+                yield head, fut.result()
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+class Progress:
+    """One self-overwriting status line on stderr (only on a terminal unless forced)."""
+    def __init__(self, enabled: bool | None = None, every: float = 0.25, stream=sys.stderr):
+        self.enabled = stream.isatty() if enabled is None else enabled
+        self.every, self.stream = every, stream
+        self.t0 = self.last = time.monotonic()
+        self.fetched = self.scored = 0
+
+    def update(self, scored: int):
+        self.fetched += 1
+        self.scored = scored
+        now = time.monotonic()
+        if self.enabled and now - self.last >= self.every:
+            self.last = now
+            self._write(now)
+
+    def _write(self, now):
+        rate = self.fetched / max(now - self.t0, 1e-6)
+        self.stream.write(f"\r  fetched {self.fetched:>7}  scored {self.scored:>7}  {rate:7.1f}/s")
+        self.stream.flush()
+
+    def close(self):
+        if self.enabled and self.fetched:
+            self._write(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
 
 # --------------------------
 # Printing helpers
@@ -109,8 +258,9 @@ def print_top_table(title, counts, n):
         print(f"  {f:20} {c:2d}  {bar}")
     print()
 
-def print_per_invoice(rows, max_rows=6):
-    print("Per-invoice (first {:d} of {:d}) ".format(min(max_rows, len(rows)), len(rows)) + "─" * 42)
+def print_per_invoice(rows, max_rows=PER_INVOICE_ROWS, total=None):
+    total = len(rows) if total is None else total
+    print("Per-invoice (first {:d} of {:d}) ".format(min(max_rows, len(rows)), total) + "─" * 42)
     print(f" {'Δ':>2}  {'sum≈total':>9}  {'near@1% total':>13}  {'near@1% tax':>12}   invoice_id")
     for r in rows[:max_rows]:
         delta = r.get("coverage_delta", 0)
@@ -132,17 +282,24 @@ def print_diffs(title, diffs):
         print(f"  {f}: {vb!r}  ->  {vo!r}")
     print()
 
+def _route_of(data: dict) -> str:
+    """'local' when the router skipped Bedrock, 'llm' when it sent it there, '' if unrouted."""
+    route = (((data.get("meta") or {}).get("normalize") or {}).get("route") or {})
+    return route.get("route") or ""
+
+def print_routing(agg):
+    seen = agg["routed_local"] + agg["routed_llm"]
+    if not seen:
+        return
+    print(f"Routed (deterministic-first): {seen}  local {agg['routed_local']}  llm {agg['routed_llm']}")
+    print(f"LLM skipped:                 {_bar(agg['routed_local'] / seen)}")
+    print()
+
 # --------------------------
 # Core scoring
 # --------------------------
-def score_bucket(date_str: str, bucket: str, prefix_tpl="invoices/processed/{yyyy}/{mm}/{dd}/",
-                 limit: int|None=None, show_diffs=False, upload=True):
-    yyyy, mm, dd = _yymmdd(date_str)
-    prefix = prefix_tpl.format(yyyy=yyyy, mm=mm, dd=dd)
-    print(f"Scanning s3://{bucket}/{prefix}")
-
-    rows = []
-    agg = {
+def _new_agg():
+    return {
         "n": 0,
         "coverage_delta_sum": 0,
         "sum_matches_total_true": 0,
@@ -150,182 +307,286 @@ def score_bucket(date_str: str, bucket: str, prefix_tpl="invoices/processed/{yyy
         "near1pct_tax": 0,
         "wins_fill_counts": {f: 0 for f in FIELDS},
         "wins_fix_counts":  {f: 0 for f in FIELDS},
+        "routed_local": 0,
+        "routed_llm": 0,
+    }
+
+def _score_one(agg, samples, key, invoice_id, data, show_diffs=False):
+    """Fold one parsed.json into the aggregate; returns its CSV row or None if it isn't scored."""
+    source = data.get("source_parse") or {}
+    llm    = data.get("llm_normalized") or {}
+
+    route = _route_of(data)
+    if route:
+        agg["routed_" + route] += 1
+    if not llm or (data.get("meta") or {}).get("source") == "textract+local":
+        return None  # skip textract-only and locally normalized
+
+    m = compare_case(source, llm)
+
+    agg["n"] += 1
+    agg["coverage_delta_sum"] += m["coverage_delta"]
+    agg["sum_matches_total_true"] += 1 if m["sum_matches_total"] else 0
+    if m["numeric"]["totals.total"]["near@1pct"]: agg["near1pct_total"] += 1
+    if m["numeric"]["totals.tax"]["near@1pct"]:   agg["near1pct_tax"] += 1
+
+    for f in FIELDS:
+        if m["wins_fill"][f]:
+            agg["wins_fill_counts"][f] += 1
+            if show_diffs and len(samples["fills"]) < SAMPLE_DIFFS:
+                samples["fills"].append({"key": key, "field": f, "baseline": None, "model": _dig(llm, f)})
+        if m["wins_fix"][f]:
+            agg["wins_fix_counts"][f] += 1
+            if show_diffs and len(samples["fixes"]) < SAMPLE_DIFFS:
+                samples["fixes"].append({"key": key, "field": f,
+                                         "baseline": _dig(source, _map_field_to_source(f)),
+                                         "model": _dig(llm, f)})
+
+    return {
+        "key": key,
+        "invoice_id": invoice_id,
+        "coverage_baseline": m["coverage_baseline"],
+        "coverage_model": m["coverage_model"],
+        "coverage_delta": m["coverage_delta"],
+        "sum_matches_total": m["sum_matches_total"],
+        "near1pct_total": bool(m["numeric"]["totals.total"]["near@1pct"]),
+        "near1pct_tax":   bool(m["numeric"]["totals.tax"]["near@1pct"]),
     }
-    sample_fills = []
-    sample_fixes = []
-
-    for i, key in enumerate(list_parsed_json_s3(bucket, prefix)):
-        data = get_json_s3(bucket, key)
-        source = data.get("source_parse") or {}
-        llm    = data.get("llm_normalized") or {}
-
-        if not llm:
-            continue  # skip textract-only
-
-        m = compare_case(source, llm)
-
-        # Aggregate
-        agg["n"] += 1
-        agg["coverage_delta_sum"] += m["coverage_delta"]
-        agg["sum_matches_total_true"] += 1 if m["sum_matches_total"] else 0
-        if m["numeric"]["totals.total"]["near@1pct"]: agg["near1pct_total"] += 1
-        if m["numeric"]["totals.tax"]["near@1pct"]:   agg["near1pct_tax"] += 1
-
-        for f in FIELDS:
-            if m["wins_fill"][f]:
-                agg["wins_fill_counts"][f] += 1
-                if show_diffs:
-                    sample_fills.append({
-                        "key": key, "field": f,
-                        "baseline": None,
-                        "model": _dig(llm, f)
-                    })
-            if m["wins_fix"][f]:
-                agg["wins_fix_counts"][f] += 1
-                if show_diffs:
-                    sample_fixes.append({
-                        "key": key, "field": f,
-                        "baseline": _dig(source, _map_field_to_source(f)),
-                        "model": _dig(llm, f)
-                    })
-
-        rows.append({
-            "key": key,
-            "invoice_id": key.rstrip("/").split("/")[-2],
-            "coverage_baseline": m["coverage_baseline"],
-            "coverage_model": m["coverage_model"],
-            "coverage_delta": m["coverage_delta"],
-            "sum_matches_total": m["sum_matches_total"],
-            "near1pct_total": bool(m["numeric"]["totals.total"]["near@1pct"]),
-            "near1pct_tax":   bool(m["numeric"]["totals.tax"]["near@1pct"]),
-        })
-
-        if limit and agg["n"] >= limit:
-            break
 
-    # Print summary
-    source_desc = f"s3://{bucket}/{prefix}"
-    print_header(f"{yyyy}-{mm}-{dd}", source_desc)
+def _aggregate(docs, invoice_id, csv_out=None, limit: int|None=None, show_diffs=False, progress=None):
+    """
+    Stream (key, data) pairs into the aggregate as they arrive. Rows go to
+    `csv_out` (a text file) instead of memory; only the first
+    PER_INVOICE_ROWS and SAMPLE_DIFFS samples are kept for printing.
+    """
+    agg, head, samples = _new_agg(), [], {"fills": [], "fixes": []}
+    writer = csv.DictWriter(csv_out, fieldnames=ROW_FIELDS) if csv_out else None
+    if writer:
+        writer.writeheader()
+    try:
+        for key, data in docs:
+            row = _score_one(agg, samples, key, invoice_id(key), data, show_diffs)
+            if progress:
+                progress.update(agg["n"])
+            if row is None:
+                continue
+            if len(head) < PER_INVOICE_ROWS:
+                head.append(row)
+            if writer:
+                writer.writerow(row)
+            if limit and agg["n"] >= limit:
+                break
+    finally:
+        docs.close()    # cancel fetches queued past --limit
+        if progress:
+            progress.close()
+    return agg, head, samples
+
+def _summary(agg) -> dict:
     n = agg["n"] or 0
-    avg_cov = (agg["coverage_delta_sum"]/n) if n else 0.0
-    pct_sum = (agg["sum_matches_total_true"]/n) if n else 0.0
-    pct_near_total = (agg["near1pct_total"]/n) if n else 0.0
-    pct_near_tax   = (agg["near1pct_tax"]/n) if n else 0.0
-    print_kpis(n, avg_cov, pct_sum, pct_near_total, pct_near_tax)
+    return {
+        "count_scored": n,
+        "avg_coverage_delta": (agg["coverage_delta_sum"]/n) if n else 0.0,
+        "pct_sum_matches_total": (agg["sum_matches_total_true"]/n) if n else 0.0,
+        "pct_near1pct_total": (agg["near1pct_total"]/n) if n else 0.0,
+        "pct_near1pct_tax": (agg["near1pct_tax"]/n) if n else 0.0,
+    }
+
+def merge_agg(total: dict, agg: dict) -> dict:
+    """Add one aggregate's counters into `total` (all counters are sums, so merging is exact)."""
+    for k, v in agg.items():
+        if isinstance(v, dict):
+            merge_agg(total.setdefault(k, {}), v)
+        else:
+            total[k] = total.get(k, 0) + v
+    return total
+
+def _aggregate_doc(agg, **extra) -> dict:
+    # aggregate.json / rollup layout: derived percentages plus the raw counters they come from
+    seen = agg["routed_local"] + agg["routed_llm"]
+    return {
+        **extra,
+        **_summary(agg),
+        "wins_fill_counts": agg["wins_fill_counts"],
+        "wins_fix_counts":  agg["wins_fix_counts"],
+        "routed_local": agg["routed_local"],
+        "routed_llm": agg["routed_llm"],
+        "pct_llm_skipped": agg["routed_local"] / seen if seen else 0.0,
+        "version": AGG_VERSION,
+        "counters": agg,
+    }
+
+def _print_report(date_str, source_desc, agg, head, samples, show_diffs):
+    s = _summary(agg)
+    n = s["count_scored"]
+    print_header(date_str, source_desc)
+    print_kpis(n, s["avg_coverage_delta"], s["pct_sum_matches_total"], s["pct_near1pct_total"],
+               s["pct_near1pct_tax"])
+    print_routing(agg)
     print_top_table("Top fills (baseline empty → LLM filled)", agg["wins_fill_counts"], n)
     print_top_table("Top fixes (baseline had value → LLM changed)", agg["wins_fix_counts"], n)
-    print_per_invoice(rows)
+    print_per_invoice(head, total=n)
 
     if show_diffs:
-        print_diffs("Sample fills (examples)", sample_fills[:12])
-        print_diffs("Sample fixes (examples)", sample_fixes[:12])
+        print_diffs("Sample fills (examples)", samples["fills"])
+        print_diffs("Sample fixes (examples)", samples["fixes"])
+
+def score_bucket(date_str: str, bucket: str, prefix_tpl="invoices/processed/{yyyy}/{mm}/{dd}/",
+                 limit: int|None=None, show_diffs=False, upload=True, workers: int = WORKERS,
+                 progress: bool | None = None, quiet=False) -> dict:
+    """Score one day partition; returns its counters (see merge_agg)."""
+    yyyy, mm, dd = _yymmdd(date_str)
+    prefix = prefix_tpl.format(yyyy=yyyy, mm=mm, dd=dd)
+    if not quiet:
+        print(f"Scanning s3://{bucket}/{prefix}")
+
+    _s3(workers)   # create the shared client before the pool starts
+    raw = tempfile.TemporaryFile()
+    csv_out = io.TextIOWrapper(raw, encoding="utf-8", newline="", write_through=True)
+    fp = Fingerprint()
+    docs = fetch_ordered(list_parsed_json_s3(bucket, prefix, fp), lambda k: get_json_s3(bucket, k), workers)
+    agg, head, samples = _aggregate(docs, lambda k: k.rstrip("/").split("/")[-2], csv_out, limit,
+                                    show_diffs, Progress(False if quiet else progress))
+    # a --limit run doesn't cover the whole partition; range mode must not reuse it
+    fingerprint = None if limit and agg["n"] >= limit else fp.hexdigest()
+
+    if not quiet:
+        _print_report(f"{yyyy}-{mm}-{dd}", f"s3://{bucket}/{prefix}", agg, head, samples, show_diffs)
 
     # Write S3 metrics unless disabled
-    if upload and n > 0:
+    if upload and (agg["n"] > 0 or agg["routed_local"]):
         metrics_prefix = f"metrics/{yyyy}/{mm}/{dd}/"
         csv_key  = metrics_prefix + "score.csv"
         json_key = metrics_prefix + "aggregate.json"
+        put_file_s3(bucket, csv_key, raw, "text/csv")
 
-        buf = StringIO()
-        w = csv.DictWriter(buf, fieldnames=list(rows[0].keys()) if rows else ["key"])
-        w.writeheader()
-        for r in rows: w.writerow(r)
-        put_text_s3(bucket, csv_key, buf.getvalue(), "text/csv")
-
-        out = {
-            "date": f"{yyyy}-{mm}-{dd}",
-            "count_scored": n,
-            "avg_coverage_delta": avg_cov,
-            "pct_sum_matches_total": pct_sum,
-            "pct_near1pct_total": pct_near_total,
-            "pct_near1pct_tax": pct_near_tax,
-            "wins_fill_counts": agg["wins_fill_counts"],
-            "wins_fix_counts":  agg["wins_fix_counts"],
-        }
+        out = _aggregate_doc(agg, date=f"{yyyy}-{mm}-{dd}", fingerprint=fingerprint)
         put_text_s3(bucket, json_key, json.dumps(out, indent=2), "application/json")
-        print(f"Wrote s3://{bucket}/{csv_key}")
-        print(f"Wrote s3://{bucket}/{json_key}")
+        if not quiet:
+            print(f"Wrote s3://{bucket}/{csv_key}")
+            print(f"Wrote s3://{bucket}/{json_key}")
+    csv_out.close()
+    return agg
+
+def score_parquet(date_str: str, root: str, limit: int|None=None):
+    """
+    Score a day from the Parquet datasets of tools/export_parquet.py: one
+    read of the metrics partition instead of a GET per parsed.json.
+    """
+    if columnar.pa is None:
+        raise SystemExit("pyarrow not installed; `pip install pyarrow`")
+    yyyy, mm, dd = _yymmdd(date_str)
+    day = f"{yyyy}-{mm}-{dd}"
+    print(f"Reading {root}/metrics/date={day}/")
+    table = columnar.read(root, "metrics", days=[day], region=REGION)
+    if limit:
+        # first `limit` scored invoices, keeping the unscored rows before them (they count for routing)
+        scored = table.column("scored").to_pylist()
+        cut, n = len(scored), 0
+        for i, flag in enumerate(scored):
+            n += bool(flag)
+            if n >= limit:
+                cut = i + 1
+                break
+        table = table.slice(0, cut)
+    agg = columnar.aggregate_metrics(table)
+    first = table.filter(table.column("scored")).slice(0, PER_INVOICE_ROWS).to_pylist()
+    head = [{"key": r["processed_key"], **{k: r[k] for k in ROW_FIELDS[1:]}} for r in first]
+    _print_report(day, f"{root} (parquet)", agg, head, {"fills": [], "fixes": []}, False)
+    return agg
+
+# --------------------------
+# Date ranges: per-day aggregates reused while the partition is unchanged
+# --------------------------
+def _days(date_from: str, date_to: str) -> list:
+    a = datetime.date.fromisoformat("-".join(_yymmdd(date_from)))
+    b = datetime.date.fromisoformat("-".join(_yymmdd(date_to)))
+    if b < a:
+        raise SystemExit("--to is before --from")
+    return [a + datetime.timedelta(days=i) for i in range((b - a).days + 1)]
+
+def _period(day: datetime.date, rollup: str) -> str:
+    if rollup == "week":
+        y, w, _ = day.isocalendar()
+        return f"{y}-W{w:02d}"
+    return f"{day.year:04d}-{day.month:02d}"
+
+def day_aggregate(day: datetime.date, bucket: str, prefix_tpl: str, upload=True, force=False,
+                  workers: int = WORKERS) -> tuple:
+    """
+    (counters, "cached"|"scored") for one day. metrics/YYYY/MM/DD/aggregate.json
+    is reused when its fingerprint matches the current listing of the
+    partition; otherwise the day is rescored (and its aggregate rewritten).
+    """
+    yyyy, mm, dd = f"{day.year:04d}", f"{day.month:02d}", f"{day.day:02d}"
+    if not force:
+        cached = get_json_s3_optional(bucket, f"metrics/{yyyy}/{mm}/{dd}/aggregate.json")
+        if (cached and cached.get("version") == AGG_VERSION and cached.get("fingerprint")
+                and cached["fingerprint"] == partition_fingerprint(bucket, prefix_tpl.format(yyyy=yyyy, mm=mm, dd=dd))):
+            return cached["counters"], "cached"
+    return score_bucket(day.isoformat(), bucket, prefix_tpl, upload=upload, workers=workers, quiet=True), "scored"
+
+def print_rollups(title, periods):
+    print(f"{title} " + "─" * max(0, 78 - len(title)))
+    print(f"  {'period':10} {'days':>4} {'scored':>7} {'Δ':>5} {'sum≈total':>9} {'total±1%':>9} {'tax±1%':>7}")
+    for label, (days, agg) in periods.items():
+        s = _summary(agg)
+        print(f"  {label:10} {len(days):>4} {s['count_scored']:>7} {s['avg_coverage_delta']:>5.2f} "
+              f"{s['pct_sum_matches_total']:>9.0%} {s['pct_near1pct_total']:>9.0%} {s['pct_near1pct_tax']:>7.0%}")
+    print()
+
+def score_range(date_from: str, date_to: str, bucket: str, prefix_tpl="invoices/processed/{yyyy}/{mm}/{dd}/",
+                rollup="month", upload=True, force=False, workers: int = WORKERS):
+    """
+    Score every day in [date_from, date_to], rescoring only days whose
+    partition changed, and roll the day counters up by week or month.
+    Rollups go to metrics/rollups/{week|month}/{period}.json.
+    """
+    days = _days(date_from, date_to)
+    print(f"Scoring {len(days)} days s3://{bucket}/{prefix_tpl}")
+    total, periods, status = _new_agg(), {}, {"cached": 0, "scored": 0}
+    for day in days:
+        agg, how = day_aggregate(day, bucket, prefix_tpl, upload=upload, force=force, workers=workers)
+        status[how] += 1
+        print(f"  {day.isoformat()}  {how:6}  {agg['n']:>6} scored")
+        merge_agg(total, agg)
+        entry = periods.setdefault(_period(day, rollup), ([], _new_agg()))
+        entry[0].append(day.isoformat())
+        merge_agg(entry[1], agg)
+    print(f"  {status['cached']} days reused, {status['scored']} rescored")
+    print()
 
-def score_local(date_str: str, local_dir: str, limit: int|None=None, show_diffs=False):
+    n = total["n"]
+    s = _summary(total)
+    print_header(f"{days[0].isoformat()} … {days[-1].isoformat()}", f"s3://{bucket}/{prefix_tpl}")
+    print_kpis(n, s["avg_coverage_delta"], s["pct_sum_matches_total"], s["pct_near1pct_total"],
+               s["pct_near1pct_tax"])
+    print_routing(total)
+    print_rollups(f"By {rollup}", periods)
+    print_top_table("Top fills (baseline empty → LLM filled)", total["wins_fill_counts"], n)
+    print_top_table("Top fixes (baseline had value → LLM changed)", total["wins_fix_counts"], n)
+
+    if upload:
+        for label, (pdays, agg) in periods.items():
+            key = f"metrics/rollups/{rollup}/{label}.json"
+            put_text_s3(bucket, key, json.dumps(_aggregate_doc(agg, period=label, days=pdays), indent=2),
+                        "application/json")
+            print(f"Wrote s3://{bucket}/{key}")
+    return total
+
+def score_local(date_str: str, local_dir: str, limit: int|None=None, show_diffs=False,
+                workers: int = WORKERS, progress: bool | None = None):
     root = Path(local_dir).expanduser().resolve()
     if not root.exists():
         raise SystemExit(f"--local-dir not found: {root}")
 
     print(f"Scanning {root} for parsed.json")
-    rows = []
-    agg = {
-        "n": 0,
-        "coverage_delta_sum": 0,
-        "sum_matches_total_true": 0,
-        "near1pct_total": 0,
-        "near1pct_tax": 0,
-        "wins_fill_counts": {f: 0 for f in FIELDS},
-        "wins_fix_counts":  {f: 0 for f in FIELDS},
-    }
-    sample_fills, sample_fixes = [], []
-
-    for i, path in enumerate(list_parsed_json_local(root)):
-        data = get_json_local(path)
-        source = data.get("source_parse") or {}
-        llm    = data.get("llm_normalized") or {}
-        if not llm:
-            continue
-
-        m = compare_case(source, llm)
-
-        agg["n"] += 1
-        agg["coverage_delta_sum"] += m["coverage_delta"]
-        agg["sum_matches_total_true"] += 1 if m["sum_matches_total"] else 0
-        if m["numeric"]["totals.total"]["near@1pct"]: agg["near1pct_total"] += 1
-        if m["numeric"]["totals.tax"]["near@1pct"]:   agg["near1pct_tax"] += 1
-
-        for f in FIELDS:
-            if m["wins_fill"][f]:
-                agg["wins_fill_counts"][f] += 1
-                if show_diffs:
-                    sample_fills.append({
-                        "path": path, "field": f,
-                        "baseline": None,
-                        "model": _dig(llm, f)
-                    })
-            if m["wins_fix"][f]:
-                agg["wins_fix_counts"][f] += 1
-                if show_diffs:
-                    sample_fixes.append({
-                        "path": path, "field": f,
-                        "baseline": _dig(source, _map_field_to_source(f)),
-                        "model": _dig(llm, f)
-                    })
-
-        rows.append({
-            "key": path,
-            "invoice_id": Path(path).parent.name,
-            "coverage_baseline": m["coverage_baseline"],
-            "coverage_model": m["coverage_model"],
-            "coverage_delta": m["coverage_delta"],
-            "sum_matches_total": m["sum_matches_total"],
-            "near1pct_total": bool(m["numeric"]["totals.total"]["near@1pct"]),
-            "near1pct_tax":   bool(m["numeric"]["totals.tax"]["near@1pct"]),
-        })
-
-        if limit and agg["n"] >= limit:
-            break
+    docs = fetch_ordered(list_parsed_json_local(root), get_json_local, workers)
+    agg, head, samples = _aggregate(docs, lambda p: Path(p).parent.name, None, limit, show_diffs,
+                                    Progress(progress))
 
     yyyy, mm, dd = _yymmdd(date_str)
-    print_header(f"{yyyy}-{mm}-{dd}", f"local://{root}")
-    n = agg["n"] or 0
-    avg_cov = (agg["coverage_delta_sum"]/n) if n else 0.0
-    pct_sum = (agg["sum_matches_total_true"]/n) if n else 0.0
-    pct_near_total = (agg["near1pct_total"]/n) if n else 0.0
-    pct_near_tax   = (agg["near1pct_tax"]/n) if n else 0.0
-    print_kpis(n, avg_cov, pct_sum, pct_near_total, pct_near_tax)
-    print_top_table("Top fills (baseline empty → LLM filled)", agg["wins_fill_counts"], n)
-    print_top_table("Top fixes (baseline had value → LLM changed)", agg["wins_fix_counts"], n)
-    print_per_invoice(rows)
-
-    if show_diffs:
-        print_diffs("Sample fills (examples)", sample_fills[:12])
-        print_diffs("Sample fixes (examples)", sample_fixes[:12])
+    _print_report(f"{yyyy}-{mm}-{dd}", f"local://{root}", agg, head, samples, show_diffs)
 
 # --------------------------
 # Utilities to dig into dicts and map baseline fields
@@ -366,13 +627,44 @@ def main():
     ap.add_argument("--limit", type=int, help="Limit number of invoices processed")
     ap.add_argument("--show-diffs", action="store_true", help="Print sample baseline→LLM changes")
     ap.add_argument("--no-upload", action="store_true", help="Do not write metrics to S3")
+    ap.add_argument("--workers", type=int, default=WORKERS, help=f"Concurrent fetches (default {WORKERS})")
+    ap.add_argument("--progress", dest="progress", action="store_true", default=None,
+                    help="Show a progress line (default: only on a terminal)")
+    ap.add_argument("--no-progress", dest="progress", action="store_false")
+    ap.add_argument("--from", dest="date_from", help="Range mode: first day YYYY-MM-DD (S3 only)")
+    ap.add_argument("--to", dest="date_to", help="Range mode: last day YYYY-MM-DD (default: today)")
+    ap.add_argument("--rollup", choices=["week", "month"], default="month", help="Range mode rollup period")
+    ap.add_argument("--force", action="store_true", help="Range mode: rescore days even if unchanged")
+    ap.add_argument("--no-manifest", action="store_true",
+                    help="List the partition instead of reading its _manifest/ (days processed before manifests)")
+    ap.add_argument("--parquet", nargs="?", const="", metavar="ROOT",
+                    help="Read the export_parquet.py datasets (default root s3://<bucket>/analytics)")
     args = ap.parse_args()
 
     date_str = args.date
     bucket = args.bucket or os.getenv("PROCESSED_BUCKET")
+    global USE_MANIFEST
+    USE_MANIFEST = not args.no_manifest
+
+    if args.parquet is not None:
+        if not (args.parquet or bucket):
+            raise SystemExit("Missing bucket. Set --bucket, PROCESSED_BUCKET env or a --parquet ROOT.")
+        score_parquet(date_str, args.parquet or f"s3://{bucket}/analytics", limit=args.limit)
+        return
+
+    if args.date_from or args.date_to:
+        if args.local_dir or args.limit or args.date:
+            raise SystemExit("--from/--to cannot be combined with DATE, --local-dir or --limit")
+        if not bucket:
+            raise SystemExit("Missing bucket. Set --bucket or PROCESSED_BUCKET env.")
+        score_range(args.date_from or args.date_to, args.date_to or "-".join(_today_parts()), bucket,
+                    args.prefix_tpl, rollup=args.rollup, upload=not args.no_upload, force=args.force,
+                    workers=args.workers)
+        return
 
     if args.local_dir:
-        score_local(date_str, args.local_dir, limit=args.limit, show_diffs=args.show_diffs)
+        score_local(date_str, args.local_dir, limit=args.limit, show_diffs=args.show_diffs,
+                    workers=args.workers, progress=args.progress)
         return
 
     if not bucket:
@@ -384,7 +676,9 @@ def main():
         prefix_tpl=args.prefix_tpl,
         limit=args.limit,
         show_diffs=args.show_diffs,
-        upload=not args.no_upload
+        upload=not args.no_upload,
+        workers=args.workers,
+        progress=args.progress,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# tools/sqs_harness.py
+# Local harness for src/sqs_consumer on the in-memory fakes: uploads synthetic
+# invoices, wraps their S3 notifications in SQS messages and delivers them in
+# batches the way the Lambda event source does. Messages reported in
+# batchItemFailures are redelivered until maxReceiveCount, then go to the DLQ.
+#
+#   python3 tools/sqs_harness.py --invoices 40 --batch-size 10 --poison 2 --flaky 3 --malformed 1
+import os, sys, json, argparse, hashlib, urllib.parse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+os.environ.setdefault("RAW_BUCKET", "raw-bucket")
+os.environ.setdefault("PROCESSED_BUCKET", "processed-bucket")
+os.environ.setdefault("DDB_TABLE", "Invoices")
+os.environ.setdefault("USE_LLM", "false")
+
+import fake_aws
+
+class ScriptedTextract(fake_aws.FakeTextract):
+    """Keys containing "poison" always fail; keys containing "flaky" fail on their first call."""
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.seen = set()
+
+    def analyze_expense(self, Document, **kw):
+        name = Document["S3Object"]["Name"]
+        if "poison" in name or ("flaky" in name and name not in self.seen):
+            self.seen.add(name)
+            raise fake_aws._err("ThrottlingException" if "flaky" in name else "InvalidS3ObjectException",
+                                "AnalyzeExpense")
+        return super().analyze_expense(Document, **kw)
+
+def s3_message(bucket, key, etag, size, n):
+    rec = {"eventSource": "aws:s3", "eventName": "ObjectCreated:Put",
+           "s3": {"bucket": {"name": bucket}, "object": {"key": urllib.parse.quote_plus(key),
+                                                         "eTag": etag.strip('"'), "size": size}}}
+    return {"messageId": f"m-{n:04d}", "body": json.dumps({"Records": [rec]}), "receiveCount": 0}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--invoices", type=int, default=40)
+    ap.add_argument("--batch-size", type=int, default=10)
+    ap.add_argument("--max-receive", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--poison", type=int, default=2, help="objects whose Textract call always fails")
+    ap.add_argument("--flaky", type=int, default=3, help="objects that fail once, then succeed")
+    ap.add_argument("--malformed", type=int, default=1, help="messages with an unparseable body")
+    ap.add_argument("--duplicates", type=int, default=2, help="notifications delivered twice")
+    args = ap.parse_args()
+    os.environ["SQS_WORKERS"] = str(args.workers)
+
+    from common import config
+    config.SQS_WORKERS = args.workers
+    fakes = fake_aws.install(textract=ScriptedTextract())
+    from sqs_consumer import handler as consumer
+    consumer.SQS_WORKERS = args.workers
+
+    bucket = os.environ["RAW_BUCKET"]
+    queue, n = [], 0
+    for i in range(args.invoices):
+        kind = "poison" if i < args.poison else "flaky" if i < args.poison + args.flaky else "inv"
+        key = f"invoices/raw/2025/10/04/{kind}-{i:04d}.pdf"
+        body = f"%PDF-1.4 {key}".encode()
+        etag = fakes["s3"].put_object(Bucket=bucket, Key=key, Body=body)["ETag"]
+        queue.append(s3_message(bucket, key, etag, len(body), n)); n += 1
+        if i >= args.invoices - args.duplicates:
+            queue.append(s3_message(bucket, key, etag, len(body), n)); n += 1
+    for _ in range(args.malformed):
+        queue.append({"messageId": f"m-{n:04d}", "body": "not json", "receiveCount": 0}); n += 1
+
+    dlq, rounds, invocations = [], 0, 0
+    while queue:
+        rounds += 1
+        redeliver = []
+        for start in range(0, len(queue), args.batch_size):
+            batch = queue[start:start + args.batch_size]
+            for m in batch:
+                m["receiveCount"] += 1
+            event = {"Records": [{"messageId": m["messageId"], "body": m["body"],
+                                  "eventSource": "aws:sqs"} for m in batch]}
+            out = consumer.handler(event, None)
+            invocations += 1
+            failed = {f["itemIdentifier"] for f in out["batchItemFailures"]}
+            for m in batch:
+                if m["messageId"] in failed:
+                    (dlq if m["receiveCount"] >= args.max_receive else redeliver).append(m)
+            print(f"round {rounds} batch {start // args.batch_size + 1}: {len(batch)} messages, "
+                  f"{out['processed']} processed, {out['skipped']} skipped, {len(failed)} failed, "
+                  f"wall {out['timings']['wall_ms']} ms")
+        queue = redeliver
+
+    stored = sum(it.get("status") == "done" for it in fakes["dynamodb"].Table(os.environ["DDB_TABLE"]).items.values())
+    print(f"\n{invocations} invocations over {rounds} rounds; {stored} invoices stored; "
+          f"{fakes['textract'].calls} Textract calls")
+    print(f"DLQ ({len(dlq)}): " + ", ".join(f"{m['messageId']} x{m['receiveCount']}" for m in dlq))
+    expected = args.invoices - args.poison
+    ok = stored == expected and len(dlq) == args.poison + args.malformed
+    from common import manifest
+    day = "invoices/processed/2025/10/04/"
+    entries, _ = manifest.read(fakes["s3"], os.environ["PROCESSED_BUCKET"], day)
+    done = sum(e.get("status") == "done" for e in entries or [])
+    shards = len(manifest.listing(fakes["s3"], os.environ["PROCESSED_BUCKET"], day))
+    print(f"manifest: {done} done entries in {shards} object(s) (MANIFEST_COMPACT_MIN={config.MANIFEST_COMPACT_MIN})")
+    ok = ok and (done == expected or not config.MANIFEST_ENABLED)
+    print("OK" if ok else f"MISMATCH: expected {expected} stored, {expected} in the manifest "
+                          f"and {args.poison + args.malformed} in the DLQ")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()